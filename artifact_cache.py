@@ -0,0 +1,130 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import asyncio
+import config
+from scheduler import limits
+from file_deploy import deploy_tree, remove_tree, seal_cache_tree, verify_cache_tree
+from single_flight import get_single_flight
+
+
+EXTRACTED_DIR = "extracted"
+INDEX_FILE = "index.json"
+
+
+def _hash_file(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class ArtifactCache:
+    """ Cache các tệp zip đã giải nén, theo sha256 của tệp zip """
+
+    def __init__(self, cached_path):
+        self.cached_path = cached_path
+        self.extracted_path = os.path.join(cached_path, EXTRACTED_DIR)
+        self.index_path = os.path.join(self.extracted_path, INDEX_FILE)
+        self.index = self._load_index()
+        self.stats = {"hits": 0, "extracted": 0}
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        # Giữ lại các tệp zip do tiến trình khác ghi vào index
+        for key, entry in self._load_index().items():
+            self.index.setdefault(key, entry)
+
+        os.makedirs(self.extracted_path, exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=4)
+        os.replace(tmp_path, self.index_path)
+
+    def _zip_sha256(self, zip_file):
+        """ sha256 của tệp zip, chỉ tính lại khi kích thước hoặc mtime thay đổi """
+
+        st = os.stat(zip_file)
+        entry = self.index.get(os.path.abspath(zip_file))
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return entry["sha256"]
+        return _hash_file(zip_file)
+
+    async def get_tree(self, zip_file, sha256=None):
+        """ Trả về thư mục đã giải nén của tệp zip, chỉ giải nén khi chưa có trong cache.
+        Các tác vụ (và tiến trình) cùng tệp zip chờ lần giải nén đầu tiên """
+
+        sha256 = sha256 or await asyncio.to_thread(self._zip_sha256, zip_file)
+        return await get_single_flight(self.cached_path).run(
+            f"extract:{sha256}",
+            lambda: self._get_tree(zip_file, sha256)
+        )
+
+    async def _get_tree(self, zip_file, sha256):
+        from utilities import extract_zip_file
+
+        tree_path = os.path.join(self.extracted_path, sha256)
+
+        # Ở chế độ link, kiểm tra website không sửa vào thư mục dùng chung
+        if os.path.isdir(tree_path) and config.deploy_mode == "link" and not await asyncio.to_thread(verify_cache_tree, tree_path):
+            print(f"Thư mục giải nén của {os.path.basename(zip_file)} đã bị thay đổi, giải nén lại...")
+            await asyncio.to_thread(remove_tree, tree_path)
+
+        if os.path.isdir(tree_path):
+            self.stats["hits"] += 1
+        else:
+            print(f"Giải nén {os.path.basename(zip_file)} vào cache...")
+            tmp_path = f"{tree_path}.tmp-{uuid.uuid4().hex[:8]}"
+            try:
+                async with limits.disk():
+                    await extract_zip_file(zip_file, tmp_path)
+                if config.deploy_mode == "link":
+                    await asyncio.to_thread(seal_cache_tree, tmp_path)
+                os.rename(tmp_path, tree_path)
+            except OSError:
+                # Một tác vụ khác đã giải nén xong trước
+                await asyncio.to_thread(shutil.rmtree, tmp_path, True)
+                if not os.path.isdir(tree_path):
+                    raise
+            self.stats["extracted"] += 1
+
+        # Xóa bản giải nén cũ khi tệp zip đã thay đổi nội dung
+        key = os.path.abspath(zip_file)
+        old_entry = self.index.get(key)
+        if old_entry and old_entry["sha256"] != sha256:
+            old_path = os.path.join(self.extracted_path, old_entry["sha256"])
+            still_used = any(e["sha256"] == old_entry["sha256"] for k, e in self.index.items() if k != key)
+            if not still_used and os.path.isdir(old_path):
+                await asyncio.to_thread(remove_tree, old_path)
+
+        st = os.stat(zip_file)
+        self.index[key] = {"sha256": sha256, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        self._save_index()
+        return tree_path
+
+    async def deploy(self, zip_file, destination_path, sha256=None):
+        """ Đưa nội dung tệp zip vào website từ bản đã giải nén (copy hoặc link theo config.deploy_mode) """
+
+        tree_path = await self.get_tree(zip_file, sha256)
+        return await deploy_tree(tree_path, destination_path)
+
+
+_caches = {}
+
+
+def get_artifact_cache(cached_path):
+    """ Cache giải nén dùng chung cho thư mục cached """
+
+    cached_path = os.path.abspath(cached_path)
+    if cached_path not in _caches:
+        _caches[cached_path] = ArtifactCache(cached_path)
+    return _caches[cached_path]
@@ -0,0 +1,290 @@
+""" Benchmark tạo website, restore và bulk restore với mysql / wp / Laragon giả lập.
+
+Ví dụ:
+    python benchmarks/bench.py --sizes small,medium --workers 1,4 --output benchmarks/results.json
+    python benchmarks/bench.py --baseline benchmarks/baseline.json
+    python benchmarks/bench.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench.py --real-mysql          # dùng mysql / mysqldump (MariaDB) thật trên máy
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import contextlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import fixtures
+
+
+SCENARIOS = ["create", "restore_wp", "restore_wpcontent", "restore_ai1", "restore_dup", "bulk"]
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark script tạo / restore website")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Các kịch bản cần chạy ({', '.join(SCENARIOS)})")
+    parser.add_argument("--sizes", default="small", help=f"Kích thước dữ liệu ({', '.join(fixtures.SIZES)})")
+    parser.add_argument("--workers", default="1,4", help="Các mức worker cho bulk restore")
+    parser.add_argument("--bulk-sites", type=int, default=8, help="Số website trong mỗi lần bulk restore")
+    parser.add_argument("--repeat", type=int, default=1, help="Số lần chạy mỗi kịch bản (lấy thời gian nhỏ nhất)")
+    parser.add_argument("--mysql-latency", type=float, default=0.02, help="Thời gian khởi động mysql giả (giây)")
+    parser.add_argument("--mysql-mbps", type=float, default=50, help="Tốc độ import của mysql giả (MB/s)")
+    parser.add_argument("--wp-latency", type=float, default=0.3, help="Thời gian bootstrap WordPress của wp giả (giây)")
+    parser.add_argument("--wp-cmd-latency", type=float, default=0.02, help="Thời gian mỗi lệnh WP-CLI giả (giây)")
+    parser.add_argument("--real-mysql", action="store_true", help="Dùng mysql / mysqldump thật thay vì giả lập")
+    parser.add_argument("--output", help="Ghi kết quả ra file JSON")
+    parser.add_argument("--baseline", help="So sánh với kết quả đã lưu")
+    parser.add_argument("--save-baseline", help="Lưu kết quả làm baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Chậm hơn baseline quá %% này thì báo lỗi")
+    parser.add_argument("--keep", action="store_true", help="Giữ lại thư mục tạm để kiểm tra")
+    parser.add_argument("--verbose", action="store_true", help="Hiện output của script")
+    return parser.parse_args()
+
+
+class Bench:
+    """ Môi trường benchmark: thư mục Laragon tạm, công cụ giả, HTTP server cục bộ """
+
+    def __init__(self, args):
+        self.args = args
+        self.root = tempfile.mkdtemp(prefix="wp-bench-")
+        self.laragon_path = os.path.join(self.root, "laragon")
+        self.sites_path = os.path.join(self.laragon_path, "www")
+        self.state_path = os.path.join(self.root, "mysql-state")
+        self.logs_path = os.path.join(self.root, "logs")
+        self.results = {}
+        self.server = None
+        self.backups = {}
+
+    def setup(self, size):
+        """ Tạo môi trường và nạp các module của script với config trỏ vào môi trường tạm """
+
+        for path in (self.sites_path, os.path.join(self.laragon_path, "tmp", "cached"), self.state_path, self.logs_path):
+            os.makedirs(path, exist_ok=True)
+
+        fixtures.install_fake_tools(os.path.join(self.root, "bin"), self.laragon_path, self.args.real_mysql)
+        os.environ.update({
+            "BENCH_STATE_DIR": self.state_path,
+            "BENCH_MYSQL_LATENCY": str(self.args.mysql_latency),
+            "BENCH_MYSQL_MBPS": str(self.args.mysql_mbps),
+            "BENCH_WP_LATENCY": str(self.args.wp_latency),
+            "BENCH_WP_CMD_LATENCY": str(self.args.wp_cmd_latency),
+        })
+
+        http_path = os.path.join(self.root, "http")
+        os.makedirs(http_path, exist_ok=True)
+        self.server = fixtures.LocalServer(http_path).start()
+        resource_path, core_url, self.plugins = fixtures.make_resources(os.path.join(self.root, "work"), http_path, self.server.base_url, size)
+
+        # config phải được sửa trước khi import các module khác (chúng đọc config lúc import)
+        sys.path.insert(0, REPO_DIR)
+        import config
+        config.laragon_path = self.laragon_path
+        config.resource_path = resource_path
+        config.wp_core_url = core_url
+        config.use_db_pool = self.args.real_mysql
+
+    def reset_sites(self):
+        """ Xóa website và database giả giữa các kịch bản (giữ lại tmp/cached) """
+
+        from file_deploy import remove_tree
+        for name in os.listdir(self.sites_path):
+            remove_tree(os.path.join(self.sites_path, name))
+        shutil.rmtree(self.state_path, ignore_errors=True)
+        os.makedirs(self.state_path, exist_ok=True)
+
+    def get_backups(self, size_name, index=0):
+        key = (size_name, index)
+        if key not in self.backups:
+            self.backups[key] = fixtures.make_backups(os.path.join(self.root, "work", size_name), fixtures.SIZES[size_name], index)
+        return self.backups[key]
+
+    def make_inputs(self, name):
+        from input_handler import WebsiteInputs
+        inputs = WebsiteInputs()
+        inputs.website_name = name
+        inputs.website_path = os.path.join(self.sites_path, name)
+        return inputs
+
+    async def measure(self, key, sites, data_bytes, func):
+        """ Chạy func() args.repeat lần, ghi lại thời gian nhỏ nhất """
+
+        best = None
+        error = None
+        for _ in range(self.args.repeat):
+            self.reset_sites()
+            log_path = os.path.join(self.logs_path, f"{key.replace('/', '_')}.log")
+            start = time.perf_counter()
+            try:
+                if self.args.verbose:
+                    await func()
+                else:
+                    with open(log_path, "a", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+                        await func()
+            except (Exception, SystemExit) as e:
+                error = f"{type(e).__name__}: {e}"
+                break
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        if error:
+            self.results[key] = {"error": error}
+            print(f"{key:<45} LỖI: {error}")
+            return
+
+        self.results[key] = {
+            "seconds": round(best, 4),
+            "sites": sites,
+            "sites_per_minute": round(sites * 60 / best, 2),
+            "bytes": data_bytes,
+            "mb_per_second": round(data_bytes / 1024 / 1024 / best, 2),
+        }
+        print(f"{key:<45} {best:8.2f}s  {sites * 60 / best:8.1f} site/phút  {data_bytes / 1024 / 1024 / best:8.1f} MB/s")
+
+    async def bench_create(self, size_name):
+        from wp_installer import WPInstaller
+        from site_template import clear_templates
+
+        selected = {index: plugin for index, plugin in enumerate(self.plugins[:2])}
+
+        # cold: chưa có template, cài đặt đầy đủ rồi lưu template; warm: clone từ template
+        for label in ("cold", "warm"):
+            name = f"bench-create-{label}"
+
+            async def run():
+                if label == "cold":
+                    clear_templates(os.path.join(self.laragon_path, "tmp", "cached"))
+                await WPInstaller(self.make_inputs(name)).create_new_website(selected)
+
+            await self.measure(f"create/{label}/{size_name}", 1, 0, run)
+
+    async def bench_restore(self, method, size_name):
+        from restore import Restore
+        from scheduler import path_size
+
+        source_path, db_path = self.get_backups(size_name)[method]
+        data_bytes = path_size(source_path) + path_size(db_path)
+
+        async def run():
+            restore = Restore(self.make_inputs(f"bench-{method}"), True)
+            if method == "wpcontent":
+                await restore.restore_wpcontent(source_path, db_path)
+            else:
+                await getattr(restore, f"restore_{method}")(source_path)
+
+        await self.measure(f"restore_{method}/{size_name}", 1, data_bytes, run)
+
+    async def bench_bulk(self, size_name, workers):
+        from bulk_restore import BulkRestore
+        from scheduler import path_size
+
+        csv_path = os.path.join(self.root, f"bulk-{size_name}.csv")
+        data_bytes = 0
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["website_name", "source_path", "restore_method", "db_path"])
+            writer.writeheader()
+            for index in range(self.args.bulk_sites):
+                method = "wp" if index % 2 == 0 else "wpcontent"
+                source_path, db_path = self.get_backups(size_name, index % 4)[method]
+                data_bytes += path_size(source_path) + path_size(db_path)
+                writer.writerow({"website_name": f"bench-bulk-{index}", "source_path": source_path, "restore_method": method, "db_path": db_path or ""})
+
+        async def run():
+            await BulkRestore(csv_path, workers=workers).restore_from_csv()
+
+        await self.measure(f"bulk/{size_name}/workers={workers}", self.args.bulk_sites, data_bytes, run)
+
+    async def run(self):
+        scenarios = [name.strip() for name in self.args.scenarios.split(",") if name.strip()]
+        sizes = [name.strip() for name in self.args.sizes.split(",") if name.strip()]
+        workers_levels = [int(value) for value in self.args.workers.split(",") if value.strip()]
+
+        for size_name in sizes:
+            for scenario in scenarios:
+                if scenario == "create":
+                    await self.bench_create(size_name)
+                elif scenario.startswith("restore_"):
+                    await self.bench_restore(scenario[len("restore_"):], size_name)
+                elif scenario == "bulk":
+                    for workers in workers_levels:
+                        await self.bench_bulk(size_name, workers)
+
+        from database_pool import db_pool
+        await db_pool.close()
+
+    def cleanup(self):
+        if self.server:
+            self.server.stop()
+        if self.args.keep:
+            print(f"\nThư mục benchmark: {self.root}")
+        else:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+
+def compare(results, baseline, threshold):
+    """ So sánh với baseline, trả về danh sách kịch bản chậm hơn ngưỡng """
+
+    regressions = []
+    print(f"\n{'Kịch bản':<45} {'Baseline':>10} {'Hiện tại':>10} {'Thay đổi':>10}")
+    for key, result in results.items():
+        old = baseline.get(key)
+        if not old or "seconds" not in old or "seconds" not in result:
+            print(f"{key:<45} {'-':>10} {result.get('seconds', 'lỗi')!s:>10}")
+            continue
+        change = (result["seconds"] - old["seconds"]) / old["seconds"] * 100
+        flag = " <-- chậm hơn" if change > threshold else ""
+        print(f"{key:<45} {old['seconds']:>9.2f}s {result['seconds']:>9.2f}s {change:>+9.1f}%{flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    args = parse_arguments()
+    bench = Bench(args)
+    sizes = [name.strip() for name in args.sizes.split(",") if name.strip()]
+
+    try:
+        bench.setup(fixtures.SIZES[sizes[0]])
+        asyncio.run(bench.run())
+    finally:
+        bench.cleanup()
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "args": vars(args),
+        },
+        "results": bench.results,
+    }
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            print(f"\nĐã ghi kết quả vào {path}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(bench.results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} kịch bản chậm hơn baseline quá {args.threshold}%")
+            sys.exit(1)
+
+    if any("error" in result for result in bench.results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+""" Công cụ giả lập mysql, mysqldump, wp, robocopy, laragon.exe và start cho benchmark.
+
+Được gọi qua các script bọc: python fake_tool.py <tên công cụ> [tham số...]
+Trạng thái "MySQL" (database / bảng) lưu dưới dạng thư mục trong BENCH_STATE_DIR.
+Độ trễ cấu hình qua biến môi trường:
+    BENCH_MYSQL_LATENCY   thời gian khởi động mỗi tiến trình mysql (giây)
+    BENCH_MYSQL_MBPS      tốc độ import của mysql (MB/s)
+    BENCH_WP_LATENCY      thời gian bootstrap WordPress của mỗi tiến trình wp (giây)
+    BENCH_WP_CMD_LATENCY  thời gian chạy mỗi lệnh WP-CLI (giây)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import base64
+
+
+STATE_DIR = os.environ.get("BENCH_STATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".state"))
+CHUNK_SIZE = 1024 * 1024
+
+CREATE_DB_RE = re.compile(r"CREATE DATABASE(?: IF NOT EXISTS)?\s+`?([^`\s;]+)`?", re.I)
+DROP_DB_RE = re.compile(r"DROP DATABASE(?: IF EXISTS)?\s+`?([^`\s;]+)`?", re.I)
+CREATE_TABLE_RE = re.compile(rb"^CREATE TABLE(?: IF NOT EXISTS)?\s+`?([^`\s(]+)`?", re.I)
+SCHEMA_RE = re.compile(r"SCHEMA_NAME\s*=\s*'([^']*)'", re.I)
+TABLES_RE = re.compile(r"table_schema\s*=\s*'([^']*)'\s+AND\s+table_name\s+LIKE\s+'%([^']*)'", re.I)
+SELECT_ID_RE = re.compile(r"SELECT ID FROM\s+`?([^`\s;]+)`?", re.I)
+DB_NAME_RE = re.compile(r"define\(\s*'DB_NAME'\s*,\s*'([^']*)'")
+PAYLOAD_RE = re.compile(r"base64_decode\('([^']*)'\)")
+WORKER_MARKER = "__WP_WORKER__"
+
+
+def _env_float(name, default=0.0):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _db_path(db_name):
+    return os.path.join(STATE_DIR, db_name)
+
+
+def _create_tables(db_name, tables):
+    os.makedirs(_db_path(db_name), exist_ok=True)
+    for table in tables:
+        open(os.path.join(_db_path(db_name), table), "a").close()
+
+
+def _list_tables(db_name):
+    path = _db_path(db_name)
+    return sorted(os.listdir(path)) if os.path.isdir(path) else []
+
+
+# Tham số có giá trị đi kèm ở phần tử tiếp theo
+VALUE_OPTIONS = {"-u", "-e", "-h", "-P", "-p"}
+
+
+def _positional(args):
+    positional = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in VALUE_OPTIONS:
+            skip = True
+        elif not arg.startswith("-"):
+            positional.append(arg)
+    return positional
+
+
+# ---------------------------------------------------------------- mysql
+
+def mysql(args):
+    positional = _positional(args)
+    db_name = positional[-1] if positional else None
+
+    if "-e" in args:
+        sql = args[args.index("-e") + 1].encode("utf-8")
+        stream = [sql]
+    else:
+        stream = iter(lambda: sys.stdin.buffer.read(CHUNK_SIZE), b"")
+
+    time.sleep(_env_float("BENCH_MYSQL_LATENCY"))
+
+    # Script nhỏ (truy vấn) được đọc toàn bộ, file dump lớn chỉ quét dòng CREATE TABLE
+    head = b""
+    tables = []
+    total = 0
+    pending = b""
+    for chunk in stream:
+        total += len(chunk)
+        if len(head) < CHUNK_SIZE:
+            head += chunk[:CHUNK_SIZE - len(head)]
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        tables.extend(m.group(1).decode() for m in map(CREATE_TABLE_RE.match, lines) if m)
+    if pending and CREATE_TABLE_RE.match(pending):
+        tables.append(CREATE_TABLE_RE.match(pending).group(1).decode())
+
+    mbps = _env_float("BENCH_MYSQL_MBPS", 50)
+    if mbps > 0:
+        time.sleep(total / (mbps * 1024 * 1024))
+
+    if db_name and tables:
+        _create_tables(db_name, tables)
+
+    sql = head.decode("utf-8", "replace")
+    for match in CREATE_DB_RE.finditer(sql):
+        os.makedirs(_db_path(match.group(1)), exist_ok=True)
+    for match in DROP_DB_RE.finditer(sql):
+        shutil.rmtree(_db_path(match.group(1)), ignore_errors=True)
+
+    output = []
+    for match in SCHEMA_RE.finditer(sql):
+        if os.path.isdir(_db_path(match.group(1))):
+            output.append(match.group(1))
+    for match in TABLES_RE.finditer(sql):
+        output.extend(table for table in _list_tables(match.group(1)) if table.endswith(match.group(2)))
+    for match in SELECT_ID_RE.finditer(sql):
+        if db_name and match.group(1) in _list_tables(db_name):
+            output.append("1")
+    databases = sorted(os.listdir(STATE_DIR)) if os.path.isdir(STATE_DIR) else []
+    if re.search(r"FROM information_schema\.SCHEMATA\s*;?\s*$", sql, re.I):
+        output.extend(databases)
+    if re.search(r"FROM information_schema\.TABLES GROUP BY", sql, re.I):
+        output.extend(f"{name}\t{len(_list_tables(name))}\t0" for name in databases)
+    if re.search(r"SHOW DATABASES", sql, re.I):
+        output.extend(databases)
+
+    if output:
+        print("\n".join(output))
+    return 0
+
+
+def mysqldump(args):
+    result_file = next((arg.split("=", 1)[1].strip('"') for arg in args if arg.startswith("--result-file=")), None)
+    positional = [arg.strip('"') for arg in _positional(args)]
+    db_name = positional[-1] if positional else ""
+
+    time.sleep(_env_float("BENCH_MYSQL_LATENCY"))
+    lines = []
+    for table in _list_tables(db_name):
+        lines.append(f"DROP TABLE IF EXISTS `{table}`;")
+        lines.append(f"CREATE TABLE `{table}` (`id` bigint unsigned NOT NULL AUTO_INCREMENT, PRIMARY KEY (`id`));")
+        if table.endswith("options"):
+            lines.append(f"INSERT INTO `{table}` VALUES (1,'siteurl','http://{db_name}.test','yes'),(2,'home','http://{db_name}.test','yes');")
+
+    content = "\n".join(lines) + "\n"
+    if result_file:
+        with open(result_file, "w", encoding="utf-8") as f:
+            f.write(content)
+    else:
+        sys.stdout.write(content)
+    return 0
+
+
+# ---------------------------------------------------------------- wp
+
+def _site_db_name(site_path):
+    try:
+        with open(os.path.join(site_path, "wp-config.php"), "r", encoding="utf-8") as f:
+            match = DB_NAME_RE.search(f.read())
+        return match.group(1) if match else None
+    except OSError:
+        return None
+
+
+def _wp_command(site_path, command):
+    """ Giả lập một lệnh WP-CLI, trả về (mã lỗi, stdout) """
+
+    time.sleep(_env_float("BENCH_WP_CMD_LATENCY"))
+    parts = command.split()
+    if parts[:2] == ["config", "create"]:
+        options = dict(part[2:].split("=", 1) for part in parts[2:] if part.startswith("--") and "=" in part)
+        with open(os.path.join(site_path, "wp-config.php"), "w", encoding="utf-8") as f:
+            f.write("<?php\n"
+                    f"define('DB_NAME', '{options.get('dbname', '')}');\n"
+                    "define('DB_USER', 'root');\n"
+                    "$table_prefix = 'wp_';\n"
+                    "require_once ABSPATH . 'wp-settings.php';\n")
+        return 0, "Success: Generated 'wp-config.php' file."
+    if parts[:2] in (["core", "install"], ["ai1wm", "restore"]):
+        db_name = _site_db_name(site_path)
+        if db_name:
+            _create_tables(db_name, ["wp_options", "wp_users", "wp_posts", "wp_postmeta"])
+        return 0, "Success"
+    return 0, ""
+
+
+def _wp_worker(site_path):
+    """ Giả lập WP worker: đọc lệnh JSON từng dòng từ stdin, trả lời theo giao thức của wp_worker.py """
+
+    def reply(response):
+        sys.stdout.write("\n" + WORKER_MARKER + json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+    reply({"ready": True, "pid": os.getpid()})
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request.get("ping"):
+            reply({"id": request["id"], "pong": True})
+            continue
+        start = time.perf_counter()
+        code, stdout = _wp_command(site_path, request["command"])
+        reply({"id": request["id"], "code": code, "stdout": stdout, "stderr": "", "time": time.perf_counter() - start})
+    return 0
+
+
+def wp(args):
+    site_path = next((arg.split("=", 1)[1].strip('"') for arg in args if arg.startswith("--path=")), os.getcwd())
+    rest = [arg for arg in args if not arg.startswith("--path=")]
+
+    time.sleep(_env_float("BENCH_WP_LATENCY"))
+
+    if rest[:1] == ["eval-file"]:
+        with open(rest[1].strip('"'), "r", encoding="utf-8") as f:
+            script = f.read()
+        if WORKER_MARKER in script:
+            return _wp_worker(site_path)
+        match = PAYLOAD_RE.search(script)
+        commands = json.loads(base64.b64decode(match.group(1))) if match else []
+        results = []
+        for command in commands:
+            start = time.perf_counter()
+            code, stdout = _wp_command(site_path, command)
+            results.append({"command": command, "code": code, "stdout": stdout, "stderr": "", "time": time.perf_counter() - start})
+        print("\n__WP_BATCH_RESULT__" + json.dumps(results))
+        return 0
+
+    code, stdout = _wp_command(site_path, " ".join(rest))
+    if stdout:
+        print(stdout)
+    return code
+
+
+# ---------------------------------------------------------------- khác
+
+def robocopy(args):
+    # Tùy chọn của robocopy viết hoa (/E, /MT:8), khác đường dẫn tuyệt đối trên Linux / macOS
+    positional = [arg.strip('"') for arg in args if not re.fullmatch(r"/[A-Z]+(:\S*)?", arg)]
+    source, destination = positional[0], positional[1]
+    shutil.copytree(source, destination, dirs_exist_ok=True)
+    return 1  # robocopy trả về 1 khi đã copy file thành công
+
+
+def noop(args):
+    return 0
+
+
+TOOLS = {
+    "mysql": mysql,
+    "mysqldump": mysqldump,
+    "wp": wp,
+    "robocopy": robocopy,
+    "laragon.exe": noop,
+    "start": noop,
+}
+
+
+if __name__ == "__main__":
+    sys.exit(TOOLS[sys.argv[1]](sys.argv[2:]))
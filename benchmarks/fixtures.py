@@ -0,0 +1,281 @@
+""" Tạo dữ liệu giả cho benchmark: WordPress core, plugin, theme, file SQL, bản backup và HTTP server cục bộ """
+
+import os
+import sys
+import json
+import zlib
+import random
+import shutil
+import zipfile
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+FAKE_TOOL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_tool.py")
+TOOLS_ON_PATH = ["mysql", "mysqldump", "wp", "robocopy", "start"]
+
+OLD_URL = "https://old-site.example.com"
+
+# Kích thước dữ liệu theo từng mức: số file mã nguồn, kích thước file SQL
+SIZES = {
+    "small": {"files": 200, "file_size": 4 * 1024, "db_mb": 1},
+    "medium": {"files": 1000, "file_size": 8 * 1024, "db_mb": 24},
+    "large": {"files": 4000, "file_size": 16 * 1024, "db_mb": 96},
+}
+
+
+def write_tool(bin_path, name, target_dir=None):
+    """ Tạo script bọc gọi fake_tool.py (file .cmd trên Windows, shell script trên Linux/macOS) """
+
+    target_dir = target_dir or bin_path
+    os.makedirs(target_dir, exist_ok=True)
+    if os.name == "nt":
+        path = os.path.join(target_dir, f"{os.path.splitext(name)[0]}.cmd")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f'@"{sys.executable}" "{FAKE_TOOL}" {name} %*\n')
+    else:
+        path = os.path.join(target_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_TOOL}" {name} "$@"\n')
+        os.chmod(path, 0o755)
+    return path
+
+
+def install_fake_tools(bin_path, laragon_path, real_mysql=False):
+    """ Đặt công cụ giả lên PATH, laragon.exe giả trong thư mục Laragon """
+
+    for name in TOOLS_ON_PATH:
+        if real_mysql and name in ("mysql", "mysqldump"):
+            continue
+        write_tool(bin_path, name)
+    write_tool(bin_path, "laragon.exe", laragon_path)
+    os.environ["PATH"] = bin_path + os.pathsep + os.environ.get("PATH", "")
+
+
+def _filler(rng, size):
+    """ Nội dung giả của một file PHP """
+    line = "<?php // " + "".join(rng.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(70)) + "\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+def make_tree(path, files, file_size, seed=0, extra=None):
+    """ Tạo cây thư mục với số file và kích thước cho trước """
+
+    rng = random.Random(seed)
+    content = _filler(rng, file_size)
+    for index in range(files):
+        folder = os.path.join(path, f"dir{index % 20:02d}", f"sub{index % 7}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"file{index}.php"), "w", encoding="utf-8") as f:
+            f.write(content)
+    for relative, text in (extra or {}).items():
+        full_path = os.path.join(path, relative)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def zip_tree(source_path, zip_path, root_name):
+    """ Nén thư mục thành tệp zip với thư mục gốc root_name """
+
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for root, _, names in os.walk(source_path):
+            for name in names:
+                full_path = os.path.join(root, name)
+                zf.write(full_path, os.path.join(root_name, os.path.relpath(full_path, source_path)))
+
+
+def make_wp_core_zip(work_path, zip_path, size):
+    """ WordPress core giả: có wp-includes/version.php, wp-content/themes mặc định """
+
+    tree = os.path.join(work_path, "wp-core")
+    make_tree(tree, size["files"], size["file_size"], seed=1, extra={
+        "wp-includes/version.php": "<?php\n$wp_version = '6.5.0';\n",
+        "wp-content/themes/twentytwentyfour/style.css": "/* Theme */\n",
+        "wp-content/plugins/index.php": "<?php\n",
+        "index.php": "<?php\n",
+    })
+    zip_tree(tree, zip_path, "wordpress")
+    shutil.rmtree(tree)
+
+
+def make_plugin_zip(work_path, zip_path, slug, files=50):
+    tree = os.path.join(work_path, slug)
+    make_tree(tree, files, 4 * 1024, seed=zlib.crc32(slug.encode()), extra={f"{slug}.php": f"<?php\n/* Plugin Name: {slug} */\n"})
+    zip_tree(tree, zip_path, slug)
+    shutil.rmtree(tree)
+
+
+def make_sql_dump(path, db_mb, prefix="wp_", url=OLD_URL, seed=0):
+    """ File SQL giống mysqldump: bảng options, users, posts, postmeta với url cũ và dữ liệu serialize """
+
+    rng = random.Random(seed)
+    target = db_mb * 1024 * 1024
+
+    # Cột của từng bảng (rút gọn, đủ cho các câu lệnh UPDATE của script)
+    columns = {
+        "options": "`option_id` bigint unsigned NOT NULL AUTO_INCREMENT, `option_name` varchar(191), `option_value` longtext, `autoload` varchar(20), PRIMARY KEY (`option_id`)",
+        "users": "`ID` bigint unsigned NOT NULL AUTO_INCREMENT, `user_login` varchar(60), `user_pass` varchar(255), `user_email` varchar(100), PRIMARY KEY (`ID`)",
+        "posts": "`ID` bigint unsigned NOT NULL AUTO_INCREMENT, `post_content` longtext, `guid` varchar(255), PRIMARY KEY (`ID`)",
+        "postmeta": "`meta_id` bigint unsigned NOT NULL AUTO_INCREMENT, `meta_value` longtext, `meta_key` varchar(255), PRIMARY KEY (`meta_id`)",
+    }
+
+    def table_header(name):
+        table = f"{prefix}{name}"
+        return (f"DROP TABLE IF EXISTS `{table}`;\n"
+                f"CREATE TABLE `{table}` ({columns[name]}) DEFAULT CHARSET=utf8mb4;\n"
+                f"LOCK TABLES `{table}` WRITE;\n")
+
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write("/*!40101 SET NAMES utf8mb4 */;\n")
+        f.write(table_header("options"))
+        f.write(f"INSERT INTO `{prefix}options` VALUES (1,'siteurl','{url}','yes'),(2,'home','{url}','yes'),"
+                f"(3,'widget_text','a:1:{{s:3:\\\"url\\\";s:{len(url)}:\\\"{url}\\\";}}','yes'),(4,'admin_email','admin@example.com','yes');\n")
+        f.write("UNLOCK TABLES;\n")
+        f.write(table_header("users"))
+        f.write(f"INSERT INTO `{prefix}users` VALUES (1,'admin','$P$Bxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx','admin@example.com');\nUNLOCK TABLES;\n")
+
+        row_id = 0
+        for name, share in (("posts", 0.65), ("postmeta", 0.35)):
+            table = f"{prefix}{name}"
+            f.write(table_header(name))
+            table_target = target * share
+            table_written = 0
+            while table_written < table_target:
+                rows = []
+                for _ in range(200):
+                    row_id += 1
+                    text = "".join(rng.choice("abcdefghij ") for _ in range(rng.randint(200, 1200)))
+                    rows.append(f"({row_id},'<a href=\\\"{url}/post-{row_id}/\\\">{text}</a>','{url}/wp-content/uploads/{row_id}.jpg')")
+                line = f"INSERT INTO `{table}` VALUES {','.join(rows)};\n"
+                f.write(line)
+                table_written += len(line)
+            f.write("UNLOCK TABLES;\n")
+
+
+def make_wpress(wpress_path, wp_content_path, db_path, url=OLD_URL):
+    """ Tệp .wpress như All-in-One WP Migration: package.json, database.sql, các tệp của wp-content """
+
+    def header(name, file_size, mtime, prefix):
+        fields = ((name, 255), (str(file_size), 14), (str(mtime), 12), (prefix, 4096))
+        return b"".join(value.encode("utf-8").ljust(width, b"\0") for value, width in fields)
+
+    def add(f, name, prefix, data):
+        f.write(header(name, len(data), 1700000000, prefix))
+        f.write(data)
+
+    package = {"SiteURL": url, "HomeURL": url, "Plugin": {"Version": "7.80"}, "Compression": {"Enabled": False}}
+    with open(wpress_path, "wb") as f:
+        add(f, "package.json", ".", json.dumps(package).encode("utf-8"))
+        with open(db_path, "rb") as sql:
+            add(f, "database.sql", ".", sql.read())
+        for root, _, names in os.walk(wp_content_path):
+            prefix = os.path.relpath(root, wp_content_path).replace(os.sep, "/")
+            for name in names:
+                with open(os.path.join(root, name), "rb") as source:
+                    add(f, name, prefix, source.read())
+        f.write(b"\0" * 4377)
+
+
+def make_dup_archive(zip_path, wp_source, db_path, url=OLD_URL):
+    """ Tệp archive như Duplicator: mã nguồn website (không có wp-config.php), file database và thông tin website cũ """
+
+    info = {"url_old": url, "wp_tableprefix": "wp_", "mu_mode": 0}
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for root, _, names in os.walk(wp_source):
+            for name in names:
+                relative = os.path.relpath(os.path.join(root, name), wp_source).replace(os.sep, "/")
+                if relative not in ("wp-config.php", "database.sql"):
+                    zf.write(os.path.join(root, name), relative)
+        zf.write(db_path, "dup-installer/dup-database__0123456789abcdef.sql")
+        zf.writestr("dup-installer/dup-archive__0123456789abcdef.txt", json.dumps(info))
+
+
+def make_backups(work_path, size, index=0):
+    """ Tạo nguồn restore cho từng phương thức, trả về {phương thức: (source_path, db_path)} """
+
+    base = os.path.join(work_path, f"backup-{index}")
+    db_path = os.path.join(base, "database.sql")
+    os.makedirs(base, exist_ok=True)
+    make_sql_dump(db_path, size["db_mb"], seed=index)
+
+    # wp: mã nguồn đầy đủ kèm file SQL
+    wp_source = os.path.join(base, "wp")
+    make_tree(wp_source, size["files"], size["file_size"], seed=index, extra={
+        "wp-includes/version.php": "<?php\n$wp_version = '6.5.0';\n",
+        "wp-config.php": "<?php\n$table_prefix = 'wp_';\n",
+    })
+    shutil.copyfile(db_path, os.path.join(wp_source, "database.sql"))
+
+    # wpcontent: thư mục wp-content
+    wpcontent_source = os.path.join(base, "wp-content")
+    make_tree(wpcontent_source, size["files"] // 2, size["file_size"], seed=index + 100)
+
+    # ai1: tệp .wpress với wp-content và database.sql có tiền tố SERVMASK_PREFIX_
+    ai1_source = os.path.join(base, "backup.wpress")
+    wpress_sql = os.path.join(base, "wpress.sql")
+    make_sql_dump(wpress_sql, size["db_mb"], prefix="SERVMASK_PREFIX_", seed=index)
+    make_wpress(ai1_source, wpcontent_source, wpress_sql)
+    os.remove(wpress_sql)
+
+    # dup: installer.php + tệp archive có mã nguồn, dup-installer/dup-database__*.sql và dup-archive__*.txt
+    dup_source = os.path.join(base, "dup")
+    os.makedirs(dup_source, exist_ok=True)
+    with open(os.path.join(dup_source, "installer.php"), "w", encoding="utf-8") as f:
+        f.write("<?php\n")
+    make_dup_archive(os.path.join(dup_source, f"backup_{index}_archive.zip"), wp_source, db_path)
+
+    return {
+        "wp": (wp_source, None),
+        "wpcontent": (wpcontent_source, db_path),
+        "ai1": (ai1_source, None),
+        "dup": (dup_source, None),
+    }
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class LocalServer:
+    """ HTTP server cục bộ thay cho các url trong resource.json """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=directory))
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_resources(work_path, http_path, base_url, size):
+    """ Tạo các tệp zip để phục vụ qua HTTP và resource.json trỏ tới server cục bộ """
+
+    os.makedirs(http_path, exist_ok=True)
+    make_wp_core_zip(work_path, os.path.join(http_path, "latest.zip"), size)
+
+    plugins = []
+    for index, slug in enumerate(["all-in-one-wp-migration", "all-in-one-wp-migration-unlimited-extension", "seo-by-rank-math"]):
+        make_plugin_zip(work_path, os.path.join(http_path, f"{slug}.zip"), slug)
+        plugins.append({"id": index, "name": slug, "file_name": f"{slug}.zip", "url": f"{base_url}/{slug}.zip"})
+
+    make_plugin_zip(work_path, os.path.join(http_path, "flatsome.zip"), "flatsome", files=300)
+    themes = [{"id": 0, "name": "Flatsome", "file_name": "flatsome.zip", "url": f"{base_url}/flatsome.zip"}]
+
+    resource_path = os.path.join(work_path, "resource.json")
+    with open(resource_path, "w", encoding="utf-8") as f:
+        json.dump({"plugins": plugins, "themes": themes}, f, indent=4)
+
+    return resource_path, f"{base_url}/latest.zip", plugins
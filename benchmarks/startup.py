@@ -0,0 +1,107 @@
+""" Kiểm tra thời gian khởi động của script (python -X importtime) so với ngân sách cho từng lệnh.
+
+Ví dụ:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 10 --scale 1.5     # nới ngân sách trên máy chậm
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Module cần import cho từng lệnh và ngân sách thời gian import (ms)
+STARTUP_PATHS = {
+    "help": (["main"], 120),
+    "delete": (["main", "delete_website"], 150),
+    "create": (["main", "wp_installer"], 250),
+    "restore": (["main", "restore"], 250),
+    "bulk_restore": (["main", "bulk_restore"], 250),
+}
+
+# Thư viện nặng chỉ được import khi thật sự dùng (tải file, kết nối pool)
+LAZY_MODULES = ["aiohttp", "aiomysql"]
+
+
+def measure_imports(modules):
+    """ Chạy python -X importtime, trả về (tổng thời gian ms, {module: thời gian cộng dồn ms}, lỗi) """
+
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO_DIR, capture_output=True, text=True)
+
+    total_us = 0
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue
+        name = parts[2].strip()
+        total_us += self_us
+        cumulative[name] = cumulative_us / 1000
+
+    error = None
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit {result.returncode}"
+    return total_us / 1000, cumulative, error
+
+
+def measure_help(runs):
+    """ Thời gian chạy `python main.py --help` (ms, trung vị) """
+
+    import time
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "main.py", "--help"], cwd=REPO_DIR, capture_output=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kiểm tra thời gian khởi động")
+    parser.add_argument("--runs", type=int, default=5, help="Số lần đo mỗi lệnh (lấy trung vị)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Nhân ngân sách thời gian với hệ số này")
+    parser.add_argument("--top", type=int, default=5, help="Số module chậm nhất cần in ra")
+    args = parser.parse_args()
+
+    failed = []
+    for name, (modules, budget_ms) in STARTUP_PATHS.items():
+        budget_ms *= args.scale
+        samples = [measure_imports(modules) for _ in range(args.runs)]
+        error = next((sample[2] for sample in samples if sample[2]), None)
+        if error:
+            print(f"{name:<14} không import được: {error}")
+            failed.append(name)
+            continue
+
+        total_ms = statistics.median(sample[0] for sample in samples)
+        cumulative = samples[-1][1]
+        loaded_lazy = [module for module in LAZY_MODULES if module in cumulative]
+
+        status = "OK" if total_ms <= budget_ms and not loaded_lazy else "VƯỢT"
+        print(f"{name:<14} {total_ms:7.1f} ms / {budget_ms:.0f} ms  {status}")
+        if loaded_lazy:
+            print(f"  - import sớm thư viện nặng: {', '.join(loaded_lazy)}")
+        if status != "OK":
+            failed.append(name)
+            slowest = sorted(((ms, module) for module, ms in cumulative.items() if module not in modules), reverse=True)[:args.top]
+            for ms, module in slowest:
+                print(f"  - {module}: {ms:.1f} ms")
+
+    print(f"\n`main.py --help`: {measure_help(args.runs):.0f} ms (trung vị {args.runs} lần)")
+
+    if failed:
+        print(f"\nVượt ngân sách khởi động: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
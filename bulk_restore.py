@@ -1,93 +1,169 @@
-import csv, os, sys, subprocess, aiofiles, asyncio
+import csv, os, sys, time, aiofiles, asyncio
+import config
 from main import get_laragon_path
 from datetime import datetime
-from database_handler import check_database_exists
+from site_inventory import get_site_inventory
+from database_pool import db_pool
+from download_cache import get_download_cache
+from scheduler import RestoreScheduler
+from preflight import Preflight
+from manifest_reader import open_manifest, ManifestError
+from restore_journal import RestoreJournal
+from tracing import set_site, span
+from commands import reload_apache
+from wp_worker import wp_workers
+from results_log import ResultsLog, BulkProgress, read_results
 
 
-laragon_path, laragon_sites_path, cached_path = get_laragon_path()
-
 class BulkRestore:
     """ Handle bulk restore from CSV file """
     
-    def __init__(self, csv_path):
+    def __init__(self, csv_path, workers=None, disk_jobs=None, sql_jobs=None, php_jobs=None, resume=False, preflight_only=False):
+        laragon_path, laragon_sites_path, cached_path = get_laragon_path()
         self.laragon_path = laragon_path
         self.laragon_sites_path = laragon_sites_path
         self.cached_path = cached_path
 
         self.csv_path = csv_path
         self.protocol = "http://"  # Default protocol
-        self.results = []  # Store results of each website restore
+        self.results_log = None  # Kết quả từng website, ghi ngay khi website xong
+        self.progress = BulkProgress()
+        self.limits = {"workers": workers, "disk_jobs": disk_jobs, "sql_jobs": sql_jobs, "php_jobs": php_jobs}
+        self.resume = resume
+        self.preflight_only = preflight_only
+        self.journal = None
+        self.inventory = get_site_inventory(os.path.dirname(laragon_sites_path))
+
+    def _journal_path(self):
+        """ Nhật ký restore nằm cạnh file kết quả, theo tên file CSV """
+        csv_name = os.path.splitext(os.path.basename(self.csv_path))[0]
+        return os.path.join(os.path.dirname(self.csv_path), "logs", f"{csv_name}.journal.jsonl")
+
+    def _results_path(self):
+        """ File kết quả của lần chạy này: logs/bulk_restore_results_<thời gian>.jsonl (file .csv cùng tên khi xong) """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.join(os.path.dirname(self.csv_path), "logs", f"bulk_restore_results_{timestamp}.jsonl")
+
+    def _record(self, result):
+        result["finished_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.results_log.append(result)
+
+    async def _print_progress(self):
+        """ In tiến độ định kỳ trong lúc bulk restore chạy """
+        while True:
+            await asyncio.sleep(config.bulk_progress_interval)
+            self.progress.print()
 
-    async def _check_website_exists(self, website_name: str, website_path: str) -> tuple[bool, str]:
-        """Kiểm tra website đã tồn tại hay chưa"""
-        if os.path.exists(website_path):
-            return True, "Thư mục website đã tồn tại"
-        if await check_database_exists(website_name):
-            return True, "Database đã tồn tại"
-        return False, ""
+    @staticmethod
+    def _new_result(row, line):
+        """ Kết quả của một dòng trong file danh sách (line: số dòng, để tìm lại dòng bị lỗi) """
+        return {
+            "line": line,
+            "website_name": (row.get("website_name") or "").strip(),
+            "restore_method": (row.get("restore_method") or "").strip().lower(),
+            "source_path": (row.get("source_path") or "").strip(),
+            "db_path": row["db_path"].strip() if row.get("db_path") is not None else None,
+            "status": "Failed",
+            "error_message": "",
+            "missing_requirements": []
+        }
 
     async def restore_from_csv(self):
-        """ Restore multiple websites from CSV file """
-        
-        if not os.path.exists(self.csv_path):
-            print(f"Tệp '{self.csv_path}' không tồn tại. Vui lòng kiểm tra lại đường dẫn!")
-            sys.exit(1)
-        if not self.csv_path.endswith(".csv"):
-            print(f"Tệp '{self.csv_path}' không phải là file csv! Script chỉ hoạt động với file csv!")
+        """ Restore multiple websites from a manifest file (CSV, JSONL, YAML), streamed row by row """
+
+        try:
+            manifest = await open_manifest(self.csv_path)
+        except ManifestError as e:
+            print(e)
             sys.exit(1)
 
-        print(f"\nĐọc file CSV: {self.csv_path}")
-        
-        # Thử đọc file với các encoding khác nhau
-        encodings = ['utf-8', 'utf-8-sig', 'utf-16', 'cp1258']
-        content = None
-        
-        for encoding in encodings:
+        print(f"\nĐọc file {manifest.format.upper()}: {self.csv_path} (encoding: {manifest.encoding})")
+
+        # Chỉ kiểm tra: không tạo nhật ký mới (giữ nguyên nhật ký của lần chạy trước)
+        if not self.preflight_only or self.resume:
+            self.journal = RestoreJournal(self._journal_path(), self.resume)
+
+        # Quét website / database một lần cho cả file, từng dòng được kiểm tra ngay khi đọc được
+        await self.inventory.refresh()
+        preflight = Preflight(self.inventory, self.laragon_sites_path, self.journal, self.limits["workers"])
+
+        async def checked_rows():
             try:
-                async with aiofiles.open(self.csv_path, 'r', encoding=encoding) as f:
-                    content = await f.read()
-                    break
-            except UnicodeDecodeError:
-                continue
-        
-        if content is None:
-            print("Không thể đọc file CSV. Vui lòng đảm bảo file được mã hóa UTF-8 hoặc UTF-16.")
-            sys.exit(1)
-            
-        # Đọc nội dung CSV từ string
-        reader = csv.DictReader(content.splitlines())
-            
-        # Kiểm tra các cột bắt buộc
-        required_columns = ["website_name", "source_path", "restore_method"]
-        missing_columns = [col for col in required_columns if col not in reader.fieldnames]
-        if missing_columns:
-            print(f"Thiếu các cột bắt buộc trong file CSV: {', '.join(missing_columns)}")
-            print("File CSV phải có các cột: website_name, source_path, restore_method")
-            sys.exit(1)
+                async for item in manifest:
+                    if item.error:
+                        yield preflight.reject(item.line, item.data, item.error)
+                    else:
+                        yield await preflight.check(item.line, item.data)
+            except ManifestError as e:
+                print(e)
+                sys.exit(1)
 
-        tasks = []
+        if self.preflight_only:
+            async for _ in checked_rows():
+                pass
+            preflight.report.print()
+            if self.journal:
+                self.journal.close()
+            sys.exit(1 if preflight.report.invalid_rows else 0)
 
-        for index, row in enumerate(reader):
-            task = self._restore_website(row, index)
-            tasks.append(task)
+        self.results_log = ResultsLog(self._results_path())
+        print(f"Kết quả từng website được ghi vào: {self.results_log.path}")
 
-        await asyncio.gather(*tasks)
+        async def jobs():
+            async for check in checked_rows():
+                if check.ok and not check.skipped:
+                    self.progress.add(check.size)
+                    yield check.size, (check.row, check.line, check.size)
+                    continue
+                result = self._new_result(check.row, check.line)
+                if check.skipped:
+                    result["status"] = "Success"
+                    result["error_message"] = "Đã restore ở lần chạy trước"
+                else:
+                    result["error_message"] = "; ".join(check.errors)
+                    result["missing_requirements"] = check.missing_requirements
+                    print(f"Bỏ qua dòng {check.line} ({check.website_name or 'không có tên'}): {result['error_message']}")
+                    self.progress.reject()
+                self._record(result)
+            self.progress.reading = False
+
+        # Restore chạy ngay khi đọc được dòng đầu tiên, website lớn trong số đã đọc chạy trước
+        scheduler = RestoreScheduler(**self.limits)
+        ticker = asyncio.create_task(self._print_progress())
+        try:
+            await scheduler.run(jobs(), lambda job: self._restore_website(*job))
+        finally:
+            ticker.cancel()
+            self.results_log.close()
+            self.journal.close()
+        self.progress.print()
 
         await self._export_results()
         await self._print_summary()
 
-    async def _restore_website(self, row, index):
-        """ Xử lý restore một website cụ thể (chạy song song) """
+    async def _restore_website(self, row, line, size):
+        """ Xử lý restore một website cụ thể (chạy song song), ghi kết quả ngay khi xong """
 
-        result = {
-            "website_name": row["website_name"].strip(),
-            "restore_method": row["restore_method"].strip().lower(),
-            "source_path": row["source_path"].strip(),
-            "db_path": row["db_path"].strip() if "db_path" in row else None,
-            "status": "Failed",
-            "error_message": "",
-            "missing_requirements": []
-        }
+        set_site(row["website_name"].strip())
+        self.progress.start()
+        result = self._new_result(row, line)
+        start = time.perf_counter()
+        try:
+            with span("restore_site", website=row["website_name"].strip(), method=row["restore_method"].strip().lower()):
+                await self._restore_website_steps(row, result)
+        finally:
+            await wp_workers.close(os.path.join(self.laragon_sites_path, row["website_name"].strip()))
+            result["duration"] = round(time.perf_counter() - start, 3)
+            if result["status"] != "Success" and not result["error_message"]:
+                result["error_message"] = "Bị dừng giữa chừng"
+            self._record(result)
+            self.progress.finish(size, result["status"] == "Success")
+            self.progress.print()
+
+    async def _restore_website_steps(self, row, result):
+        """ Restore một dòng đã qua bước kiểm tra (Preflight), cập nhật result """
+
+        restore = None
 
         try:
             print(f"\n{'='*50}")
@@ -97,15 +173,9 @@ class BulkRestore:
             inputs = WebsiteInputs()
             inputs.website_name = result["website_name"]
             inputs.website_path = os.path.join(self.laragon_sites_path, inputs.website_name)
+            # Giữ tên cho website này trong danh sách website
+            self.inventory.add(inputs.website_name)
 
-            # Kiểm tra website đã tồn tại chưa
-            exists, error_message = await self._check_website_exists(inputs.website_name, inputs.website_path)
-            if exists:
-                result["error_message"] = error_message
-                print(f"{result['error_message']}")
-                self.results.append(result)
-                return
-            
             # Cập nhật thông tin admin nếu có
             if "admin_username" in row and row["admin_username"].strip():
                 inputs.admin_username = row["admin_username"].strip()
@@ -116,26 +186,11 @@ class BulkRestore:
             if "ssl" in row and row["ssl"].strip().lower() in ['true', '1', 'yes']:
                 inputs.ssl = True
 
-            # Kiểm tra phương thức restore và source path
-            required_restore_method = ["ai1", "dup", "wpcontent", "wp"]
-            restore_method = result["restore_method"]
-            if restore_method not in required_restore_method:
-                result["error_message"] = f"Phương thức restore không hợp lệ: {restore_method}"
-                print(result["error_message"])
-                self.results.append(result)
-                return
-            
-            # Kiểm tra source path
-            if not os.path.exists(result["source_path"]):
-                result["error_message"] = f"Đường dẫn source path không tồn tại: {result['source_path']}"
-                print(result["error_message"])
-                self.results.append(result)
-                return
-            
             # Tạo instance Restore
             from restore import Restore
-            restore = Restore(inputs, True)
+            restore = Restore(inputs, True, self.journal)
 
+            restore_method = result["restore_method"]
             if restore_method == "ai1":
                 await restore.restore_ai1(result["source_path"])
             elif restore_method == "dup":
@@ -145,48 +200,31 @@ class BulkRestore:
                 await restore.restore_wp(result["source_path"])
 
             elif restore_method == "wpcontent":
-                if not result["db_path"]:
-                    result["error_message"] = "Không tìm thấy đường dẫn database"
-                    result["missing_requirements"].append("db_path")
-                    print(result["error_message"])
-                    self.results.append(result)
-                    return
-                db_path = result["db_path"].strip()
-
-                if not os.path.exists(db_path):
-                    result["error_message"] = "Đường dẫn database không tồn tại"
-                    print(result["error_message"])
-                    self.results.append(result)
-                    return
-                
-                await restore.restore_wpcontent(result["source_path"], db_path)
+                await restore.restore_wpcontent(result["source_path"], result["db_path"])
 
+            self.journal.mark_completed(inputs.website_name)
             result["status"] = "Success"
-            self.results.append(result)
             print(f"Website {result['website_name']} đã được restore thành công!")
             
         except Exception as e:
             result["error_message"] = str(e)
             print(f"Lỗi khi restore website {result['website_name']}: {e}")
-            self.results.append(result)
-            return               
+        finally:
+            if restore is not None:
+                result["phase_times"] = restore.phase_times
                 
 
     async def _export_results(self):
-        """Export results to a CSV file"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")        
-        log_dir = os.path.join(os.path.dirname(self.csv_path), "logs")
+        """Export results to a CSV file, built from the JSONL results log"""
+        output_file = os.path.splitext(self.results_log.path)[0] + ".csv"
         
-        os.makedirs(log_dir, exist_ok=True)
-        output_file = os.path.join(log_dir, f"bulk_restore_results_{timestamp}.csv")
-        
-        fieldnames = ["website_name", "restore_method", "source_path", "db_path", "status", "error_message", "missing_requirements"]
+        fieldnames = ["line", "website_name", "restore_method", "source_path", "db_path", "status", "error_message", "missing_requirements", "duration"]
         
         # Ghi file với UTF-8-SIG để Excel có thể đọc được tiếng Việt
         async with aiofiles.open(output_file, "w", encoding="utf-8-sig", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
             await writer.writeheader()
-            for result in self.results:
+            for result in read_results(self.results_log.path):
                 # Make a copy of the result to avoid modifying the original
                 row = result.copy()
                 # Join the missing requirements list properly
@@ -197,9 +235,15 @@ class BulkRestore:
         print(f"\nKết quả đã được xuất ra file: {output_file}")
 
     async def _print_summary(self):
-        """Print a summary of the restoration results"""
-        total = len(self.results)
-        successful = sum(1 for r in self.results if r["status"] == "Success")
+        """Print a summary of the restoration results, built from the JSONL results log"""
+        total = successful = 0
+        failures = []
+        for result in read_results(self.results_log.path):
+            total += 1
+            if result["status"] == "Success":
+                successful += 1
+            else:
+                failures.append(result)
         failed = total - successful
         
         print("\n" + "="*50)
@@ -210,14 +254,17 @@ class BulkRestore:
         
         if failed > 0:
             print("\nDanh sách website thất bại:")
-            for result in self.results:
-                if result["status"] == "Failed":
-                    print(f"- {result['website_name']}: {result['error_message']}")
-                    if result["missing_requirements"]:
-                        print(f"Thiếu yêu cầu: {', '.join(result['missing_requirements'])}")
+            for result in failures:
+                print(f"- Dòng {result.get('line', '?')} ({result['website_name'] or 'không có tên'}): {result['error_message']}")
+                if result["missing_requirements"]:
+                    print(f"Thiếu yêu cầu: {', '.join(result['missing_requirements'])}")
+
+        db_pool.print_stats()
+        wp_workers.print_stats()
+        get_download_cache(self.cached_path).print_stats()
 
         # Reload Apache Server
-        await asyncio.to_thread(subprocess.run, f'{os.path.join(self.laragon_path, "laragon.exe")} reload apache', shell=True)
+        await reload_apache(self.laragon_path)
         print("\nHoàn tất quá trình bulk restore!") 
 
 
@@ -0,0 +1,175 @@
+""" Tạo tiến trình con có đo thời gian CPU của riêng tiến trình đó (cả các tiến trình con của nó).
+
+POSIX: script tự thu hồi tiến trình bằng os.wait4 (asyncio thu hồi bằng waitpid nên mất rusage), stdin / stdout / stderr
+vẫn là StreamWriter / StreamReader của asyncio. Windows: tiến trình được gắn vào job object, thời gian CPU lấy từ
+thông tin accounting của job (gồm php của wp.bat, mysql của cmd...).
+"""
+
+import os
+import asyncio
+import threading
+import subprocess
+
+
+# Kích thước bộ đệm mặc định của StreamReader (giống asyncio)
+STREAM_LIMIT = 2 ** 16
+
+
+class PosixProcess:
+    """ Tiến trình con trên POSIX, cùng giao diện với asyncio.subprocess.Process (stdin, stdout, stderr, pid,
+    returncode, wait, kill, terminate), cpu_time có giá trị sau khi tiến trình kết thúc """
+
+    def __init__(self, popen, loop):
+        self._popen = popen
+        self.pid = popen.pid
+        self.returncode = None
+        self.cpu_time = 0.0
+        self.stdin = self.stdout = self.stderr = None
+        self._exited = loop.create_future()
+        # Mỗi tiến trình một thread chờ (giống ThreadedChildWatcher của asyncio), không dùng thread pool chung
+        threading.Thread(target=self._reap, args=(loop,), name=f"wait4-{self.pid}", daemon=True).start()
+
+    def _reap(self, loop):
+        try:
+            _, status, usage = os.wait4(self.pid, 0)
+            returncode, cpu_time = os.waitstatus_to_exitcode(status), usage.ru_utime + usage.ru_stime
+        except ChildProcessError:
+            returncode, cpu_time = 255, 0.0
+        try:
+            loop.call_soon_threadsafe(self._set_exited, returncode, cpu_time)
+        except RuntimeError:
+            # Event loop đã đóng
+            pass
+
+    def _set_exited(self, returncode, cpu_time):
+        self.returncode = self._popen.returncode = returncode
+        self.cpu_time = cpu_time
+        if not self._exited.done():
+            self._exited.set_result(returncode)
+
+    async def wait(self):
+        return await asyncio.shield(self._exited)
+
+    def send_signal(self, signal_number):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, signal_number)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self):
+        import signal
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        import signal
+        self.send_signal(signal.SIGKILL)
+
+
+async def _create_posix(args, stdin, stdout, stderr, cwd, limit, **kwargs):
+    loop = asyncio.get_running_loop()
+    popen = subprocess.Popen(args, stdin=stdin, stdout=stdout, stderr=stderr, cwd=cwd, start_new_session=True, **kwargs)
+    process = PosixProcess(popen, loop)
+    try:
+        if popen.stdin is not None:
+            transport, protocol = await loop.connect_write_pipe(lambda: asyncio.streams.FlowControlMixin(loop=loop), popen.stdin)
+            process.stdin = asyncio.StreamWriter(transport, protocol, None, loop)
+        for name in ("stdout", "stderr"):
+            pipe = getattr(popen, name)
+            if pipe is not None:
+                reader = asyncio.StreamReader(limit=limit, loop=loop)
+                await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader, loop=loop), pipe)
+                setattr(process, name, reader)
+    except BaseException:
+        process.kill()
+        raise
+    return process
+
+
+def _windows_api():
+    import ctypes
+    from ctypes import wintypes
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.CreateJobObjectW.restype = wintypes.HANDLE
+    kernel32.CreateJobObjectW.argtypes = [ctypes.c_void_p, wintypes.LPCWSTR]
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+    kernel32.AssignProcessToJobObject.argtypes = [wintypes.HANDLE, wintypes.HANDLE]
+    kernel32.QueryInformationJobObject.argtypes = [wintypes.HANDLE, ctypes.c_int, ctypes.c_void_p, wintypes.DWORD, ctypes.c_void_p]
+    kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+    return kernel32
+
+
+class _JobAccounting:
+    """ JOBOBJECT_BASIC_ACCOUNTING_INFORMATION, thời gian tính theo đơn vị 100ns """
+
+    PROCESS_SET_QUOTA = 0x0100
+    PROCESS_TERMINATE = 0x0001
+    JOB_OBJECT_BASIC_ACCOUNTING_INFORMATION = 1
+
+    def __init__(self, pid):
+        self.kernel32 = _windows_api()
+        self.job = self.kernel32.CreateJobObjectW(None, None)
+        if not self.job:
+            return
+        handle = self.kernel32.OpenProcess(self.PROCESS_SET_QUOTA | self.PROCESS_TERMINATE, False, pid)
+        assigned = bool(handle) and self.kernel32.AssignProcessToJobObject(self.job, handle)
+        if handle:
+            self.kernel32.CloseHandle(handle)
+        if not assigned:
+            self.close()
+
+    def cpu_time(self):
+        import ctypes
+        from ctypes import wintypes
+
+        class Info(ctypes.Structure):
+            _fields_ = [
+                ("TotalUserTime", ctypes.c_int64), ("TotalKernelTime", ctypes.c_int64),
+                ("ThisPeriodTotalUserTime", ctypes.c_int64), ("ThisPeriodTotalKernelTime", ctypes.c_int64),
+                ("TotalPageFaultCount", wintypes.DWORD), ("TotalProcesses", wintypes.DWORD),
+                ("ActiveProcesses", wintypes.DWORD), ("TotalTerminatedProcesses", wintypes.DWORD),
+            ]
+
+        if not self.job:
+            return 0.0
+        info = Info()
+        if not self.kernel32.QueryInformationJobObject(self.job, self.JOB_OBJECT_BASIC_ACCOUNTING_INFORMATION,
+                                                       ctypes.byref(info), ctypes.sizeof(info), None):
+            return 0.0
+        return (info.TotalUserTime + info.TotalKernelTime) / 10_000_000
+
+    def close(self):
+        if self.job:
+            self.kernel32.CloseHandle(self.job)
+            self.job = None
+
+
+async def create_process(args, stdin=None, stdout=None, stderr=None, cwd=None, limit=STREAM_LIMIT, **kwargs):
+    """ Tạo tiến trình con (tiến trình nằm trong nhóm / job riêng), đọc thời gian CPU bằng process_cpu_time sau khi kết thúc """
+
+    if os.name != "nt":
+        return await _create_posix(args, stdin, stdout, stderr, cwd, limit, **kwargs)
+
+    process = await asyncio.create_subprocess_exec(*args, stdin=stdin, stdout=stdout, stderr=stderr, cwd=cwd, limit=limit, **kwargs)
+    try:
+        process.job_accounting = _JobAccounting(process.pid)
+    except OSError:
+        process.job_accounting = None
+    return process
+
+
+def process_cpu_time(process):
+    """ Thời gian CPU (user + system, giây) của tiến trình đã kết thúc và các tiến trình con của nó """
+
+    if isinstance(process, PosixProcess):
+        return process.cpu_time
+    accounting = getattr(process, "job_accounting", None)
+    if accounting is None:
+        return 0.0
+    try:
+        return accounting.cpu_time()
+    finally:
+        accounting.close()
+        process.job_accounting = None
@@ -1,56 +1,233 @@
-import subprocess
+import os
+import time
+import codecs
+import signal
+import shutil
 import asyncio
+import contextlib
+from dataclasses import dataclass
+import config
+from scheduler import limits
+from tracing import span, add_cpu
+from child_process import create_process, process_cpu_time
 
 
-async def run_command(command, print_output=False, print_text=None):
-    """ Chạy lệnh """
+READ_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class CommandResult:
+    """ Kết quả chạy một lệnh: mã thoát, output, thời gian chạy, bị dừng do quá thời gian hay không chạy được """
+
+    args: list
+    returncode: int = None
+    stdout: str = ""
+    stderr: str = ""
+    duration: float = 0.0
+    timed_out: bool = False
+    error: str = None
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out and self.error is None
+
+
+# Giới hạn số tiến trình con chạy đồng thời trong toàn bộ script (tạo khi cần, gắn với event loop đang chạy)
+_process_slots = None
+
+
+def _get_process_slots():
+    global _process_slots
+    if _process_slots is None:
+        _process_slots = asyncio.Semaphore(config.process_limit) if config.process_limit else contextlib.nullcontext()
+    return _process_slots
+
+
+def _resolve(args):
+    """ Tìm đường dẫn đầy đủ của chương trình (trên Windows tìm cả .bat / .cmd như wp.bat) """
+
+    args = [str(arg) for arg in args]
+    executable = shutil.which(args[0])
+    if executable:
+        args[0] = executable
+    return args
+
+
+async def kill_process_tree(process):
+    """ Dừng tiến trình và toàn bộ tiến trình con của nó (php của wp.bat, mysql của cmd...) """
+
+    if process.returncode is not None:
+        return
 
     try:
-        if print_text:
-            print(print_text)
+        if os.name == "nt":
+            killer = await asyncio.create_subprocess_exec(
+                "taskkill", "/F", "/T", "/PID", str(process.pid),
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+            )
+            await killer.wait()
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, OSError):
+        pass
 
-        result = await asyncio.to_thread(subprocess.run, command, shell=True, capture_output=True, text=True, encoding='utf-8', errors='replace')
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+    await process.wait()
 
-        if print_output:
-            print(result.stdout)
 
-        if result.stderr:
-            print(result.stderr)
-            
-        return result
-    
-    except Exception as e:
-        print(f'Đã xảy ra lỗi không xác định: {e}')
-        return None
+@contextlib.asynccontextmanager
+async def spawn(args, stdin=None, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, cwd=None, limited=True, **kwargs):
+    """ async with spawn([...]) as process: chạy tiến trình trong giới hạn số tiến trình chung,
+    tiến trình (cả cây tiến trình con) bị dừng nếu khối lệnh kết thúc trước, bị hủy hoặc lỗi.
+    Thời gian CPU của tiến trình được cộng vào span đang chạy khi khối lệnh kết thúc.
+    limited=False cho tiến trình chạy lâu (WP worker) để không giữ suất của các lệnh ngắn """
 
-# async def run_command(cmd, print_output=False, print_text=None):
-#     if print_text:
-#         print(print_text)
+    async with _get_process_slots() if limited else contextlib.nullcontext():
+        # Tiến trình con chạy trong nhóm riêng để có thể dừng cả cây tiến trình
+        process = await create_process(_resolve(args), stdin=stdin, stdout=stdout, stderr=stderr, cwd=cwd, **kwargs)
+        try:
+            yield process
+        finally:
+            if process.returncode is None:
+                await kill_process_tree(process)
+            # CPU của riêng tiến trình này, cộng vào span đang chạy (span của lệnh / bảng đang import)
+            add_cpu(process_cpu_time(process))
 
-#     process = await asyncio.create_subprocess_shell(cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-#     stdout, stderr = await process.communicate()
-#     if print_output:
-#         print(stdout.decode())
-#     if stderr:
-#         print(stderr.decode())
-#     return stdout
 
+async def _read_stream(stream, chunks, echo):
+    """ Đọc output theo từng đoạn khi tiến trình đang chạy (không giới hạn độ dài dòng như readline) """
 
-async def run_sql_command(command, print_text=None):
-    """ Chạy lệnh SQL """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        data = await stream.read(READ_CHUNK_SIZE)
+        text = decoder.decode(data, final=not data)
+        if text:
+            if chunks is not None:
+                chunks.append(text)
+            if echo:
+                print(text, end="", flush=True)
+        if not data:
+            break
 
-    mysql_cmd = f'mysql -u root {command}'    
 
+async def _write_input(process, data):
     try:
-        if print_text:
-            print(print_text)
-
-        result = await asyncio.to_thread(subprocess.run, mysql_cmd, shell=True, capture_output=True, text=True, encoding='utf-8', errors='replace')
-
-        if result.stderr:
-            print(result.stderr)
-            exit(1)
-        return result
-    except Exception as e:
-        print(f'Đã xảy ra lỗi không xác định: {e}')
-        exit(1)
\ No newline at end of file
+        process.stdin.write(data.encode("utf-8") if isinstance(data, str) else data)
+        await process.stdin.drain()
+        process.stdin.close()
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+
+
+async def execute(args, input=None, timeout=None, print_output=False, capture=True, cwd=None):
+    """ Chạy lệnh (danh sách tham số, không qua shell) và đọc output trong lúc chạy.
+    capture=False: không giữ stdout trong bộ nhớ (robocopy...). Không bao giờ raise lỗi của tiến trình,
+    trả về CommandResult; chỉ CancelledError được raise lại sau khi đã dừng cây tiến trình """
+
+    result = CommandResult(args=[str(arg) for arg in args])
+    stdout, stderr = [], []
+    start = time.perf_counter()
+
+    try:
+        stdin = asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL
+        async with spawn(args, stdin=stdin, cwd=cwd) as process:
+            tasks = [
+                _read_stream(process.stdout, stdout if capture else None, print_output),
+                _read_stream(process.stderr, stderr, False),
+            ]
+            if input is not None:
+                tasks.append(_write_input(process, input))
+
+            async def communicate():
+                await asyncio.gather(*tasks)
+                return await process.wait()
+
+            try:
+                result.returncode = await asyncio.wait_for(communicate(), timeout)
+            except asyncio.TimeoutError:
+                result.timed_out = True
+                await kill_process_tree(process)
+                result.returncode = process.returncode
+    except OSError as e:
+        result.error = str(e)
+
+    result.stdout = "".join(stdout)
+    result.stderr = "".join(stderr)
+    result.duration = time.perf_counter() - start
+    return result
+
+
+async def run_command(args, print_output=False, print_text=None, resource=None, timeout=None, input=None, capture=True, cwd=None):
+    """ Chạy lệnh, trả về CommandResult.
+    args: danh sách tham số, ví dụ ["wp", "--path=...", "plugin", "activate", "--all"]
+    resource ("disk", "sql", "php") để giới hạn số lệnh cùng loại chạy đồng thời
+    timeout (giây): quá thời gian thì dừng cả cây tiến trình, mặc định config.command_timeout """
+
+    if print_text:
+        print(print_text)
+
+    timeout = config.command_timeout if timeout is None else timeout
+    async with limits.acquire(resource):
+        with span("subprocess", "subprocess", command=" ".join(map(str, args))[:200]) as current:
+            if input is not None:
+                current.add_bytes(len(input.encode()) if isinstance(input, str) else len(input))
+            result = await execute(args, input=input, timeout=timeout, print_output=print_output, capture=capture, cwd=cwd)
+
+    if result.error:
+        print(f"Không chạy được lệnh '{result.args[0]}': {result.error}")
+    elif result.timed_out:
+        print(f"Lệnh '{' '.join(result.args)[:200]}' chạy quá {timeout} giây, đã dừng.")
+
+    if result.stderr:
+        print(result.stderr)
+
+    return result
+
+
+def mysql_args(db_name=None, *options, program='mysql'):
+    """ Tham số mysql CLI (hoặc program: mysqldump...) với tài khoản trong config """
+
+    args = [program, '-u', config.db_user, *options]
+    if config.db_password:
+        args.append(f'--password={config.db_password}')
+    if db_name:
+        args.append(db_name)
+    return args
+
+
+async def run_sql_command(sql, db_name=None, print_text=None):
+    """ Chạy câu lệnh SQL qua mysql -e, trả về CommandResult (người gọi kiểm tra result.ok) """
+
+    return await run_command(mysql_args(db_name, '-e', sql), print_text=print_text)
+
+
+async def run_sql_script(sql, db_name=None):
+    """ Chạy script SQL qua stdin của mysql CLI (một tiến trình cho cả script), giữ một suất "sql" như các lệnh mysql khác """
+
+    args = mysql_args(db_name, '--batch', '--raw', '--skip-column-names')
+    async with limits.acquire("sql"):
+        with span("subprocess", "subprocess", command="mysql (script)") as current:
+            current.add_bytes(len(sql.encode()) if isinstance(sql, str) else len(sql))
+            return await execute(args, input=sql, timeout=config.command_timeout)
+
+
+async def reload_apache(laragon_path):
+    """ Reload Apache Server của Laragon """
+    return await run_command([os.path.join(laragon_path, "laragon.exe"), "reload", "apache"], timeout=60)
+
+
+async def open_browser(url):
+    """ Mở url bằng trình duyệt mặc định (lệnh start của cmd trên Windows, module webbrowser trên hệ điều hành khác).
+    Trả về True nếu mở được """
+
+    if os.name == "nt":
+        return (await run_command(["cmd", "/c", "start", "", url], timeout=30)).ok
+
+    import webbrowser
+    opened = await asyncio.to_thread(webbrowser.open, url)
+    if not opened:
+        print(f"Không mở được trình duyệt, hãy mở {url}")
+    return opened
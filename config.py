@@ -11,5 +11,95 @@ language = "vi"
 # Đường dẫn đến file resource.json
 resource_path = "resource.json"
 
+# File options cho website mới và tên bộ options được dùng
+options_profile_path = "options_profile.json"
+options_profile = "default"
+
 # Đường dẫn đến file bulk_restore.csv
 bulk_restore_path = "bulk_restore.csv"
+
+# Địa chỉ tải WordPress core
+wp_core_url = "https://wordpress.org/latest.zip"
+
+# Số tiến trình con (wp, mysql, robocopy...) chạy đồng thời tối đa trong toàn bộ script, None để không giới hạn
+process_limit = 16
+# Thời gian chạy tối đa (giây) của mỗi lệnh, quá thời gian sẽ dừng cả cây tiến trình. None để không giới hạn
+command_timeout = 2 * 60 * 60
+
+# Kết nối MySQL dùng chung (pool), nếu không có aiomysql hoặc không kết nối được sẽ dùng lại mysql CLI
+use_db_pool = True
+db_host = "localhost"
+db_port = 3306
+db_user = "root"
+db_password = ""
+db_pool_size = 5
+
+# Gom các lệnh WP-CLI của mỗi bước và chạy trong một tiến trình PHP (wp eval-file)
+use_wp_batch = True
+
+# Mỗi website một tiến trình PHP chạy lâu (WP worker) giữ WordPress đã bootstrap, nhận lệnh WP-CLI qua stdin.
+# Worker được tạo lại sau wp_worker_max_commands lệnh, kiểm tra (ping) nếu không dùng quá wp_worker_ping_after giây
+use_wp_worker = True
+wp_worker_max_commands = 200
+wp_worker_start_timeout = 120
+wp_worker_ping_after = 30
+wp_worker_ping_timeout = 10
+
+# Tạo website mới bằng cách clone template đã cấu hình sẵn (lưu trong tmp/cached/templates)
+use_site_templates = True
+
+# Cách đưa WordPress core / template từ thư mục cached vào website:
+# "copy": sao chép (mặc định), "reflink": bản sao copy-on-write nếu hệ thống file hỗ trợ,
+# "link": reflink hoặc hardlink (gần như không tốn dung lượng), tự chuyển sang copy nếu không link được;
+# trên Windows không dùng hardlink (file dùng chung có thể bị ghi đè tại chỗ), "link" giống "reflink":
+# block cloning trên ổ ReFS / Dev Drive, copy trên NTFS (có cảnh báo)
+deploy_mode = "copy"
+deploy_workers = 8
+
+# Cache tải xuống: sau bao nhiêu giây thì kiểm tra lại phiên bản mới trên server (ETag/Last-Modified), None để không kiểm tra
+download_max_age = 24 * 60 * 60
+# Thời gian chờ tối đa (giây) giữa hai lần nhận dữ liệu khi tải
+download_timeout = 60
+
+# Restore file .wpress (All-in-One WP Migration) bằng cách đọc trực tiếp file, không cài WordPress / plugin trước;
+# file mã hóa / nén / multisite vẫn dùng plugin. False để luôn dùng plugin
+native_wpress = True
+
+# Restore gói backup Duplicator (.zip / .daf) không qua installer.php: giải nén và import database trực tiếp;
+# gói backup mã hóa / multisite vẫn dùng installer.php. False để luôn dùng installer.php
+headless_dup = True
+
+# Giải nén tệp zip: số thread ghi tệp song song và kích thước khối đọc / ghi (bytes)
+extract_workers = 8
+extract_buffer_size = 1024 * 1024
+
+# Import database: số kết nối mysql chạy song song và kích thước file (bytes) tối thiểu để chia theo bảng
+sql_import_workers = 4
+sql_import_parallel_min_size = 16 * 1024 * 1024
+
+# Số thread xóa file của tiến trình dọn thùng rác (tmp/trash) chạy nền sau khi xóa website
+trash_purge_workers = 2
+
+# Bulk restore: số website xử lý cùng lúc và số tác vụ copy (disk), import (sql), WP-CLI (php) chạy đồng thời
+bulk_workers = 4
+bulk_disk_jobs = 2
+bulk_sql_jobs = 2
+bulk_php_jobs = 4
+
+# Số thread tối đa cho các tác vụ chạy nền (asyncio.to_thread) khi bulk restore
+bulk_thread_pool_size = 32
+
+# Bulk restore đọc file danh sách website theo từng dòng: số website đã đọc chờ chạy tối đa (website lớn nhất trong số này chạy trước)
+bulk_schedule_window = 64
+
+# Kết quả bulk restore (logs/bulk_restore_results_*.jsonl): fsync sau số kết quả / số giây này, in tiến độ mỗi bulk_progress_interval giây
+results_fsync_every = 10
+results_fsync_interval = 5
+bulk_progress_interval = 30
+
+# Kiểm tra trước khi bulk restore: tốc độ copy file / import database (MB/s) và thời gian các bước khác của mỗi website (giây)
+# dùng để ước tính thời gian; dung lượng ổ đĩa cần có = dung lượng dữ liệu x preflight_space_margin
+preflight_disk_mbps = 100
+preflight_sql_mbps = 10
+preflight_site_seconds = 20
+preflight_space_margin = 1.2
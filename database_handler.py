@@ -1,8 +1,9 @@
 import os
 import sys
 import re
-from commands import run_sql_command
-import aiofiles
+from database_pool import db_pool, quote_identifier
+from file_deploy import detach_file
+from tracing import traced
 import asyncio
 
 
@@ -10,18 +11,24 @@ async def check_database_exists(db_name):
     """ Kiểm tra database đã tồn tại chưa """
 
     try:
-        result = await run_sql_command(f'-e "SHOW DATABASES LIKE \'{db_name}\';"')
-        return db_name in result.stdout
+        rows = await db_pool.fetch_all("SELECT SCHEMA_NAME FROM information_schema.SCHEMATA WHERE SCHEMA_NAME = %s", (db_name,))
+        return len(rows) > 0
     except Exception as e:
         print(f'Lỗi khi kiểm tra database: {e}')
         return False
 
 
+@traced("db_create")
 async def create_database(db_name):
     """ Tạo database """
 
     try:
-        await run_sql_command(f'-e "CREATE DATABASE IF NOT EXISTS {db_name}; GRANT ALL PRIVILEGES ON {db_name}.* TO root@localhost WITH GRANT OPTION; FLUSH PRIVILEGES;"')
+        db = quote_identifier(db_name)
+        await db_pool.execute_many([
+            (f"CREATE DATABASE IF NOT EXISTS {db}", None),
+            (f"GRANT ALL PRIVILEGES ON {db}.* TO root@localhost WITH GRANT OPTION", None),
+            ("FLUSH PRIVILEGES", None),
+        ])
         print(f'Đã tạo database: "{db_name}"\n')
     except Exception as e:
         print(f'Lỗi khi tạo database "{db_name}": {e}')
@@ -32,13 +39,37 @@ async def drop_database(db_name):
     """ Xóa database """
 
     try:
-        await run_sql_command(f'-e "DROP DATABASE IF EXISTS {db_name};"')
+        await db_pool.execute(f"DROP DATABASE IF EXISTS {quote_identifier(db_name)}")
         print(f'Đã xóa database: "{db_name}"')
     except Exception as e:
         print(f'Lỗi khi xóa database "{db_name}": {e}')
         raise e
 
 
+async def drop_databases(db_names):
+    """ Xóa nhiều database qua một kết nối (một lô câu lệnh), trả về danh sách database xóa không thành công """
+
+    if not db_names:
+        return []
+
+    statements = [(f"DROP DATABASE IF EXISTS {quote_identifier(db_name)}", None) for db_name in db_names]
+    try:
+        await db_pool.execute_many(statements)
+        print(f'Đã xóa {len(db_names)} database: {", ".join(db_names)}')
+        return []
+    except Exception as e:
+        # Lô bị dừng ở câu lỗi: xóa lại từng database để biết database nào lỗi
+        print(f'Lỗi khi xóa database theo lô ({e}), xóa lại từng database')
+
+    failed = []
+    for db_name in db_names:
+        try:
+            await drop_database(db_name)
+        except Exception:
+            failed.append(db_name)
+    return failed
+
+
 async def find_sql_file(dir):
     """ Tìm file SQL """
 
@@ -48,17 +79,24 @@ async def find_sql_file(dir):
     return None
 
 
+@traced("prefix")
 async def update_table_prefix(db_name, website_path):
     """ Tìm prefix của database và cập nhật wp-config.php """
 
+    import aiofiles
+
     print(f'Kiểm tra prefix của database {db_name}...')
     
     # Query để lấy tên bảng từ database (Ví dụ: wp_options)
-    result = await run_sql_command(f'--silent --skip-column-names -e "SELECT table_name FROM information_schema.tables WHERE table_schema = \'{db_name}\' AND table_name LIKE \'%options\'"')
-    
-    if result.stdout and result.stderr == '':
+    try:
+        rows = await db_pool.fetch_all("SELECT table_name FROM information_schema.tables WHERE table_schema = %s AND table_name LIKE %s", (db_name, '%options'))
+        error = ''
+    except Exception as e:
+        rows, error = [], e
+
+    if rows:
         # Trích xuất tên bảng từ kết quả
-        table_names = result.stdout.strip().split('\n')
+        table_names = [row[0] for row in rows]
 
         # Bảng đầu tiên có tên kết thúc bằng 'options'
         for table in table_names:
@@ -75,6 +113,7 @@ async def update_table_prefix(db_name, website_path):
                     wp_config_path = os.path.join(website_path, 'wp-config.php')
                     try:
                         if os.path.exists(wp_config_path):
+                            detach_file(wp_config_path)
                             async with aiofiles.open(wp_config_path, 'r', encoding='utf-8') as f:
                                 config_content = await f.read()
                             
@@ -103,5 +142,5 @@ async def update_table_prefix(db_name, website_path):
                         print(f'Lỗi không xác định: {e}')
                         return False
     else:
-        print(f'Không thể phát hiện prefix của database. Lỗi: {result.stderr}')
+        print(f'Không thể phát hiện prefix của database. Lỗi: {error}')
         return False
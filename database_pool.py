@@ -0,0 +1,229 @@
+import asyncio
+import time
+import config
+from commands import run_sql_script
+
+
+class DatabaseError(Exception):
+    """Lỗi khi thực thi truy vấn SQL"""
+
+
+def quote_identifier(name):
+    """ Bọc tên database / bảng trong dấu ` """
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+def escape_literal(value):
+    """ Chuyển giá trị Python thành literal SQL (dùng cho mysql CLI) """
+
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return str(value)
+
+    value = str(value)
+    for char, escaped in (("\\", "\\\\"), ("'", "\\'"), ("\0", "\\0"), ("\n", "\\n"), ("\r", "\\r"), ("\x1a", "\\Z")):
+        value = value.replace(char, escaped)
+    return f"'{value}'"
+
+
+def render_sql(sql, params=None):
+    """ Thay các tham số %s trong câu lệnh bằng literal đã escape """
+
+    if not params:
+        return sql
+    return sql % tuple(escape_literal(param) for param in params)
+
+
+class DatabasePool:
+    """ Pool kết nối MySQL dùng chung, tự chuyển sang mysql CLI nếu không dùng được pool """
+
+    def __init__(self, host=None, port=None, user=None, password=None, size=None):
+        self.host = host or config.db_host
+        self.port = port or config.db_port
+        self.user = user or config.db_user
+        self.password = config.db_password if password is None else password
+        self.size = size or config.db_pool_size
+
+        self._pool = None
+        self._lock = asyncio.Lock()
+        self.fallback = not config.use_db_pool
+
+        self.counters = {
+            "queries": 0,
+            "transactions": 0,
+            "cli_queries": 0,
+            "acquires": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "errors": 0,
+        }
+
+    async def _get_pool(self):
+        """ Tạo pool khi cần dùng lần đầu """
+
+        if self.fallback:
+            return None
+        if self._pool is not None:
+            return self._pool
+
+        async with self._lock:
+            if self._pool is None and not self.fallback:
+                try:
+                    import aiomysql
+                    self._pool = await aiomysql.create_pool(
+                        host=self.host, port=self.port, user=self.user, password=self.password,
+                        minsize=1, maxsize=self.size, autocommit=True, charset="utf8mb4"
+                    )
+                except ImportError:
+                    print("Không tìm thấy thư viện aiomysql, dùng mysql CLI.")
+                    self.fallback = True
+                except Exception as e:
+                    print(f"Không thể kết nối MySQL qua pool ({e}), dùng mysql CLI.")
+                    self.fallback = True
+        return self._pool
+
+    async def _acquire(self, pool):
+        """ Lấy kết nối từ pool và ghi nhận thời gian chờ """
+
+        self.counters["acquires"] += 1
+        if pool.freesize == 0 and pool.size >= pool.maxsize:
+            self.counters["waits"] += 1
+
+        start = time.perf_counter()
+        conn = await pool.acquire()
+        self.counters["wait_time"] += time.perf_counter() - start
+        return conn
+
+    @staticmethod
+    def _release(pool, conn, db_name=None):
+        """ Trả kết nối về pool. MySQL không bỏ chọn database được (không có USE NULL): kết nối đã select_db bị đóng
+        thay vì trả về pool, để câu lệnh sau không chạy nhầm trong database của website trước """
+
+        if db_name:
+            conn.close()
+        pool.release(conn)
+
+    async def _run_cli(self, statements, db_name=None, transaction=False):
+        """ Chạy các câu lệnh qua một tiến trình mysql CLI """
+
+        script = ";\n".join(render_sql(sql, params) for sql, params in statements) + ";\n"
+        if transaction:
+            script = f"START TRANSACTION;\n{script}COMMIT;\n"
+
+        self.counters["cli_queries"] += len(statements)
+        result = await run_sql_script(script, db_name)
+        if not result.ok:
+            self.counters["errors"] += 1
+            raise DatabaseError(result.stderr.strip() or result.error or "mysql chạy quá thời gian")
+
+        return [tuple(line.split("\t")) for line in result.stdout.splitlines() if line]
+
+    async def fetch_all(self, sql, params=None, db_name=None):
+        """ Chạy câu lệnh SELECT và trả về danh sách các dòng """
+
+        self.counters["queries"] += 1
+        pool = await self._get_pool()
+        if pool is None:
+            return await self._run_cli([(sql, params)], db_name)
+
+        conn = await self._acquire(pool)
+        try:
+            if db_name:
+                await conn.select_db(db_name)
+            async with conn.cursor() as cur:
+                await cur.execute(sql, params)
+                return list(await cur.fetchall())
+        except Exception as e:
+            self.counters["errors"] += 1
+            raise DatabaseError(str(e)) from e
+        finally:
+            self._release(pool, conn, db_name)
+
+    async def execute(self, sql, params=None, db_name=None):
+        """ Chạy một câu lệnh không trả về dữ liệu """
+
+        await self.execute_many([(sql, params)], db_name)
+
+    async def execute_many(self, statements, db_name=None):
+        """ Chạy lần lượt nhiều câu lệnh trên cùng một kết nối (không dùng transaction, phù hợp cho DDL) """
+
+        self.counters["queries"] += len(statements)
+        pool = await self._get_pool()
+        if pool is None:
+            await self._run_cli(statements, db_name)
+            return
+
+        conn = await self._acquire(pool)
+        try:
+            if db_name:
+                await conn.select_db(db_name)
+            async with conn.cursor() as cur:
+                for sql, params in statements:
+                    await cur.execute(sql, params)
+        except Exception as e:
+            self.counters["errors"] += 1
+            raise DatabaseError(str(e)) from e
+        finally:
+            self._release(pool, conn, db_name)
+
+    async def transaction(self, statements, db_name=None):
+        """ Chạy nhiều câu lệnh trong một transaction, trả về số dòng bị ảnh hưởng của từng câu """
+
+        self.counters["queries"] += len(statements)
+        self.counters["transactions"] += 1
+        pool = await self._get_pool()
+        if pool is None:
+            await self._run_cli(statements, db_name, transaction=True)
+            return [None] * len(statements)
+
+        conn = await self._acquire(pool)
+        try:
+            if db_name:
+                await conn.select_db(db_name)
+            await conn.begin()
+            affected = []
+            async with conn.cursor() as cur:
+                for sql, params in statements:
+                    affected.append(await cur.execute(sql, params))
+            await conn.commit()
+            return affected
+        except Exception as e:
+            self.counters["errors"] += 1
+            await conn.rollback()
+            raise DatabaseError(str(e)) from e
+        finally:
+            self._release(pool, conn, db_name)
+
+    def stats(self):
+        """ Thống kê sử dụng pool """
+
+        stats = dict(self.counters)
+        stats["mode"] = "cli" if self.fallback or self._pool is None else "pool"
+        if self._pool is not None:
+            stats["size"] = self._pool.size
+            stats["free"] = self._pool.freesize
+            stats["maxsize"] = self._pool.maxsize
+        return stats
+
+    def print_stats(self):
+        """ In thống kê pool """
+
+        stats = self.stats()
+        print(f"\nThống kê kết nối MySQL ({stats['mode']}):")
+        print(f"- Truy vấn: {stats['queries']} (qua CLI: {stats['cli_queries']}), transaction: {stats['transactions']}, lỗi: {stats['errors']}")
+        if stats["mode"] == "pool":
+            print(f"- Kết nối: {stats['size']}/{stats['maxsize']} (rảnh: {stats['free']}), lấy kết nối: {stats['acquires']} lần, phải chờ: {stats['waits']} lần ({stats['wait_time']:.2f}s)")
+
+    async def close(self):
+        """ Đóng toàn bộ kết nối trong pool """
+
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+
+db_pool = DatabasePool()
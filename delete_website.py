@@ -1,15 +1,18 @@
 import os
 import sys
-import shutil
-import subprocess
 import asyncio
-from database_handler import drop_database
+from database_handler import drop_databases
+from file_deploy import remove_tree
+from commands import reload_apache
+from site_trash import get_trash_path, move_to_trash, start_purge
+from wp_worker import wp_workers
+from site_inventory import get_site_inventory
 
 
 async def get_website_list(laragon_sites_path):
-    """Lấy danh sách thư mục website"""
-    website_folders = [f for f in os.listdir(laragon_sites_path) if os.path.isdir(os.path.join(laragon_sites_path, f))]
-    return website_folders
+    """Lấy danh sách thư mục website (từ index website dùng chung)"""
+    inventory = await get_site_inventory(os.path.dirname(laragon_sites_path)).ensure_loaded()
+    return inventory.site_names()
 
 async def print_websites(websites):
     """In ra danh sách website"""
@@ -36,22 +39,42 @@ async def choose_website(websites):
             print('Vui lòng nhập một số!')
     return delete_index
 
-async def delete_website(website_name, laragon_sites_path):
-    """Hàm xóa một website cụ thể"""
+async def delete_websites(website_names, laragon_sites_path):
+    """Xóa nhiều website: chuyển thư mục vào thùng rác (tức thì), xóa database theo lô,
+    dọn thùng rác bằng tiến trình chạy nền. Trả về số website đã xóa thành công"""
 
-    website_path = os.path.join(laragon_sites_path, website_name)
-    try:
-        # Xóa thư mục website
-        await asyncio.to_thread(shutil.rmtree, website_path)
-        print(f'Đã xóa thư mục: {website_path}')
+    trash_path = get_trash_path(laragon_sites_path)
 
-        # Xóa database
-        await drop_database(website_name)
-        
-        return True
-    except Exception as e:
-        print(f'Lỗi khi xóa website {website_name}: {e}')
-        return False
+    # WP worker đang mở file của website
+    await asyncio.gather(*(wp_workers.close(os.path.join(laragon_sites_path, name)) for name in website_names))
+
+    removed = []
+    for website_name in website_names:
+        website_path = os.path.join(laragon_sites_path, website_name)
+        try:
+            if os.path.exists(website_path):
+                try:
+                    move_to_trash(website_path, trash_path)
+                except OSError:
+                    # Không đổi tên được (khác ổ đĩa...): xóa trực tiếp
+                    await asyncio.to_thread(remove_tree, website_path)
+            print(f'Đã xóa thư mục: {website_path}')
+            removed.append(website_name)
+        except Exception as e:
+            print(f'Lỗi khi xóa website {website_name}: {e}')
+
+    # Xóa database của các website đã xóa thư mục
+    failed = await drop_databases(removed)
+    get_site_inventory(os.path.dirname(laragon_sites_path)).remove(removed)
+
+    if os.path.isdir(trash_path) and os.listdir(trash_path):
+        start_purge(trash_path)
+
+    return len(removed) - len(failed)
+
+async def delete_website(website_name, laragon_sites_path):
+    """Hàm xóa một website cụ thể"""
+    return await delete_websites([website_name], laragon_sites_path) == 1
 
 async def delete_website_interactive(laragon_path, laragon_sites_path):
     """Xóa website trong chế độ tương tác"""
@@ -68,10 +91,8 @@ async def delete_website_interactive(laragon_path, laragon_sites_path):
                 print('Đã hủy xóa website!')
                 return False
             
-            # Xóa từng website một
-            delete_tasks = [delete_website(website, laragon_sites_path) for website in websites]
-            results = await asyncio.gather(*delete_tasks)
-            success_count = sum(results)
+            # Xóa tất cả website trong một lần
+            success_count = await delete_websites(websites, laragon_sites_path)
             
             # Thông báo kết quả
             print(f'\nĐã xóa thành công {success_count}/{len(websites)} website')
@@ -88,7 +109,7 @@ async def delete_website_interactive(laragon_path, laragon_sites_path):
 
         # Reload Apache Server
         print('\nReload Apache Server...')
-        await asyncio.to_thread(subprocess.run, f'{os.path.join(laragon_path, "laragon.exe")} reload apache', shell=True)
+        await reload_apache(laragon_path)
         return True
 
     except Exception as e:
@@ -111,7 +132,7 @@ async def delete_website_by_name(website_name, laragon_path, laragon_sites_path)
 
         # Reload Apache Server
         print('\nReload Apache Server...')
-        await asyncio.to_thread(subprocess.run, f'{os.path.join(laragon_path, "laragon.exe")} reload apache', shell=True)
+        await reload_apache(laragon_path)
         return True
     return False
 
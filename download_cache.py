@@ -0,0 +1,340 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import zipfile
+import asyncio
+import config
+from single_flight import get_single_flight
+from tracing import add_bytes, span
+
+
+INDEX_FILE = "download-index.json"
+OBJECTS_DIR = "objects"
+
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class DownloadError(Exception):
+    """Lỗi khi tải hoặc kiểm tra tệp"""
+
+
+def _hash_file(path, sha=None):
+    """ Tính sha256 của tệp (có thể tiếp tục từ một đối tượng hash có sẵn) """
+
+    sha = sha or hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha
+
+
+def _is_valid_archive(path):
+    """ Tệp .zip phải đọc được central directory """
+    return not path.lower().endswith(".zip") or zipfile.is_zipfile(path)
+
+
+def _revalidate_errors():
+    """ Lỗi khi kiểm tra phiên bản mới mà vẫn dùng được tệp trong cache (không có aiohttp cũng vậy) """
+
+    errors = (DownloadError, asyncio.TimeoutError, OSError, ImportError)
+    try:
+        import aiohttp
+    except ImportError:
+        return errors
+    return errors + (aiohttp.ClientError,)
+
+
+class DownloadCache:
+    """ Cache tải xuống theo nội dung (sha256), ghi tạm rồi đổi tên, hỗ trợ revalidate và tải tiếp """
+
+    def __init__(self, cached_path):
+        self.cached_path = cached_path
+        self.objects_path = os.path.join(cached_path, OBJECTS_DIR)
+        self.index_path = os.path.join(cached_path, INDEX_FILE)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+
+        index.setdefault("urls", {})
+        counters = index.setdefault("counters", {})
+        for name in ("hits", "misses", "revalidated", "refreshed", "resumed", "bytes_downloaded"):
+            counters.setdefault(name, 0)
+        return index
+
+    def _reload_entry(self, url):
+        """ Lấy lại entry của url từ index trên đĩa (có thể vừa được tiến trình khác cập nhật) """
+
+        entry = self._load_index()["urls"].get(url)
+        if entry:
+            self.index["urls"][url] = entry
+
+    def save_index(self):
+        """ Ghi index ra đĩa (ghi tạm rồi đổi tên), giữ lại các url do tiến trình khác ghi """
+
+        for url, entry in self._load_index()["urls"].items():
+            self.index["urls"].setdefault(url, entry)
+
+        os.makedirs(self.cached_path, exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=4)
+        os.replace(tmp_path, self.index_path)
+
+    def object_path(self, sha256):
+        return os.path.join(self.objects_path, sha256)
+
+    def _object_mtime(self, sha256):
+        try:
+            return os.stat(self.object_path(sha256)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _entry_valid(self, entry):
+        """ Đối tượng trong cache còn đúng kích thước và sha256. Chỉ tính lại sha256 khi mtime khác lúc ghi vào index
+        (tệp bị ghi đè tại chỗ, kể cả qua hardlink); đối tượng bị hỏng bị xóa khỏi cache """
+
+        path = self.object_path(entry["sha256"])
+        if not os.path.isfile(path) or os.path.getsize(path) != entry["size"]:
+            return False
+
+        mtime = self._object_mtime(entry["sha256"])
+        if mtime is not None and mtime == entry.get("mtime_ns"):
+            return True
+        if _hash_file(path).hexdigest() == entry["sha256"]:
+            entry["mtime_ns"] = mtime
+            return True
+
+        print(f"Tệp {path} trong cache bị thay đổi (sai sha256), xóa và tải lại.")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return False
+
+    def _materialize(self, entry, file_path):
+        """ Đưa đối tượng trong cache ra đường dẫn mà script sử dụng (hardlink, không được thì copy) """
+
+        object_path = self.object_path(entry["sha256"])
+        if os.path.exists(file_path):
+            try:
+                if os.path.samefile(object_path, file_path):
+                    return
+            except OSError:
+                pass
+
+        tmp_path = f"{file_path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(object_path, tmp_path)
+        except OSError:
+            shutil.copyfile(object_path, tmp_path)
+        os.replace(tmp_path, file_path)
+
+    def _adopt(self, url, file_path):
+        """ Đưa tệp đã tải bằng phiên bản cũ (chưa có trong index) vào cache nếu tệp hợp lệ """
+
+        if not os.path.isfile(file_path) or not _is_valid_archive(file_path):
+            return None
+
+        sha256 = _hash_file(file_path).hexdigest()
+        os.makedirs(self.objects_path, exist_ok=True)
+        object_path = self.object_path(sha256)
+        if not os.path.exists(object_path):
+            shutil.copyfile(file_path, object_path)
+
+        entry = {"sha256": sha256, "size": os.path.getsize(object_path), "etag": None, "last_modified": None, "checked_at": 0,
+                 "mtime_ns": self._object_mtime(sha256)}
+        self.index["urls"][url] = entry
+        return entry
+
+    def _needs_revalidate(self, entry, max_age):
+        return max_age is not None and time.time() - entry.get("checked_at", 0) > max_age
+
+    async def fetch(self, url, file_path, max_age=None):
+        """ Lấy tệp từ cache hoặc tải xuống, trả về entry trong index.
+        Mỗi url chỉ tải một lần: các tác vụ (và tiến trình) khác cùng url chờ kết quả của lần tải đầu tiên """
+
+        async def fetch_locked():
+            await asyncio.to_thread(self._reload_entry, url)
+            return await self._fetch(url, file_path, max_age)
+
+        with span("download", url=url):
+            entry = await get_single_flight(self.cached_path).run(f"download:{url}", fetch_locked)
+
+        # Tác vụ chờ có thể dùng đường dẫn khác với tác vụ đã tải
+        if not os.path.exists(file_path):
+            await asyncio.to_thread(self._materialize, entry, file_path)
+        return entry
+
+    async def _fetch(self, url, file_path, max_age=None):
+        if max_age is None:
+            max_age = config.download_max_age
+
+        entry = self.index["urls"].get(url)
+        if entry is None and os.path.exists(file_path):
+            entry = await asyncio.to_thread(self._adopt, url, file_path)
+
+        if entry and await asyncio.to_thread(self._entry_valid, entry):
+            if not self._needs_revalidate(entry, max_age):
+                self.index["counters"]["hits"] += 1
+                await asyncio.to_thread(self._materialize, entry, file_path)
+                self.save_index()
+                print(f"Tệp {file_path} đã có trong cache, không cần tải xuống.")
+                return entry
+
+            print(f"Kiểm tra phiên bản mới của {url}...")
+        else:
+            entry = None
+            print(f"Tệp {file_path} không tồn tại, đang tải tệp xuống...\n")
+
+        if entry is None:
+            new_entry = await self._download(url, None, file_path.lower().endswith(".zip"))
+        else:
+            # Không kiểm tra được phiên bản mới (mất mạng, server lỗi...): dùng tệp trong cache, lần sau kiểm tra lại
+            try:
+                new_entry = await self._download(url, entry, file_path.lower().endswith(".zip"))
+            except _revalidate_errors() as e:
+                print(f"Cảnh báo: không kiểm tra được phiên bản mới của {url} ({e or type(e).__name__}), dùng tệp trong cache.")
+                self.index["counters"]["hits"] += 1
+                await asyncio.to_thread(self._materialize, entry, file_path)
+                self.save_index()
+                return entry
+
+        if new_entry is entry:
+            self.index["counters"]["revalidated"] += 1
+            self.index["counters"]["hits"] += 1
+        else:
+            self.index["counters"]["misses"] += 1
+            if entry:
+                self.index["counters"]["refreshed"] += 1
+            entry = new_entry
+
+        entry["checked_at"] = time.time()
+        self.index["urls"][url] = entry
+        await asyncio.to_thread(self._materialize, entry, file_path)
+        self.save_index()
+        return entry
+
+    async def _download(self, url, entry=None, is_zip=False):
+        """ Tải tệp vào tệp tạm (.part), tải tiếp bằng Range nếu có, kiểm tra rồi đổi tên thành đối tượng trong cache """
+
+        import aiohttp
+
+        os.makedirs(self.objects_path, exist_ok=True)
+        part_name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        part_path = os.path.join(self.objects_path, f"{part_name}.part")
+        part_info_path = f"{part_path}.json"
+
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        # Tải tiếp phần còn dở từ lần trước nếu server còn cùng phiên bản
+        offset = 0
+        part_info = {}
+        if os.path.exists(part_path) and os.path.exists(part_info_path):
+            try:
+                with open(part_info_path, "r", encoding="utf-8") as f:
+                    part_info = json.load(f)
+            except (OSError, ValueError):
+                part_info = {}
+            validator = part_info.get("etag") or part_info.get("last_modified")
+            if validator:
+                offset = os.path.getsize(part_path)
+                headers["Range"] = f"bytes={offset}-"
+                headers["If-Range"] = validator
+
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=config.download_timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304 and entry:
+                    return entry
+                if response.status not in (200, 206):
+                    raise DownloadError(f"HTTP {response.status} khi tải {url}")
+
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+
+                if response.status == 206 and offset:
+                    self.index["counters"]["resumed"] += 1
+                    sha = await asyncio.to_thread(_hash_file, part_path)
+                    mode = "ab"
+                    total_size = int(response.headers.get("Content-Range", "*/0").rsplit("/", 1)[-1] or 0) or None
+                else:
+                    offset = 0
+                    sha = hashlib.sha256()
+                    mode = "wb"
+                    total_size = response.content_length
+
+                with open(part_info_path, "w", encoding="utf-8") as f:
+                    json.dump({"url": url, "etag": etag, "last_modified": last_modified}, f)
+
+                received = offset
+                chunk_size = MIN_CHUNK_SIZE
+                with open(part_path, mode) as f:
+                    while True:
+                        start = time.perf_counter()
+                        chunk = await response.content.read(chunk_size)
+                        if not chunk:
+                            break
+                        await asyncio.to_thread(f.write, chunk)
+                        sha.update(chunk)
+                        received += len(chunk)
+                        self.index["counters"]["bytes_downloaded"] += len(chunk)
+                        add_bytes(len(chunk))
+
+                        # Tăng kích thước chunk khi mạng nhanh, giảm khi chậm
+                        elapsed = time.perf_counter() - start
+                        if len(chunk) == chunk_size and elapsed < 0.05:
+                            chunk_size = min(chunk_size * 2, MAX_CHUNK_SIZE)
+                        elif elapsed > 0.5:
+                            chunk_size = max(chunk_size // 2, MIN_CHUNK_SIZE)
+
+        if total_size is not None and received != total_size:
+            raise DownloadError(f"Tải thiếu dữ liệu: {received}/{total_size} bytes")
+        if is_zip and not await asyncio.to_thread(zipfile.is_zipfile, part_path):
+            os.remove(part_path)
+            os.remove(part_info_path)
+            raise DownloadError("Tệp tải về không phải file zip hợp lệ")
+
+        # Luôn thay đối tượng cũ (có thể bị hỏng dù cùng kích thước) bằng tệp vừa tải và kiểm tra
+        sha256 = sha.hexdigest()
+        os.replace(part_path, self.object_path(sha256))
+        if os.path.exists(part_info_path):
+            os.remove(part_info_path)
+
+        return {"sha256": sha256, "size": received, "etag": etag, "last_modified": last_modified, "checked_at": time.time(),
+                "mtime_ns": self._object_mtime(sha256)}
+
+    def stats(self):
+        return dict(self.index["counters"])
+
+    def print_stats(self):
+        counters = self.stats()
+        print(f"\nThống kê cache tải xuống: hit: {counters['hits']}, miss: {counters['misses']}, "
+              f"revalidate: {counters['revalidated']}, tải tiếp: {counters['resumed']}, "
+              f"đã tải: {counters['bytes_downloaded'] / 1024 / 1024:.1f} MB")
+
+
+_caches = {}
+
+
+def get_download_cache(cached_path):
+    """ Cache tải xuống dùng chung cho thư mục cached """
+
+    cached_path = os.path.abspath(cached_path)
+    if cached_path not in _caches:
+        _caches[cached_path] = DownloadCache(cached_path)
+    return _caches[cached_path]
@@ -0,0 +1,321 @@
+""" Đọc gói backup của Duplicator / Duplicator Pro mà không cần chạy installer.php.
+
+Gói backup gồm installer.php và tệp archive (.zip hoặc .daf) chứa toàn bộ website, thư mục dup-installer có
+file database (dup-installer/dup-database__*.sql, bản cũ: database.sql ở thư mục gốc) và thông tin website
+cũ (dup-installer/dup-archive__*.txt, JSON: url_old, mu_mode...).
+
+Tệp .daf (DupArchive) là các header dạng thẻ nối tiếp nhau:
+<A><V>phiên bản</V><C>true|false</C></A> rồi đến từng thư mục <D>...</D> và từng tệp
+<F><FS>kích thước</FS><MT>thời gian</MT>...<RPL>độ dài</RPL><RP>đường dẫn</RP></F>, nội dung tệp chia thành
+các khối <G><OS>kích thước gốc</OS><SS>kích thước lưu</SS><HA>hash</HA></G> + dữ liệu (deflate nếu C = true).
+"""
+
+import os
+import re
+import json
+import time
+import zlib
+import fnmatch
+import zipfile
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+import config
+from file_deploy import safe_join, unlink_file, remove_tree
+from zip_extract import ExtractStats, ZipExtractError, extract_zip
+
+
+ARCHIVE_SUFFIXES = (".zip", ".daf")
+INSTALLER_DIR = "dup-installer"
+DATABASE_PATTERNS = [f"{INSTALLER_DIR}/dup-database__*.sql", "database.sql"]
+ARCHIVE_INFO_PATTERN = f"{INSTALLER_DIR}/dup-archive__*.txt"
+CORE_FILE = "wp-includes/version.php"
+
+# Tệp của installer còn lại trong thư mục website sau khi restore
+INSTALLER_FILES = ["installer.php", "installer-backup.php", "database.sql", "dup-installer-bootlog__*.txt"]
+
+# Số bytes đọc mỗi lần khi đọc header của tệp .daf (đọc thêm nếu header dài hơn)
+DAF_HEADER_READ = 4096
+DAF_TAG_RE = re.compile(rb"<([A-Z]+)>")
+
+
+class DuplicatorError(Exception):
+    """ Gói backup Duplicator bị hỏng hoặc không đọc được """
+
+
+class _NeedMore(Exception):
+    """ Header dài hơn số bytes đã đọc """
+
+
+@dataclass
+class DafEntry:
+    """ Một tệp trong .daf: đường dẫn tương đối, kích thước, thời gian sửa đổi, các khối (vị trí, kích thước gốc, kích thước lưu) """
+
+    path: str
+    size: int
+    mtime: int
+    globs: list = field(default_factory=list)
+
+
+def find_archive(source_path):
+    """ Tệp archive của gói backup: source_path là tệp .zip / .daf, hoặc thư mục chứa installer.php và tệp archive
+    (ưu tiên tệp có tên *_archive.zip / *_archive.daf của Duplicator). None nếu không tìm thấy """
+
+    if os.path.isfile(source_path):
+        return source_path if source_path.lower().endswith(ARCHIVE_SUFFIXES) else None
+    if not os.path.isdir(source_path):
+        return None
+
+    names = sorted(name for name in os.listdir(source_path)
+                   if name.lower().endswith(ARCHIVE_SUFFIXES) and os.path.isfile(os.path.join(source_path, name)))
+    names.sort(key=lambda name: not os.path.splitext(name)[0].lower().endswith("_archive"))
+    return os.path.join(source_path, names[0]) if names else None
+
+
+def _parse_header(data, tag):
+    """ Đọc các trường của một header .daf trong data (bắt đầu bằng <tag>), trả về (các trường, độ dài header) """
+
+    end_tag = b"</" + tag + b">"
+    fields = {}
+    position = len(tag) + 2
+    while True:
+        if len(data) < position + len(end_tag):
+            raise _NeedMore()
+        if data.startswith(end_tag, position):
+            return fields, position + len(end_tag)
+        match = DAF_TAG_RE.match(data, position)
+        if not match:
+            if len(data) - position < 8:
+                raise _NeedMore()
+            raise DuplicatorError(f"Header <{tag.decode()}> không hợp lệ trong tệp .daf")
+        name = match.group(1)
+        position = match.end()
+        close_tag = b"</" + name + b">"
+        if name == b"RP" and b"RPL" in fields:
+            # Đường dẫn có thể chứa ký tự bất kỳ: đọc theo độ dài
+            end = position + int(fields[b"RPL"])
+            if len(data) < end + len(close_tag):
+                raise _NeedMore()
+            if not data.startswith(close_tag, end):
+                raise DuplicatorError("Đường dẫn không hợp lệ trong tệp .daf")
+        else:
+            end = data.find(close_tag, position)
+            if end < 0:
+                raise _NeedMore()
+        fields[name] = data[position:end]
+        position = end + len(close_tag)
+
+
+def _read_header(f, tag):
+    """ Đọc header <tag> tại vị trí hiện tại, đặt f sau header """
+
+    start = f.tell()
+    size = DAF_HEADER_READ
+    while True:
+        f.seek(start)
+        data = f.read(size)
+        try:
+            fields, length = _parse_header(data, tag)
+        except _NeedMore:
+            if len(data) < size:
+                raise DuplicatorError("Tệp .daf bị cắt cụt")
+            size *= 4
+            continue
+        f.seek(start + length)
+        return {name.decode("ascii"): value for name, value in fields.items()}
+
+
+def _int(fields, *names):
+    for name in names:
+        value = fields.get(name, b"").strip()
+        if value.isdigit():
+            return int(value)
+    return 0
+
+
+def read_daf_index(path):
+    """ Đọc header của tất cả tệp trong .daf (bỏ qua nội dung bằng seek). Trả về (nén hay không, thư mục, tệp) """
+
+    directories = []
+    entries = []
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if f.read(3) != b"<A>":
+            raise DuplicatorError("Không phải tệp .daf của Duplicator")
+        f.seek(0)
+        compressed = _read_header(f, b"A").get("C", b"").strip().lower() == b"true"
+
+        while True:
+            start = f.tell()
+            kind = f.read(3)
+            if not kind.strip():
+                return compressed, directories, entries
+            f.seek(start)
+            if kind == b"<D>":
+                header = _read_header(f, b"D")
+                directories.append(header.get("RP", b"").decode("utf-8", "replace"))
+            elif kind == b"<F>":
+                header = _read_header(f, b"F")
+                entry = DafEntry(
+                    path=header.get("RP", b"").decode("utf-8", "replace"),
+                    size=_int(header, "FS", "S"),
+                    mtime=_int(header, "MT"),
+                )
+                remaining = entry.size
+                while remaining > 0:
+                    glob = _read_header(f, b"G")
+                    original_size, stored_size = _int(glob, "OS", "RS"), _int(glob, "SS")
+                    if not original_size or f.tell() + stored_size > file_size:
+                        raise DuplicatorError(f"Tệp .daf bị cắt cụt tại {entry.path}")
+                    entry.globs.append((f.tell(), original_size, stored_size))
+                    f.seek(stored_size, os.SEEK_CUR)
+                    remaining -= original_size
+                entries.append(entry)
+            else:
+                raise DuplicatorError(f"Header không hợp lệ tại vị trí {start} trong tệp .daf")
+
+
+class DuplicatorPackage:
+    """ Gói backup Duplicator đã đọc danh sách tệp, giải nén trực tiếp vào thư mục website """
+
+    def __init__(self, source_path):
+        self.archive = find_archive(source_path)
+        if self.archive is None:
+            raise DuplicatorError(f"Không tìm thấy tệp archive (.zip / .daf) trong {source_path}")
+        self.is_daf = self.archive.lower().endswith(".daf")
+        self.encrypted = False
+
+        if self.is_daf:
+            self.compressed, self.directories, self.entries = read_daf_index(self.archive)
+            self.by_path = {entry.path: entry for entry in self.entries}
+            names = list(self.by_path)
+        else:
+            try:
+                with zipfile.ZipFile(self.archive, "r") as archive:
+                    infos = archive.infolist()
+            except zipfile.BadZipFile as e:
+                raise DuplicatorError(f"Tệp zip bị hỏng: {e}")
+            self.encrypted = any(info.flag_bits & 0x1 for info in infos)
+            names = [info.filename for info in infos if not info.is_dir()]
+
+        self.names = set(names)
+        self.database = next((name for pattern in DATABASE_PATTERNS for name in sorted(fnmatch.filter(names, pattern))), None)
+        self.has_core = CORE_FILE in self.names
+        info_name = next(iter(sorted(fnmatch.filter(names, ARCHIVE_INFO_PATTERN))), None)
+        self.info = self._read_info(info_name) if info_name and not self.encrypted else {}
+
+    def _read_member(self, name):
+        if not self.is_daf:
+            with zipfile.ZipFile(self.archive, "r") as archive:
+                return archive.read(name)
+        data = bytearray()
+        with open(self.archive, "rb") as f:
+            for offset, _, stored_size in self.by_path[name].globs:
+                f.seek(offset)
+                chunk = f.read(stored_size)
+                data += zlib.decompress(chunk, -15) if self.compressed else chunk
+        return bytes(data)
+
+    def _read_info(self, name):
+        try:
+            info = json.loads(self._read_member(name).decode("utf-8-sig", "replace"))
+        except (ValueError, zlib.error, zipfile.BadZipFile):
+            return {}
+        return info if isinstance(info, dict) else {}
+
+    def unsupported_reason(self):
+        """ Lý do không restore tự động được (cần chạy installer.php), None nếu đọc được """
+
+        if self.encrypted:
+            return "tệp archive được mã hóa"
+        if self.database is None:
+            return "không tìm thấy file database trong tệp archive"
+        if str(self.info.get("mu_mode") or 0) not in ("0", ""):
+            return "website multisite"
+        return None
+
+    def old_urls(self):
+        """ Url của website cũ trong thông tin của gói backup """
+        urls = [url for url in (self.info.get("url_old"), self.info.get("home_url_old")) if isinstance(url, str) and url]
+        return list(dict.fromkeys(urls))
+
+    def database_path(self, website_path):
+        return safe_join(website_path, self.database)
+
+    def extract(self, website_path, workers=None):
+        """ Giải nén tệp archive vào thư mục website (chạy đồng bộ, gọi trong thread). Trả về ExtractStats """
+
+        if not self.is_daf:
+            try:
+                return extract_zip(self.archive, website_path, workers)
+            except ZipExtractError as e:
+                raise DuplicatorError(str(e))
+        return self._extract_daf(website_path, workers)
+
+    def _extract_daf(self, website_path, workers=None):
+        """ Ghi các tệp của .daf song song: mỗi thread mở tệp .daf riêng và đọc các khối theo vị trí """
+
+        start = time.perf_counter()
+        website_path = os.path.abspath(website_path)
+        jobs = []
+        directories = {website_path}
+        try:
+            for directory in self.directories:
+                directories.add(safe_join(website_path, directory))
+            for entry in self.entries:
+                target = safe_join(website_path, entry.path)
+                directories.add(os.path.dirname(target))
+                jobs.append((entry, target))
+        except ValueError as e:
+            raise DuplicatorError(str(e))
+        for directory in sorted(directories):
+            os.makedirs(directory, exist_ok=True)
+
+        # Tệp lớn chạy trước để các thread kết thúc cùng lúc
+        jobs.sort(key=lambda job: job[0].size, reverse=True)
+        local = threading.local()
+        opened = []
+        lock = threading.Lock()
+
+        def copy(job):
+            entry, target = job
+            source = getattr(local, "file", None)
+            if source is None:
+                source = local.file = open(self.archive, "rb")
+                with lock:
+                    opened.append(source)
+            # Tệp của WordPress core có thể được link từ thư mục cached: xóa rồi ghi tệp mới
+            unlink_file(target)
+            with open(target, "wb") as destination:
+                for offset, _, stored_size in entry.globs:
+                    source.seek(offset)
+                    chunk = source.read(stored_size)
+                    if len(chunk) < stored_size:
+                        raise DuplicatorError(f"Tệp .daf bị cắt cụt tại {entry.path}")
+                    try:
+                        destination.write(zlib.decompress(chunk, -15) if self.compressed else chunk)
+                    except zlib.error as e:
+                        raise DuplicatorError(f"Dữ liệu của {entry.path} bị hỏng: {e}")
+            if entry.mtime:
+                os.utime(target, (entry.mtime, entry.mtime))
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers or config.extract_workers) as executor:
+                list(executor.map(copy, jobs))
+        finally:
+            for source in opened:
+                source.close()
+
+        return ExtractStats(files=len(jobs), bytes=sum(entry.size for entry, _ in jobs), seconds=time.perf_counter() - start)
+
+
+def remove_installer_files(website_path):
+    """ Xóa thư mục dup-installer, installer.php và các tệp khác của installer khỏi thư mục website """
+
+    installer_path = os.path.join(website_path, INSTALLER_DIR)
+    if os.path.isdir(installer_path):
+        remove_tree(installer_path)
+    names = os.listdir(website_path)
+    for pattern in INSTALLER_FILES:
+        for name in fnmatch.filter(names, pattern):
+            unlink_file(os.path.join(website_path, name))
@@ -0,0 +1,308 @@
+import os
+import sys
+import json
+import stat
+import shutil
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import config
+from scheduler import limits
+from tracing import span
+
+
+# File ghi lại trạng thái các file trong thư mục cached để phát hiện website sửa vào file dùng chung
+MANIFEST_FILE = ".deploy-manifest.json"
+
+# ioctl FICLONE trên Linux (btrfs, xfs...)
+FICLONE = 0x40049409
+
+# Block cloning trên Windows (ReFS, Dev Drive)
+FSCTL_DUPLICATE_EXTENTS_TO_FILE = 0x00098344
+FSCTL_SET_SPARSE = 0x000900C4
+FILE_ATTRIBUTE_SPARSE_FILE = 0x200
+# Mỗi lần clone tối đa (phải nhỏ hơn 4GB và chia hết cho kích thước cluster)
+CLONE_CHUNK_SIZE = 1024 * 1024 * 1024
+
+# Kích thước cluster theo ổ đĩa (Windows)
+_cluster_sizes = {}
+# Đã báo deploy_mode link / reflink phải chuyển sang copy hay chưa (chỉ báo một lần)
+_copy_fallback_warned = False
+
+
+def _cluster_size(path):
+    import ctypes
+    from ctypes import wintypes
+
+    root = os.path.splitdrive(os.path.abspath(path))[0]
+    if not root or root.startswith(("\\\\", "//")):
+        return None
+    if root not in _cluster_sizes:
+        sectors, sector_size, free, total = (wintypes.DWORD() for _ in range(4))
+        if not ctypes.windll.kernel32.GetDiskFreeSpaceW(root + "\\", ctypes.byref(sectors), ctypes.byref(sector_size),
+                                                        ctypes.byref(free), ctypes.byref(total)):
+            return None
+        _cluster_sizes[root] = sectors.value * sector_size.value
+    return _cluster_sizes[root]
+
+
+def _reflink_windows(src, dst):
+    """ Block cloning (FSCTL_DUPLICATE_EXTENTS_TO_FILE): chỉ ReFS / Dev Drive hỗ trợ, NTFS trả về lỗi """
+
+    import ctypes
+    import msvcrt
+    from ctypes import wintypes
+
+    class DuplicateExtentsData(ctypes.Structure):
+        _fields_ = [("FileHandle", wintypes.HANDLE), ("SourceFileOffset", ctypes.c_int64),
+                    ("TargetFileOffset", ctypes.c_int64), ("ByteCount", ctypes.c_int64)]
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.DeviceIoControl.argtypes = [wintypes.HANDLE, wintypes.DWORD, ctypes.c_void_p, wintypes.DWORD,
+                                         ctypes.c_void_p, wintypes.DWORD, ctypes.POINTER(wintypes.DWORD), ctypes.c_void_p]
+
+    cluster_size = _cluster_size(dst)
+    if not cluster_size:
+        return False
+
+    def control(handle, code, data=None):
+        returned = wintypes.DWORD()
+        pointer, size = (ctypes.byref(data), ctypes.sizeof(data)) if data is not None else (None, 0)
+        if not kernel32.DeviceIoControl(handle, code, pointer, size, None, 0, ctypes.byref(returned), None):
+            raise ctypes.WinError(ctypes.get_last_error())
+
+    try:
+        st = os.stat(src)
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            source_handle = msvcrt.get_osfhandle(s.fileno())
+            target_handle = msvcrt.get_osfhandle(d.fileno())
+            # File nguồn sparse thì file đích cũng phải sparse
+            if getattr(st, "st_file_attributes", 0) & FILE_ATTRIBUTE_SPARSE_FILE:
+                control(target_handle, FSCTL_SET_SPARSE)
+            d.truncate(st.st_size)
+            offset = 0
+            while offset < st.st_size:
+                # Vùng clone tính theo cluster, vùng cuối được làm tròn lên (vượt quá cuối file được chấp nhận)
+                count = min(st.st_size - offset, CLONE_CHUNK_SIZE)
+                count = (count + cluster_size - 1) // cluster_size * cluster_size
+                control(target_handle, FSCTL_DUPLICATE_EXTENTS_TO_FILE, DuplicateExtentsData(source_handle, offset, offset, count))
+                offset += count
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+
+def _reflink(src, dst):
+    """ Tạo bản sao copy-on-write (reflink), trả về False nếu hệ thống file không hỗ trợ """
+
+    if sys.platform.startswith("linux"):
+        import fcntl
+        try:
+            with open(src, "rb") as s, open(dst, "wb") as d:
+                fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            return True
+        except OSError:
+            if os.path.exists(dst):
+                os.remove(dst)
+            return False
+
+    if os.name == "nt":
+        return _reflink_windows(src, dst)
+
+    if sys.platform == "darwin":
+        import ctypes
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            return libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) == 0
+        except (OSError, AttributeError):
+            return False
+
+    return False
+
+
+def _make_writable(path):
+    """ Bỏ thuộc tính chỉ đọc của file """
+    try:
+        os.chmod(path, os.stat(path).st_mode | stat.S_IWRITE)
+    except OSError:
+        pass
+
+
+def _remove_readonly(func, path, _):
+    """ Xử lý lỗi xóa file chỉ đọc khi dùng shutil.rmtree """
+    _make_writable(path)
+    func(path)
+
+
+def remove_tree(path):
+    """ Xóa thư mục, kể cả các file chỉ đọc (file được link từ thư mục cached) """
+    shutil.rmtree(path, onerror=_remove_readonly)
+
+
+def unlink_file(path):
+    """ Xóa file nếu có (kể cả file chỉ đọc được link từ thư mục cached, file dùng chung không bị sửa) """
+
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except PermissionError:
+        _make_writable(path)
+        os.unlink(path)
+
+
+def safe_join(base, name):
+    """ Đường dẫn của name (tên tệp trong tệp nén, dấu / hoặc \\) bên trong thư mục base.
+    Raise ValueError nếu name trỏ ra ngoài base (đường dẫn tuyệt đối, ổ đĩa, '..') """
+
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".")]
+    if name.startswith(("/", "\\")) or any(part == ".." or ":" in part for part in parts):
+        raise ValueError(f"Tên tệp không an toàn trong tệp nén: {name}")
+    base = os.path.abspath(base)
+    target = os.path.join(base, *parts)
+    if os.path.commonpath([base, os.path.abspath(target)]) != base:
+        raise ValueError(f"Tên tệp không an toàn trong tệp nén: {name}")
+    return target
+
+
+def detach_file(path):
+    """ Tách file được hardlink thành bản riêng trước khi ghi để không sửa vào file dùng chung """
+
+    try:
+        if os.stat(path).st_nlink <= 1:
+            return False
+    except OSError:
+        return False
+
+    tmp_path = f"{path}.detach"
+    shutil.copyfile(path, tmp_path)
+    if os.name == "nt":
+        _make_writable(path)
+    os.replace(tmp_path, path)
+    return True
+
+
+def _scan_tree(path):
+    """ Lấy (kích thước, mtime) của toàn bộ file trong thư mục """
+
+    files = {}
+    for root, _, names in os.walk(path):
+        for name in names:
+            if name == MANIFEST_FILE:
+                continue
+            full_path = os.path.join(root, name)
+            st = os.stat(full_path)
+            files[os.path.relpath(full_path, path)] = [st.st_size, st.st_mtime_ns]
+    return files
+
+
+def seal_cache_tree(path):
+    """ Đánh dấu thư mục cached: ghi manifest và bỏ quyền ghi file (trừ Windows, nơi file chỉ đọc không xóa được) """
+
+    if os.name != "nt":
+        for root, _, names in os.walk(path):
+            for name in names:
+                if name != MANIFEST_FILE:
+                    full_path = os.path.join(root, name)
+                    os.chmod(full_path, os.stat(full_path).st_mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+    with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(_scan_tree(path), f)
+
+
+def verify_cache_tree(path):
+    """ Kiểm tra thư mục cached có bị website nào sửa qua hardlink không """
+
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        seal_cache_tree(path)
+        return True
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return _scan_tree(path) == manifest
+    except (OSError, ValueError):
+        return False
+
+
+class TreeDeployer:
+    """ Đưa cây thư mục vào website bằng reflink, hardlink (trừ Windows) hoặc copy """
+
+    def __init__(self, mode=None):
+        self.mode = mode or config.deploy_mode
+        self.can_reflink = self.mode in ("link", "reflink")
+        # Windows: file chỉ đọc vẫn bị WordPress / plugin ghi đè tại chỗ (update, editor), hardlink sẽ sửa vào
+        # thư mục cached và mọi website dùng chung nên chỉ dùng reflink / copy
+        self.can_hardlink = self.mode == "link" and os.name != "nt"
+        self.stats = {"reflink": 0, "hardlink": 0, "copy": 0, "bytes_copied": 0}
+
+    def deploy_file(self, src, dst):
+        """ Đưa một file vào website, tự chuyển sang copy nếu hệ thống file không hỗ trợ link """
+
+        if os.path.lexists(dst):
+            if os.name == "nt":
+                _make_writable(dst)
+            os.remove(dst)
+
+        if self.can_reflink:
+            if _reflink(src, dst):
+                self.stats["reflink"] += 1
+                return
+            self.can_reflink = False
+
+        if self.can_hardlink:
+            try:
+                os.link(src, dst)
+                self.stats["hardlink"] += 1
+                return
+            except OSError:
+                self.can_hardlink = False
+
+        shutil.copyfile(src, dst)
+        self.stats["copy"] += 1
+        self.stats["bytes_copied"] += os.path.getsize(dst)
+
+    def deploy(self, source_path, destination_path):
+        """ Đưa toàn bộ file trong source_path vào destination_path """
+
+        with ThreadPoolExecutor(max_workers=config.deploy_workers) as executor:
+            futures = []
+            for root, _, names in os.walk(source_path):
+                target_dir = os.path.join(destination_path, os.path.relpath(root, source_path))
+                os.makedirs(target_dir, exist_ok=True)
+                for name in names:
+                    if name != MANIFEST_FILE:
+                        futures.append(executor.submit(self.deploy_file, os.path.join(root, name), os.path.join(target_dir, name)))
+
+            for future in futures:
+                future.result()
+
+        return self.stats
+
+
+async def deploy_tree(source_path, destination_path, mode=None):
+    """ Đưa thư mục từ cached vào website theo config.deploy_mode ("copy", "reflink" hoặc "link") """
+
+    deployer = TreeDeployer(mode)
+    try:
+        async with limits.disk():
+            with span("deploy", mode=deployer.mode) as current:
+                stats = await asyncio.to_thread(deployer.deploy, source_path, destination_path)
+                current.add_bytes(stats["bytes_copied"])
+    except Exception as e:
+        print(f"Lỗi khi sao chép thư mục {source_path}: {e}")
+        sys.exit(1)
+
+    print(f"Đã đưa {source_path} vào {destination_path} (reflink: {stats['reflink']}, hardlink: {stats['hardlink']}, copy: {stats['copy']})\n")
+
+    global _copy_fallback_warned
+    if deployer.mode != "copy" and stats["copy"] and not _copy_fallback_warned:
+        _copy_fallback_warned = True
+        if os.name == "nt":
+            hint = "trên Windows cần ổ ReFS / Dev Drive"
+        else:
+            hint = "cần btrfs, xfs, APFS..." + (" hoặc cùng ổ đĩa để hardlink" if deployer.mode == "link" else "")
+        print(f'Cảnh báo: deploy_mode = "{deployer.mode}" nhưng hệ thống file không hỗ trợ, các file được copy ({hint})\n')
+    return stats
@@ -1,5 +1,4 @@
 import argparse, os, re, sys
-from database_handler import check_database_exists
 import config
 
 
@@ -40,13 +39,16 @@ async def validate_yes_no_input(prompt: str, default: bool = False) -> bool:
 
 async def validate_website_path(website_name: str, laragon_path: str) -> str:
     """Validate website path and check for conflicts"""
+    from site_inventory import get_site_inventory
+
     website_path = os.path.join(laragon_path, 'www', website_name)
-    
-    if os.path.exists(website_path):
+    inventory = await get_site_inventory(laragon_path).ensure_loaded()
+
+    if inventory.site_exists(website_name) or os.path.exists(website_path):
         print(f'Thư mục / website "{website_name}" đã tồn tại!')
         sys.exit(1)
 
-    if await check_database_exists(website_name):
+    if inventory.database_exists(website_name):
         print(f'Database "{website_name}" đã tồn tại!')
         sys.exit(1)
         
@@ -66,17 +68,34 @@ async def parse_arguments() -> argparse.Namespace:
 
     # Restore website
     parser.add_argument('--ai1', help='Sử dụng plugin All-in-One WP Migration và restore website')
-    parser.add_argument('--dup', help='Sử dụng plugin Duplicator Pro và restore website')
+    parser.add_argument('--dup', help='Restore website từ gói backup Duplicator / Duplicator Pro (thư mục chứa installer.php và file .zip / .daf, hoặc file archive)')
     parser.add_argument('--wpcontent', help='Restore website thủ công bằng "wp-content"')
     parser.add_argument('--db', help='Database path')
     parser.add_argument('--wp', help='Restore website thủ công bằng source code đầy đủ')
 
     # Bulk restore website
-    parser.add_argument('--bulk_restore', nargs='?', const='', help='Restore website hàng loạt từ file csv')
+    parser.add_argument('--bulk_restore', nargs='?', const='', help='Restore website hàng loạt từ file danh sách website (.csv, .jsonl, .yaml)')
+    parser.add_argument('--workers', type=int, help='Số website restore cùng lúc khi bulk restore')
+    parser.add_argument('--disk-jobs', type=int, help='Số tác vụ copy file chạy đồng thời khi bulk restore')
+    parser.add_argument('--sql-jobs', type=int, help='Số tác vụ import database chạy đồng thời khi bulk restore')
+    parser.add_argument('--php-jobs', type=int, help='Số lệnh WP-CLI chạy đồng thời khi bulk restore')
+    parser.add_argument('--resume', action='store_true', help='Chạy tiếp bulk restore bị dừng, bỏ qua các bước đã hoàn thành')
+    parser.add_argument('--preflight-only', action='store_true', help='Chỉ kiểm tra file danh sách website của bulk restore (đường dẫn, tên trùng, website / database đã tồn tại, dung lượng) và ước tính thời gian, không restore')
+
+    # Đo thời gian
+    parser.add_argument('--trace', help='Ghi thời gian từng bước ra file (định dạng Chrome trace, mở bằng chrome://tracing hoặc Perfetto)')
+
+    # Danh sách website
+    parser.add_argument('--list', action='store_true', help='Hiện danh sách website: prefix, dung lượng database / file, SSL, thời gian sửa đổi')
 
     # Delete website
     parser.add_argument('--delete', nargs='?', const='', help='Xóa website (để trống để xóa trong chế độ tương tác hoặc nhập tên website để xóa trực tiếp)')
 
+    # Template website
+    parser.add_argument('--template-build', action='store_true', help='Dựng template website (dùng kèm -l, -o, -i) để tạo website mới nhanh hơn')
+    parser.add_argument('--template-list', action='store_true', help='Hiện danh sách template website')
+    parser.add_argument('--template-clear', nargs='?', const='', help='Xóa template (để trống để xóa tất cả hoặc nhập key của template)')
+
     # Positional arguments
     parser.add_argument('args', nargs='*', help='[Website Name] [Admin Username] [Admin Password]')
 
@@ -161,7 +180,10 @@ async def handle_command_line_input(args: argparse.Namespace, laragon_path: str)
 
 async def handle_interactive_input(laragon_path: str) -> WebsiteInputs:
     """Handle interactive user input"""
+    from site_inventory import get_site_inventory
+
     inputs = WebsiteInputs()
+    inventory = await get_site_inventory(laragon_path).ensure_loaded()
     
     # Get website name
     while True:
@@ -171,11 +193,11 @@ async def handle_interactive_input(laragon_path: str) -> WebsiteInputs:
             continue
             
         inputs.website_path = os.path.join(laragon_path, "www", inputs.website_name)
-        if os.path.exists(inputs.website_path):
+        if inventory.site_exists(inputs.website_name) or os.path.exists(inputs.website_path):
             print("Thư mục đã tồn tại, vui lòng nhập tên website khác!")
             continue
             
-        if check_database_exists(inputs.website_name):
+        if inventory.database_exists(inputs.website_name):
             print("Database đã tồn tại, vui lòng nhập tên website khác!")
             continue
             
@@ -203,12 +225,45 @@ async def handle_interactive_input(laragon_path: str) -> WebsiteInputs:
     return inputs
 
 
-async def get_website_inputs(laragon_path: str, laragon_sites_path: str):
+async def handle_template_args(args: argparse.Namespace):
+    """Handle template-related arguments"""
+
+    from main import get_laragon_path
+    from site_template import build_template, clear_templates, print_templates
+
+    _, _, cached_path = get_laragon_path()
+
+    if args.template_list:
+        await print_templates(cached_path)
+
+    elif args.template_clear is not None:
+        count = clear_templates(cached_path, args.template_clear or None)
+        print(f'Đã xóa {count} template!')
+
+    elif args.template_build:
+        inputs = WebsiteInputs()
+        inputs.apply_options = not args.option
+        inputs.language = args.language if args.language else inputs.language
+
+        from wp_installer import WPInstaller
+        selected_plugins = await WPInstaller(inputs).choose_install_plugin() if args.plugins else None
+        await build_template(inputs, selected_plugins)
+
+
+async def get_website_inputs():
     """Main function to get all website inputs"""
     
     bulk_restore_file = config.bulk_restore_path
     args = await parse_arguments()
 
+    # Đường dẫn Laragon chỉ kiểm tra sau khi đọc tham số (để --help chạy được khi chưa cài Laragon)
+    from main import get_laragon_path
+    laragon_path, laragon_sites_path, _ = get_laragon_path()
+
+    if args.trace:
+        from tracing import tracer
+        tracer.enable(args.trace)
+
     if args.bulk_restore is not None:  
         if not args.bulk_restore:
             print("Bạn chưa nhập đường dẫn tới file CSV, dùng file mặc định!")
@@ -217,10 +272,23 @@ async def get_website_inputs(laragon_path: str, laragon_sites_path: str):
             args.bulk_restore = args.bulk_restore
 
         from bulk_restore import BulkRestore
-        bulk_restore = BulkRestore(args.bulk_restore)
+        bulk_restore = BulkRestore(
+            args.bulk_restore,
+            workers=args.workers,
+            disk_jobs=args.disk_jobs,
+            sql_jobs=args.sql_jobs,
+            php_jobs=args.php_jobs,
+            resume=args.resume,
+            preflight_only=args.preflight_only
+        )
         await bulk_restore.restore_from_csv()
         sys.exit(0)
 
+    elif args.list:
+        from site_inventory import print_inventory
+        await print_inventory(laragon_path)
+        sys.exit(0)
+
     elif args.delete is not None:
         from delete_website import delete_website_by_name, delete_website_interactive
 
@@ -229,7 +297,11 @@ async def get_website_inputs(laragon_path: str, laragon_sites_path: str):
         else:
             await delete_website_interactive(laragon_path, laragon_sites_path)
         sys.exit(0) 
-        
+
+    elif args.template_build or args.template_list or args.template_clear is not None:
+        await handle_template_args(args)
+        sys.exit(0)
+
     else:
         inputs = await handle_command_line_input(args, laragon_path)
         if inputs:
@@ -1,10 +1,12 @@
 import os
 import asyncio
+import functools
 from input_handler import get_website_inputs
 import config
 
 
-# Function xác định đường dẫn cài đặt Laragon
+# Function xác định đường dẫn cài đặt Laragon (chỉ kiểm tra một lần, khi cần dùng)
+@functools.lru_cache(maxsize=None)
 def get_laragon_path():
     laragon_path = config.laragon_path
     laragon_sites_path = os.path.join(laragon_path, "www")
@@ -16,15 +18,21 @@ def get_laragon_path():
 
 
 async def main():
-    laragon_path, laragon_sites_path, _ = get_laragon_path()
+    try:
+        inputs = await get_website_inputs()
 
-    inputs = await get_website_inputs(laragon_path, laragon_sites_path)    
-
-    # Create new website
-    from wp_installer import WPInstaller
-    wp_install = WPInstaller(inputs)
-    selected_plugins = await wp_install.choose_install_plugin() if inputs.is_install_plugins else None
-    await wp_install.create_new_website(selected_plugins)
+        # Create new website
+        from wp_installer import WPInstaller
+        wp_install = WPInstaller(inputs)
+        selected_plugins = await wp_install.choose_install_plugin() if inputs.is_install_plugins else None
+        await wp_install.create_new_website(selected_plugins)
+    finally:
+        from database_pool import db_pool
+        from wp_worker import wp_workers
+        from tracing import tracer
+        tracer.export()
+        await wp_workers.close_all()
+        await db_pool.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
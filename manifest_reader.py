@@ -0,0 +1,196 @@
+import os
+import csv
+import json
+import codecs
+import asyncio
+from dataclasses import dataclass
+
+
+# Định dạng file danh sách website cho bulk restore, theo phần mở rộng
+MANIFEST_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".yaml": "yaml", ".yml": "yaml"}
+
+REQUIRED_COLUMNS = ["website_name", "source_path", "restore_method"]
+
+# Số bytes đầu file dùng để nhận dạng encoding
+SNIFF_SIZE = 64 * 1024
+
+
+class ManifestError(Exception):
+    """ File danh sách website không đọc được (không tồn tại, sai định dạng, thiếu cột bắt buộc) """
+
+
+@dataclass
+class ManifestRow:
+    """ Một website trong file danh sách: số dòng (bắt đầu từ 1), dữ liệu, lỗi nếu dòng không hợp lệ """
+
+    line: int
+    data: dict
+    error: str = None
+
+
+def sniff_encoding(path):
+    """ Nhận dạng encoding từ phần đầu file: BOM (UTF-8 / UTF-16), UTF-16 không BOM, UTF-8, còn lại là cp1258 """
+
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_SIZE)
+
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    # Văn bản UTF-16 không BOM: byte 0 xen kẽ với ký tự ASCII
+    if len(head) >= 4 and head[1::2].count(0) > len(head) // 4:
+        return "utf-16-le"
+    if len(head) >= 4 and head[0::2].count(0) > len(head) // 4:
+        return "utf-16-be"
+    try:
+        # final=False: ký tự nhiều byte bị cắt ở cuối đoạn đọc không tính là lỗi
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1258"
+
+
+def _normalize(line, data):
+    """ Chuyển một bản ghi JSON / YAML thành dict chuỗi như một dòng CSV, trả về ManifestRow (kèm lỗi nếu có) """
+
+    if not isinstance(data, dict):
+        return ManifestRow(line, {}, "Mỗi website phải là một object (key: value)")
+
+    row = {}
+    for key, value in data.items():
+        if isinstance(value, (dict, list)):
+            return ManifestRow(line, {}, f"Giá trị của '{key}' phải là chuỗi")
+        if value is None:
+            value = ""
+        elif isinstance(value, bool):
+            value = "true" if value else "false"
+        row[str(key)] = str(value)
+    return _validate(line, row)
+
+
+def _validate(line, row):
+    missing = [column for column in REQUIRED_COLUMNS if not (row.get(column) or "").strip()]
+    if missing:
+        return ManifestRow(line, row, f"Thiếu giá trị bắt buộc: {', '.join(missing)}")
+    return ManifestRow(line, row)
+
+
+class ManifestReader:
+    """ Đọc file danh sách website (CSV, JSONL, YAML) theo từng dòng: restore chạy ngay khi đọc được dòng đầu tiên.
+    async for row in reader: ... trả về ManifestRow, dòng sai trả về kèm lỗi thay vì dừng cả file """
+
+    def __init__(self, path):
+        self.path = path
+        self.format = MANIFEST_FORMATS.get(os.path.splitext(path)[1].lower())
+        self.encoding = None
+        self.fieldnames = None
+
+    async def open(self):
+        """ Kiểm tra file, nhận dạng encoding và đọc header (CSV). Raise ManifestError nếu file không dùng được """
+
+        import aiofiles
+
+        if not os.path.isfile(self.path):
+            raise ManifestError(f"Tệp '{self.path}' không tồn tại. Vui lòng kiểm tra lại đường dẫn!")
+        if self.format is None:
+            raise ManifestError(f"Tệp '{self.path}' không được hỗ trợ! Chỉ đọc được file {', '.join(MANIFEST_FORMATS)}")
+
+        self.encoding = await asyncio.to_thread(sniff_encoding, self.path)
+
+        if self.format == "csv":
+            async with aiofiles.open(self.path, "r", encoding=self.encoding, errors="replace", newline="") as f:
+                header = await f.readline()
+            self.fieldnames = [name.strip() for name in next(csv.reader([header]), [])]
+            missing = [column for column in REQUIRED_COLUMNS if column not in self.fieldnames]
+            if missing:
+                raise ManifestError(
+                    f"Thiếu các cột bắt buộc trong file CSV: {', '.join(missing)}\n"
+                    f"File CSV phải có các cột: {', '.join(REQUIRED_COLUMNS)}"
+                )
+        return self
+
+    def __aiter__(self):
+        return {"csv": self._read_csv, "jsonl": self._read_jsonl, "yaml": self._read_yaml}[self.format]()
+
+    async def _read_csv(self):
+        import aiofiles
+
+        async with aiofiles.open(self.path, "r", encoding=self.encoding, errors="replace", newline="") as f:
+            await f.readline()
+            line_number = 1
+            while True:
+                # Một bản ghi CSV có thể gồm nhiều dòng (giá trị trong dấu ngoặc kép có xuống dòng):
+                # đọc thêm dòng đến khi số dấu ngoặc kép là số chẵn
+                lines = []
+                start = line_number + 1
+                while True:
+                    line = await f.readline()
+                    if not line:
+                        break
+                    line_number += 1
+                    lines.append(line)
+                    if sum(part.count('"') for part in lines) % 2 == 0:
+                        break
+                if not lines:
+                    return
+
+                values = next(csv.reader(lines), [])
+                if not any(value.strip() for value in values):
+                    continue
+                if len(values) > len(self.fieldnames):
+                    yield ManifestRow(start, {}, f"Dòng có {len(values)} cột, header chỉ có {len(self.fieldnames)} cột")
+                    continue
+                # Cột tùy chọn bị bỏ trống ở cuối dòng
+                values += [""] * (len(self.fieldnames) - len(values))
+                yield _validate(start, dict(zip(self.fieldnames, values)))
+
+    async def _read_jsonl(self):
+        import aiofiles
+
+        async with aiofiles.open(self.path, "r", encoding=self.encoding, errors="replace") as f:
+            line_number = 0
+            async for line in f:
+                line_number += 1
+                if not line.strip() or line.lstrip().startswith("#"):
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError as e:
+                    yield ManifestRow(line_number, {}, f"JSON không hợp lệ: {e}")
+                    continue
+                yield _normalize(line_number, data)
+
+    async def _read_yaml(self):
+        """ YAML: danh sách website ở gốc file hoặc trong key `sites`. File YAML được phân tích cả file một lần
+        (trong thread), số dòng lấy từ vị trí của từng phần tử """
+
+        for row in await asyncio.to_thread(self._parse_yaml):
+            yield row
+
+    def _parse_yaml(self):
+        try:
+            import yaml
+        except ImportError:
+            raise ManifestError("Cần cài thư viện PyYAML để đọc file YAML: pip install pyyaml")
+
+        with open(self.path, "r", encoding=self.encoding, errors="replace") as f:
+            loader = yaml.SafeLoader(f)
+            try:
+                node = loader.get_single_node()
+                if isinstance(node, yaml.MappingNode):
+                    node = next((value for key, value in node.value if key.value == "sites"), None)
+                if node is None:
+                    return []
+                if not isinstance(node, yaml.SequenceNode):
+                    raise ManifestError("File YAML phải là danh sách website (hoặc danh sách trong key 'sites')")
+                return [_normalize(item.start_mark.line + 1, loader.construct_object(item, deep=True)) for item in node.value]
+            except yaml.YAMLError as e:
+                raise ManifestError(f"File YAML không hợp lệ: {e}")
+            finally:
+                loader.dispose()
+
+
+async def open_manifest(path):
+    """ Mở file danh sách website cho bulk restore """
+    return await ManifestReader(path).open()
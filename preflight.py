@@ -0,0 +1,225 @@
+import os
+import shutil
+import asyncio
+from dataclasses import dataclass, field
+import config
+from scheduler import path_size
+from site_inventory import format_size
+from duplicator import find_archive
+
+
+RESTORE_METHODS = ["ai1", "dup", "wpcontent", "wp"]
+
+# Dung lượng cần trên ổ đĩa so với dung lượng nguồn: file backup (.wpress, .zip) được copy rồi giải nén
+SPACE_FACTOR = {"ai1": 2.0, "dup": 2.0, "wpcontent": 1.0, "wp": 1.0}
+
+
+@dataclass
+class PreflightRow:
+    """ Kết quả kiểm tra một website trong file danh sách """
+
+    line: int
+    row: dict
+    website_name: str
+    restore_method: str
+    files_size: int = 0
+    db_size: int = 0
+    skipped: bool = False
+    errors: list = field(default_factory=list)
+    missing_requirements: list = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    @property
+    def size(self):
+        return self.files_size + self.db_size
+
+    @property
+    def estimated_seconds(self):
+        """ Thời gian ước tính nếu website chạy một mình """
+        return (self.files_size / (config.preflight_disk_mbps * 1024 * 1024)
+                + self.db_size / (config.preflight_sql_mbps * 1024 * 1024)
+                + config.preflight_site_seconds)
+
+    def error(self, message, requirement=None):
+        self.errors.append(message)
+        if requirement:
+            self.missing_requirements.append(requirement)
+
+
+@dataclass
+class PreflightReport:
+    """ Kết quả kiểm tra toàn bộ file danh sách website """
+
+    rows: list = field(default_factory=list)
+    free_space: int = None
+    required_space: int = 0
+    workers: int = 1
+
+    @property
+    def valid_rows(self):
+        return [row for row in self.rows if row.ok and not row.skipped]
+
+    @property
+    def invalid_rows(self):
+        return [row for row in self.rows if not row.ok]
+
+    @property
+    def estimated_seconds(self):
+        """ Thời gian ước tính cho cả lô: copy file dùng chung ổ đĩa, import dùng chung MySQL,
+        các bước còn lại chia cho số worker; không nhanh hơn website lớn nhất """
+
+        rows = self.valid_rows
+        if not rows:
+            return 0.0
+        disk = sum(row.files_size for row in rows) / (config.preflight_disk_mbps * 1024 * 1024)
+        sql = sum(row.db_size for row in rows) / (config.preflight_sql_mbps * 1024 * 1024)
+        overhead = len(rows) * config.preflight_site_seconds / min(self.workers, len(rows))
+        return max(disk + overhead, sql + overhead, max(row.estimated_seconds for row in rows))
+
+    def print(self):
+        """ In báo cáo kiểm tra """
+
+        valid_rows = self.valid_rows
+        skipped = sum(1 for row in self.rows if row.skipped)
+        print("\n" + "="*50)
+        print("KIỂM TRA FILE DANH SÁCH WEBSITE:")
+        print(f"Tổng số dòng: {len(self.rows)}")
+        print(f"Hợp lệ: {len(valid_rows)}")
+        if skipped:
+            print(f"Đã restore ở lần chạy trước: {skipped}")
+        print(f"Không hợp lệ: {len(self.invalid_rows)}")
+
+        for row in self.invalid_rows:
+            print(f"- Dòng {row.line} ({row.website_name or 'không có tên'}): {'; '.join(row.errors)}")
+
+        print(f"\nDung lượng dữ liệu: {format_size(sum(row.size for row in valid_rows))} "
+              f"(file: {format_size(sum(row.files_size for row in valid_rows))}, database: {format_size(sum(row.db_size for row in valid_rows))})")
+        if self.free_space is not None:
+            print(f"Dung lượng cần trên ổ đĩa: {format_size(self.required_space)} / còn trống {format_size(self.free_space)}")
+        print(f"Thời gian ước tính: {format_duration(self.estimated_seconds)} với {self.workers} worker")
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def _check_paths(check):
+    """ Kiểm tra đường dẫn và tính dung lượng của một dòng (chạy trong thread) """
+
+    row = check.row
+    source_path = (row.get("source_path") or "").strip()
+    db_path = (row.get("db_path") or "").strip()
+    method = check.restore_method
+
+    if not source_path:
+        check.error("Thiếu source_path", "source_path")
+        return
+    if not os.path.exists(source_path):
+        check.error(f"Đường dẫn source path không tồn tại: {source_path}")
+        return
+
+    if method == "ai1":
+        if not os.path.isfile(source_path):
+            check.error(f"source_path phải là file .wpress: {source_path}")
+    elif method == "dup":
+        # installer.php chỉ cần khi gói backup không restore tự động được
+        if find_archive(source_path) is None:
+            check.error("Không tìm thấy file archive .zip / .daf trong source path", "zip")
+    elif method == "wp":
+        if not os.path.isdir(source_path):
+            check.error(f"source_path phải là thư mục source code: {source_path}")
+        else:
+            sql_files = [name for name in os.listdir(source_path) if name.endswith(".sql")]
+            if not sql_files:
+                check.error("Không tìm thấy file SQL trong source path", "sql")
+            else:
+                check.db_size = os.path.getsize(os.path.join(source_path, sql_files[0]))
+    elif method == "wpcontent":
+        if not db_path:
+            check.error("Không tìm thấy đường dẫn database", "db_path")
+        elif not os.path.isfile(db_path):
+            check.error(f"Đường dẫn database không tồn tại: {db_path}")
+        else:
+            check.db_size = os.path.getsize(db_path)
+
+    check.files_size = path_size(source_path)
+    if method == "wp":
+        # File SQL nằm trong source code, không tính hai lần
+        check.files_size -= check.db_size
+
+
+class Preflight:
+    """ Kiểm tra từng website trong file danh sách trước khi restore (dòng được kiểm tra ngay khi đọc được):
+    tên trùng, website / database đã tồn tại (inventory đã refresh: một truy vấn cho tất cả database),
+    phương thức, đường dẫn và dung lượng, db_path, dung lượng ổ đĩa còn trống (cộng dồn theo thứ tự dòng) """
+
+    def __init__(self, inventory, laragon_sites_path, journal=None, workers=None):
+        self.inventory = inventory
+        self.laragon_sites_path = laragon_sites_path
+        self.journal = journal
+        self.seen = set()
+        self.report = PreflightReport(workers=workers or config.bulk_workers)
+        try:
+            self.report.free_space = shutil.disk_usage(laragon_sites_path).free
+        except OSError:
+            self.report.free_space = None
+
+    def reject(self, line, row, message):
+        """ Ghi nhận dòng không đọc được (lỗi của file danh sách) """
+
+        check = PreflightRow(line, row, (row.get("website_name") or "").strip(), (row.get("restore_method") or "").strip().lower())
+        check.error(message)
+        self.report.rows.append(check)
+        return check
+
+    async def check(self, line, row):
+        """ Kiểm tra một website, trả về PreflightRow """
+
+        website_name = (row.get("website_name") or "").strip()
+        check = PreflightRow(line, row, website_name, (row.get("restore_method") or "").strip().lower())
+        self.report.rows.append(check)
+
+        if not website_name:
+            check.error("Thiếu website_name", "website_name")
+            return check
+        if website_name in self.seen:
+            check.error(f"Website {website_name} bị trùng trong file danh sách")
+            return check
+        self.seen.add(website_name)
+
+        if self.journal and self.journal.is_completed(website_name):
+            check.skipped = True
+            return check
+        # Website đang restore dở ở lần chạy trước: cho phép chạy tiếp
+        if not (self.journal and self.journal.is_started(website_name)):
+            error_message = self.inventory.check_available(website_name)
+            if error_message is None and os.path.exists(os.path.join(self.laragon_sites_path, website_name)):
+                error_message = "Thư mục website đã tồn tại"
+            if error_message:
+                check.error(error_message)
+
+        if check.restore_method not in RESTORE_METHODS:
+            check.error(f"Phương thức restore không hợp lệ: {check.restore_method}")
+        if not check.ok:
+            return check
+
+        # Kiểm tra đường dẫn và tính dung lượng trong thread
+        await asyncio.to_thread(_check_paths, check)
+        if not check.ok:
+            return check
+
+        required_space = int((check.files_size * SPACE_FACTOR[check.restore_method] + check.db_size) * config.preflight_space_margin)
+        free_space = self.report.free_space
+        if free_space is not None and self.report.required_space + required_space > free_space:
+            check.error(
+                f"Không đủ dung lượng ổ đĩa: cần {format_size(required_space)}, "
+                f"còn trống {format_size(max(free_space - self.report.required_space, 0))}"
+            )
+            return check
+        self.report.required_space += required_space
+        return check
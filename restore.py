@@ -2,18 +2,40 @@ from input_handler import WebsiteInputs
 from wp_installer import WPInstaller
 from database_handler import create_database, update_table_prefix, find_sql_file
 from utilities import print_info, save_wp_credentials, copy_file_folder, reload_laragon
-from commands import run_command, run_sql_command
-import os, sys, shutil, subprocess
+from commands import run_command
+from sql_import import import_sql_file, SqlImportError
+from url_rewrite import UrlRewriter
+from file_deploy import remove_tree, unlink_file
+from tracing import set_site, span, traced
+from wp_worker import wp_workers
+from duplicator import DuplicatorPackage, DuplicatorError, remove_installer_files
+from wpress import WpressArchive, WpressError, DATABASE_FILE, SERVMASK_PREFIX, prefix_transform
+import config
+import os, sys, time, json
 from main import get_laragon_path
 import asyncio
 
 
-laragon_path, laragon_sites_path, cached_path = get_laragon_path()
+# Bước có kết quả được dùng lại khi chạy tiếp (--resume)
+PHASES_WITH_VALUE = {"prefix_fixed"}
+
+
+def _journal_value(result):
+    """ Kết quả của bước được ghi vào nhật ký nếu ghi được dưới dạng JSON (chuỗi, số, bool, list, dict) """
+
+    try:
+        json.dumps(result)
+    except (TypeError, ValueError):
+        return None
+    return result
+
 
 class Restore:
     """ Restore website """
 
-    def __init__(self, inputs: WebsiteInputs, bulk_restore: bool = False):
+    def __init__(self, inputs: WebsiteInputs, bulk_restore: bool = False, journal=None):
+
+        laragon_path, laragon_sites_path, cached_path = get_laragon_path()
 
         self.laragon_path = laragon_path
         self.laragon_sites_path = laragon_sites_path
@@ -27,165 +49,371 @@ class Restore:
         self.language = inputs.language
         self.apply_options = inputs.apply_options
         self.bulk_restore = bulk_restore
+        self.journal = journal
+        # Thời gian (giây) của từng bước đã chạy
+        self.phase_times = {}
         self.protocol = "https://" if self.ssl else "http://"
         self.website_url = f"{self.protocol}{self.website_name}.test"
         self.website_path = os.path.join(self.laragon_sites_path, self.website_name)
 
-        self.wp_cli_cmd = f'wp --path=\"{self.website_path}\"'
+        self.wp_cli = ["wp", f"--path={self.website_path}"]
     
         self.wp_install = WPInstaller(inputs)
+        set_site(self.website_name)
+
+    async def _phase(self, phase, step):
+        """ Chạy một bước restore và ghi vào nhật ký, bỏ qua nếu bước đã xong ở lần chạy trước (--resume) """
+
+        if self.journal and self.journal.is_done(self.website_name, phase):
+            value = self.journal.get_value(self.website_name, phase)
+            # Nhật ký cũ có thể ghi bước xong mà không có giá trị cần dùng lại (table prefix): chạy lại bước
+            if phase in PHASES_WITH_VALUE and not value:
+                print(f"Bước '{phase}' của {self.website_name} không có kết quả ở lần chạy trước, chạy lại")
+            else:
+                print(f"Bỏ qua bước '{phase}' của {self.website_name} (đã hoàn thành ở lần chạy trước)")
+                return value
+
+        start = time.perf_counter()
+        with span(phase, "restore_phase"):
+            result = await step()
+        self.phase_times[phase] = round(time.perf_counter() - start, 3)
+        if self.journal:
+            self.journal.mark(self.website_name, phase, _journal_value(result))
+        return result
+
+    async def _create_website_dir(self):
+        os.makedirs(self.website_path, exist_ok=True)
+        print(f"\nThư mục {self.website_path} đã được tạo thành công!")
+
+    async def _update_admin(self, prefix, change_url=False):
+        """ Đổi url (nếu cần), thông tin admin và lưu thông tin đăng nhập """
+
+        await asyncio.gather(
+            self.wp_install.change_admin_info(prefix, change_url),
+            save_wp_credentials(self.website_path, self.website_url, self.wp_admin, self.wp_admin_password, self.wp_admin_email)
+        )
+
+    async def _fix_prefix(self):
+        # wp-config.php / tên bảng thay đổi: WP worker đang chạy không còn đúng
+        await wp_workers.close(self.website_path)
+        prefix = await update_table_prefix(self.website_name, self.website_path)
+        if not prefix:
+            # Không ghi bước là đã xong: các bước sau cần prefix để sửa bảng options / users
+            message = f"Không xác định được table prefix của database {self.website_name}"
+            if self.bulk_restore:
+                raise RuntimeError(message)
+            print(message)
+            sys.exit(1)
+        return prefix
+
+    async def _install_wp_core(self):
+        """ Tải / giải nén / copy Wordpress core, tạo wp-config.php, cài đặt Wordpress và tạo .htaccess """
 
+        await self.wp_install.install_wp_core()
+        await self.wp_install.edit_wp_config()
+        await self.wp_install.install_wordpress()
+        await self.wp_install.edit_htaccess()
+
+    @traced("import")
+    async def import_database(self, db_path, old_urls=None, replacements=None, transform=None):
+        """ Import file SQL vào database của website (song song theo bảng), đổi url cũ thành url mới trong lúc import.
+        old_urls, replacements: url cũ và các cặp (chuỗi cũ, chuỗi mới) biết trước; transform(rewriter) tạo transform riêng """
+
+        rewriter = UrlRewriter(self.website_url, old_urls, replacements)
+        await wp_workers.close(self.website_path)
+        try:
+            return await import_sql_file(
+                self.website_name, db_path,
+                transform=transform(rewriter) if transform else rewriter.rewrite_line,
+                line_hook=rewriter.detect_line
+            )
+        except SqlImportError as e:
+            print(e)
+            if self.bulk_restore:
+                raise
+            sys.exit(1)
+
+    @traced("restore_ai1")
     async def restore_ai1(self, ai1_source_path):
-        """Restore website bằng plugin All-in-One WP Migration"""
+        """Restore website từ file .wpress của All-in-One WP Migration: đọc trực tiếp file .wpress,
+        dùng plugin nếu file không đọc trực tiếp được (mã hóa, nén, multisite)"""
+
+        archive = None
+        if config.native_wpress:
+            try:
+                archive = await asyncio.to_thread(WpressArchive, ai1_source_path)
+                reason = archive.unsupported_reason()
+            except (WpressError, OSError) as e:
+                reason = str(e)
+            if reason:
+                print(f"Không đọc trực tiếp được file .wpress ({reason}), restore bằng plugin All-in-One WP Migration")
+                archive = None
+
+        if archive is None:
+            await self._restore_ai1_plugin(ai1_source_path)
+        else:
+            await self._restore_wpress(archive)
+
+        if not self.bulk_restore:
+            await print_info(self.website_url, self.wp_admin, self.wp_admin_password, self.wp_admin_email)
+            await reload_laragon(self.laragon_path, self.website_url)
+
+    async def _restore_wpress(self, archive):
+        """ Restore từ file .wpress không qua plugin: WordPress core từ cache, wp-content và database.sql ghi thẳng
+        từ file .wpress (một lần đọc), import database đổi tiền tố SERVMASK_PREFIX_ và url của website cũ """
+
+        await self._phase("dir_created", self._create_website_dir)
+        await self._phase("db_created", lambda: create_database(self.website_name))
+
+        sql_path = os.path.join(self.website_path, DATABASE_FILE)
+
+        async def copy_files():
+            await self.wp_install.install_wp_core()
+
+            async def extract():
+                print(f"Giải nén {os.path.basename(archive.path)} vào {self.website_path}")
+                with span("wpress_extract", "disk") as current:
+                    files, size, seconds = await asyncio.to_thread(
+                        archive.extract, os.path.join(self.website_path, "wp-content"), sql_path
+                    )
+                    current.add_bytes(size)
+                print(f"Đã giải nén {files} tệp, {size / (1024 * 1024):.1f} MB trong {seconds:.2f}s "
+                      f"({size / (1024 * 1024) / seconds if seconds > 0 else 0:.1f} MB/s)")
+
+            await asyncio.gather(
+                self.wp_install.edit_wp_config(),
+                self.wp_install.edit_htaccess(),
+                extract(),
+            )
+
+        await self._phase("files_copied", copy_files)
+
+        async def import_database():
+            await self.import_database(
+                sql_path, old_urls=archive.old_urls(), replacements=[(SERVMASK_PREFIX, "wp_")],
+                transform=lambda rewriter: prefix_transform(rewriter, "wp_")
+            )
+            os.remove(sql_path)
+
+        await self._phase("db_imported", import_database)
+
+        prefix = await self._phase("prefix_fixed", self._fix_prefix)
+        await self._phase("admin_updated", lambda: self._update_admin(prefix, change_url=True))
+
+    async def _restore_ai1_plugin(self, ai1_source_path):
+        """ Restore bằng plugin All-in-One WP Migration (cài WordPress, plugin rồi chạy wp ai1wm restore) """
 
         # Tạo thư mục website
-        os.makedirs(self.website_path, exist_ok=True)
-        print(f"\nThư mục {self.website_path} đã được tạo thành công!")
+        await self._phase("dir_created", self._create_website_dir)
 
         # Tạo database
-        await create_database(self.website_name)
+        await self._phase("db_created", lambda: create_database(self.website_name))
 
-        # Tải / giải nén / copy Wordpress core
-        await self.wp_install.install_wp_core()
+        ai1_path = os.path.join(self.website_path, "wp-content", "ai1wm-backups")
+        file_name = os.path.basename(ai1_source_path)
 
-        # Tạo file wp-config.php
-        await self.wp_install.edit_wp_config()
+        async def copy_files():
+            # Cài đặt Wordpress
+            await self._install_wp_core()
 
-        # Cài đặt website Wordpress
-        await self.wp_install.install_wordpress()
+            # Cài đặt plugin All-in-One WP Migration và Unlimited Extension
+            await self.wp_install.install_plugins(await self.wp_install.choose_install_plugin("2, 3"))
 
-        # Tạo .htaccess
-        await self.wp_install.edit_htaccess()
-        
-        # Cài đặt plugin All-in-One WP Migration và Unlimited Extension
-        await self.wp_install.install_plugins(await self.wp_install.choose_install_plugin("2, 3"))
+            # Copy file backup vào thư mục wp-content/ai1wm-backups
+            print(f"Copy file backup vào thư mục {ai1_path}")
+            await copy_file_folder(ai1_source_path, ai1_path)
+
+        await self._phase("files_copied", copy_files)
 
-        ai1_path = os.path.join(self.website_path, "wp-content", "ai1wm-backups")
-        
-        # Copy file backup vào thư mục wp-content/ai1wm-backups
-        print(f"Copy file backup vào thư mục {ai1_path}")
-        file_name, _ = await copy_file_folder(ai1_source_path, ai1_path)
-        
         # Restore website
-        print(f"Restore website từ file: {file_name}")
-        await run_command(f'{self.wp_cli_cmd} ai1wm restore "{file_name}" --yes')
+        async def restore_backup():
+            print(f"Restore website từ file: {file_name}")
+            await wp_workers.close(self.website_path)
+            await run_command([*self.wp_cli, "ai1wm", "restore", file_name, "--yes"], resource="php")
+
+        await self._phase("db_imported", restore_backup)
 
         # Update table prefix in wp-config.php
-        prefix = await update_table_prefix(self.website_name, self.website_path)
-        await asyncio.gather(
-            self.wp_install.change_admin_info(prefix),
-            save_wp_credentials(self.website_path, self.website_url, self.wp_admin, self.wp_admin_password, self.wp_admin_email)
-        )
+        prefix = await self._phase("prefix_fixed", self._fix_prefix)
+        await self._phase("admin_updated", lambda: self._update_admin(prefix))
+
+    @traced("restore_dup")
+    async def restore_dup(self, dup_source_path):
+        """ Restore website từ gói backup của Duplicator / Duplicator Pro: giải nén tệp archive (.zip / .daf) và import
+        file database trong gói backup, không cần chạy installer.php; dùng installer.php nếu gói backup không đọc được
+        (mã hóa, multisite...) """
+
+        package = None
+        if config.headless_dup:
+            try:
+                package = await asyncio.to_thread(DuplicatorPackage, dup_source_path)
+                reason = package.unsupported_reason()
+            except (DuplicatorError, OSError) as e:
+                reason = str(e)
+            if reason:
+                print(f"Không restore tự động được gói backup Duplicator ({reason}), restore bằng installer.php")
+                package = None
+
+        if package is None:
+            await self._restore_dup_installer(dup_source_path)
+            return
+
+        await self._restore_dup_package(package)
 
         if not self.bulk_restore:
             await print_info(self.website_url, self.wp_admin, self.wp_admin_password, self.wp_admin_email)
             await reload_laragon(self.laragon_path, self.website_url)
 
-    async def restore_dup(self, dup_source_path):
-        """ Restore website bằng plugin Duplicator Pro """
+    async def _restore_dup_package(self, package):
+        """ Restore không qua installer.php: giải nén song song tệp archive vào thư mục website, tạo wp-config.php
+        và .htaccess mới, import file database (đổi url cũ thành url mới), xóa các tệp của installer """
+
+        await self._phase("dir_created", self._create_website_dir)
+        await self._phase("db_created", lambda: create_database(self.website_name))
+
+        async def copy_files():
+            # Gói backup chỉ có database / wp-content: WordPress core từ cache
+            if not package.has_core:
+                await self.wp_install.install_wp_core()
+
+            print(f"Giải nén {os.path.basename(package.archive)} vào {self.website_path}")
+            with span("dup_extract", "disk") as current:
+                try:
+                    stats = await asyncio.to_thread(package.extract, self.website_path)
+                except DuplicatorError as e:
+                    print(f"Lỗi khi giải nén tệp {package.archive}: {e}")
+                    sys.exit(1)
+                current.add_bytes(stats.bytes)
+            print(f"Đã giải nén {stats.files} tệp, {stats.bytes / (1024 * 1024):.1f} MB trong {stats.seconds:.2f}s "
+                  f"({stats.mbps:.1f} MB/s)")
+
+            # wp-config.php của website cũ có thông tin database của server cũ, WP-CLI không ghi đè file đã có
+            unlink_file(os.path.join(self.website_path, "wp-config.php"))
+            await asyncio.gather(
+                self.wp_install.edit_wp_config(),
+                self.wp_install.edit_htaccess(),
+            )
+
+        await self._phase("files_copied", copy_files)
+
+        async def import_database():
+            await self.import_database(package.database_path(self.website_path), old_urls=package.old_urls())
+            await asyncio.to_thread(remove_installer_files, self.website_path)
+
+        await self._phase("db_imported", import_database)
+
+        prefix = await self._phase("prefix_fixed", self._fix_prefix)
+        await self._phase("admin_updated", lambda: self._update_admin(prefix, change_url=True))
+
+    async def _restore_dup_installer(self, dup_source_path):
+        """ Copy gói backup vào thư mục website rồi mở installer.php để cài đặt trên trình duyệt """
 
         # Tạo thư mục website
-        os.makedirs(self.website_path, exist_ok=True)
-        print(f"\nThư mục {self.website_path} đã được tạo thành công!")
+        await self._phase("dir_created", self._create_website_dir)
 
         # Tạo database
-        await create_database(self.website_name)
+        await self._phase("db_created", lambda: create_database(self.website_name))
 
         # Copy file backup vào thư mục website
-        print(f"Copy file backup vào thư mục {self.website_path}")
-        await copy_file_folder(dup_source_path, self.website_path)
-
-        if not self.bulk_restore:
-            # Reload Apache Server
-            await reload_laragon(self.laragon_path, self.website_url, "installer.php")
-
-            # Hỏi lại sau khi cài đặt xong
-            confirm = input("Bạn đã cài đặt xong và muốn thay đổi thông tin admin? (y/n): ").lower().strip()
-            if confirm == "y" or confirm == "yes":
-                prefix = await update_table_prefix(self.website_name, self.website_path)
-                await asyncio.gather(
-                    self.wp_install.change_admin_info(prefix),
-                    save_wp_credentials(self.website_path, self.website_url, self.wp_admin, self.wp_admin_password, self.wp_admin_email)
-                )
+        async def copy_files():
+            print(f"Copy file backup vào thư mục {self.website_path}")
+            await copy_file_folder(dup_source_path, self.website_path)
+
+        await self._phase("files_copied", copy_files)
+
+        if self.bulk_restore:
+            # Không có ai chạy installer.php trong bulk restore: báo lỗi thay vì báo thành công
+            raise DuplicatorError(f"Đã copy gói backup, cần mở {self.website_url}/installer.php để cài đặt thủ công")
+
+        # Reload Apache Server
+        await reload_laragon(self.laragon_path, self.website_url, "installer.php")
+
+        # Hỏi lại sau khi cài đặt xong
+        confirm = input("Bạn đã cài đặt xong và muốn thay đổi thông tin admin? (y/n): ").lower().strip()
+        if confirm == "y" or confirm == "yes":
+            prefix = await update_table_prefix(self.website_name, self.website_path)
+            await asyncio.gather(
+                self.wp_install.change_admin_info(prefix),
+                save_wp_credentials(self.website_path, self.website_url, self.wp_admin, self.wp_admin_password, self.wp_admin_email)
+            )
 
+    @traced("restore_wpcontent")
     async def restore_wpcontent(self, wpcontent_source_path, db_path):
         """ Restore website thủ công """
 
         # Tạo thư mục website
-        os.makedirs(self.website_path, exist_ok=True)
-        print(f"\nThư mục {self.website_path} đã được tạo thành công!")
+        await self._phase("dir_created", self._create_website_dir)
 
-        await create_database(self.website_name)
+        await self._phase("db_created", lambda: create_database(self.website_name))
 
-        await self.wp_install.install_wp_core()
-
-        await self.wp_install.edit_wp_config()
+        wp_content_path = os.path.join(self.website_path, "wp-content")
+        db_copied_path = os.path.join(self.website_path, os.path.basename(db_path))
 
-        await self.wp_install.install_wordpress()
+        async def copy_files():
+            await self._install_wp_core()
 
-        await self.wp_install.edit_htaccess()
+            if os.path.exists(wp_content_path):
+                try:
+                    await asyncio.to_thread(remove_tree, wp_content_path)
 
-        wp_content_path = os.path.join(self.website_path, "wp-content")
-        if os.path.exists(wp_content_path):
-            try:
-                await asyncio.to_thread(shutil.rmtree, wp_content_path)
+                    try:
+                        await run_command(
+                            ["robocopy", wpcontent_source_path, wp_content_path, "/E"],
+                            print_text=f"Copy 'wp-content' vào thư mục {self.website_path}",
+                            resource="disk", capture=False
+                        )
 
-                try:
-                    await run_command(
-                        f'robocopy "{wpcontent_source_path}" "{wp_content_path}" /E',
-                        print_text=f"Copy 'wp-content' vào thư mục {self.website_path}"
-                    )
+                    except Exception as e:
+                        print(f"Lỗi khi copy thư mục: {e}")
+                        sys.exit(1)
 
                 except Exception as e:
-                    print(f"Lỗi khi copy thư mục: {e}")
+                    print(f"Lỗi khi xóa thư mục {wp_content_path}: {e}")
                     sys.exit(1)
 
-            except Exception as e:
-                print(f"Lỗi khi xóa thư mục {wp_content_path}: {e}")
-                sys.exit(1)
+            print(f"Copy database vào thư mục {self.website_path}")
+            await copy_file_folder(db_path, self.website_path)
 
-        print(f"Copy database vào thư mục {self.website_path}")
-        file_name, _ = await copy_file_folder(db_path, self.website_path)
-        db_copied_path = os.path.join(self.website_path, file_name)
+        await self._phase("files_copied", copy_files)
 
-        print(f"Import database: {file_name}")
-        await run_sql_command(f'{self.website_name} < "{db_copied_path}"')
-        
-        prefix = await update_table_prefix(self.website_name, self.website_path)
-        await asyncio.gather(
-            self.wp_install.change_url(prefix),
-            self.wp_install.change_admin_info(prefix),
-            save_wp_credentials(self.website_path, self.website_url, self.wp_admin, self.wp_admin_password, self.wp_admin_email)
-        )
+        await self._phase("db_imported", lambda: self.import_database(db_copied_path))
+
+        prefix = await self._phase("prefix_fixed", self._fix_prefix)
+        await self._phase("admin_updated", lambda: self._update_admin(prefix, change_url=True))
 
         if not self.bulk_restore:
             await print_info(self.website_url, self.wp_admin, self.wp_admin_password, self.wp_admin_email)
 
             await reload_laragon(self.laragon_path, self.website_url)
 
+    @traced("restore_wp")
     async def restore_wp(self, wp_source_path):
         """ Restore website thủ công bằng source code đầy đủ """
 
         # Tạo thư mục website
-        os.makedirs(self.website_path, exist_ok=True)
-        print(f"\nThư mục {self.website_path} đã được tạo thành công!")
+        await self._phase("dir_created", self._create_website_dir)
 
         # Copy source code vào thư mục website
-        try:
-            await run_command(
-                f'robocopy "{wp_source_path}" "{self.website_path}" /E',
-                print_text=f"Copy source code vào thư mục {self.website_path}"
-            )
+        async def copy_files():
+            try:
+                await run_command(
+                    ["robocopy", wp_source_path, self.website_path, "/E"],
+                    print_text=f"Copy source code vào thư mục {self.website_path}",
+                    resource="disk", capture=False
+                )
 
-        except Exception as e:
-            print(f"Lỗi khi copy thư mục: {e}")
-            sys.exit(1)
+            except Exception as e:
+                print(f"Lỗi khi copy thư mục: {e}")
+                sys.exit(1)
 
-        # Tạo database
-        await create_database(self.website_name)
+        await self._phase("files_copied", copy_files)
 
-        # Tạo file wp-config.php
-        await self.wp_install.edit_wp_config()
+        # Tạo database và file wp-config.php
+        async def create_db():
+            await create_database(self.website_name)
+            await self.wp_install.edit_wp_config()
+
+        await self._phase("db_created", create_db)
 
         # Kiểm tra file SQL có tồn tại không:
         sql_file = await find_sql_file(self.website_path)
@@ -196,15 +424,11 @@ class Restore:
             sys.exit(1)
         
         # Import database
-        await run_sql_command(f'{self.website_name} < "{wp_db_path}"', print_text=f"Import database: {sql_file}")
+        await self._phase("db_imported", lambda: self.import_database(wp_db_path))
         
         # Update table prefix in wp-config.php
-        prefix = await update_table_prefix(self.website_name, self.website_path)
-        await asyncio.gather(
-            self.wp_install.change_url(prefix),
-            self.wp_install.change_admin_info(prefix),
-            save_wp_credentials(self.website_path, self.website_url, self.wp_admin, self.wp_admin_password, self.wp_admin_email)
-        )
+        prefix = await self._phase("prefix_fixed", self._fix_prefix)
+        await self._phase("admin_updated", lambda: self._update_admin(prefix, change_url=True))
 
         if not self.bulk_restore:
             await print_info(self.website_url, self.wp_admin, self.wp_admin_password, self.wp_admin_email)
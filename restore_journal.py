@@ -0,0 +1,82 @@
+import os
+import json
+import time
+
+
+# Các bước của một lần restore, theo thứ tự
+PHASES = ["dir_created", "db_created", "files_copied", "db_imported", "prefix_fixed", "admin_updated"]
+
+# Bản ghi đánh dấu website đã restore xong
+COMPLETED = "completed"
+
+
+class RestoreJournal:
+    """ Nhật ký restore theo từng website / từng bước, ghi nối tiếp (JSONL) và fsync sau mỗi dòng để chạy tiếp được khi bị dừng """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.sites = {}
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if resume:
+            self._load()
+        elif os.path.exists(path):
+            # Chạy mới: giữ lại nhật ký cũ để tham khảo
+            os.replace(path, f"{path}.bak")
+
+        self.file = open(path, "a", encoding="utf-8")
+        if self.file.tell() > 0 and not self._ends_with_newline():
+            # Dòng cuối bị ghi dở, xuống dòng để bản ghi mới không dính vào
+            self.file.write("\n")
+
+    def _load(self):
+        """ Đọc nhật ký cũ, bỏ qua dòng cuối bị ghi dở khi chương trình dừng đột ngột """
+
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self.sites.setdefault(record["site"], {})[record["phase"]] = record.get("value")
+
+        if self.sites:
+            completed = sum(1 for phases in self.sites.values() if COMPLETED in phases)
+            print(f"Đọc nhật ký restore: {len(self.sites)} website ({completed} đã xong) từ {self.path}")
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def mark(self, site, phase, value=None):
+        """ Ghi lại bước đã hoàn thành (value: dữ liệu cần dùng lại khi chạy tiếp, ví dụ table prefix) """
+
+        self.sites.setdefault(site, {})[phase] = value
+        record = {"site": site, "phase": phase, "value": value, "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def is_done(self, site, phase):
+        return phase in self.sites.get(site, {})
+
+    def get_value(self, site, phase):
+        return self.sites.get(site, {}).get(phase)
+
+    def is_started(self, site):
+        """ Website đã có trong nhật ký (đã chạy ít nhất một bước) """
+        return bool(self.sites.get(site))
+
+    def is_completed(self, site):
+        return self.is_done(site, COMPLETED)
+
+    def mark_completed(self, site):
+        self.mark(site, COMPLETED)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
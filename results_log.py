@@ -0,0 +1,104 @@
+import os
+import json
+import time
+import config
+from preflight import format_duration
+
+
+class ResultsLog:
+    """ Kết quả bulk restore ghi nối tiếp (JSONL) ngay khi từng website xong, không mất kết quả nếu script bị dừng.
+    fsync theo lô: sau results_fsync_every kết quả hoặc results_fsync_interval giây """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def append(self, result):
+        self.file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self._pending += 1
+        if self._pending >= config.results_fsync_every or time.monotonic() - self._last_sync >= config.results_fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self._pending:
+            os.fsync(self.file.fileno())
+            self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+
+def read_results(path):
+    """ Đọc lần lượt các kết quả trong file JSONL, bỏ qua dòng bị ghi dở """
+
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+class BulkProgress:
+    """ Tiến độ bulk restore: website đã xong, đang chạy, lỗi, tốc độ (website/phút, MB/s) và thời gian còn lại ước tính """
+
+    def __init__(self):
+        self.start_time = time.monotonic()
+        self.queued = 0
+        self.queued_bytes = 0
+        self.running = 0
+        self.done = 0
+        self.failed = 0
+        self.done_bytes = 0
+        self.reading = True
+
+    def add(self, size):
+        """ Website đã đọc từ file danh sách và chờ restore """
+        self.queued += 1
+        self.queued_bytes += size
+
+    def start(self):
+        self.running += 1
+
+    def finish(self, size, ok):
+        self.running -= 1
+        self.done += 1
+        self.done_bytes += size
+        if not ok:
+            self.failed += 1
+
+    def reject(self):
+        """ Dòng bị bỏ qua trước khi chạy (không hợp lệ) """
+        self.failed += 1
+
+    def eta(self):
+        """ Thời gian còn lại (giây) theo tốc độ website và tốc độ dữ liệu đã đạt, lấy giá trị lớn hơn; None nếu chưa đủ dữ liệu """
+
+        elapsed = time.monotonic() - self.start_time
+        if not self.done or elapsed <= 0:
+            return None
+        remaining = (self.queued - self.done) * elapsed / self.done
+        if self.done_bytes:
+            remaining = max(remaining, (self.queued_bytes - self.done_bytes) * elapsed / self.done_bytes)
+        return remaining
+
+    def line(self):
+        elapsed = max(time.monotonic() - self.start_time, 1e-6)
+        total = f"{self.queued}+" if self.reading else f"{self.queued}"
+        eta = self.eta()
+        eta_text = "-" if eta is None else format_duration(eta) + ("+" if self.reading else "")
+        return (f"[{self.done}/{total}] đang chạy {self.running}, lỗi {self.failed} | "
+                f"{self.done * 60 / elapsed:.1f} website/phút, {self.done_bytes / elapsed / (1024 * 1024):.1f} MB/s | "
+                f"còn lại ~{eta_text}")
+
+    def print(self):
+        print(f"Tiến độ: {self.line()}", flush=True)
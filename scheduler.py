@@ -0,0 +1,141 @@
+import os
+import heapq
+import asyncio
+import itertools
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import config
+
+
+class ResourceLimits:
+    """ Giới hạn số tác vụ chạy đồng thời theo loại tài nguyên: disk (copy), sql (import), php (WP-CLI) """
+
+    RESOURCES = ("disk", "sql", "php")
+
+    def __init__(self):
+        self._semaphores = {}
+        self.limits = {}
+
+    def configure(self, **limits):
+        """ Đặt giới hạn, ví dụ configure(disk=2, sql=2, php=4). None hoặc 0 là không giới hạn """
+
+        for resource in self.RESOURCES:
+            limit = limits.get(resource)
+            self.limits[resource] = limit
+            self._semaphores[resource] = asyncio.Semaphore(limit) if limit else None
+
+    def acquire(self, resource):
+        """ Context manager giữ một suất của tài nguyên (không làm gì nếu chưa cấu hình) """
+
+        semaphore = self._semaphores.get(resource) if resource else None
+        return semaphore if semaphore is not None else contextlib.nullcontext()
+
+    def disk(self):
+        return self.acquire("disk")
+
+    def sql(self):
+        return self.acquire("sql")
+
+    def php(self):
+        return self.acquire("php")
+
+
+limits = ResourceLimits()
+
+
+def path_size(path):
+    """ Tổng kích thước (bytes) của file hoặc thư mục """
+
+    if not path or not os.path.exists(path):
+        return 0
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total
+
+
+class RestoreScheduler:
+    """ Chạy các job restore với số worker giới hạn, job có dữ liệu lớn chạy trước """
+
+    def __init__(self, workers=None, disk_jobs=None, sql_jobs=None, php_jobs=None):
+        self.workers = workers or config.bulk_workers
+        limits.configure(
+            disk=disk_jobs or config.bulk_disk_jobs,
+            sql=sql_jobs or config.bulk_sql_jobs,
+            php=php_jobs or config.bulk_php_jobs,
+        )
+
+        # asyncio.to_thread dùng thread pool mặc định, cần đủ thread cho các worker
+        thread_count = max(config.bulk_thread_pool_size, self.workers * 4)
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=thread_count))
+
+    async def run(self, jobs, handler, window=None):
+        """ jobs: danh sách hoặc async iterator các (kích thước, job); handler(job) là coroutine xử lý một job.
+        Job được lấy dần vào một cửa sổ tối đa window job (config.bulk_schedule_window), job lớn nhất trong cửa sổ chạy trước;
+        danh sách được sắp xếp toàn bộ """
+
+        if isinstance(jobs, list):
+            window = max(len(jobs), 1)
+            jobs = _iterate(jobs)
+        window = window or config.bulk_schedule_window
+
+        heap = []
+        order = itertools.count()
+        finished = False
+        changed = asyncio.Condition()
+
+        print(f"Chạy website với {self.workers} worker "
+              f"(disk: {limits.limits['disk']}, sql: {limits.limits['sql']}, php: {limits.limits['php']})")
+
+        async def feed():
+            nonlocal finished
+            try:
+                async for size, job in jobs:
+                    async with changed:
+                        await changed.wait_for(lambda: len(heap) < window)
+                        heapq.heappush(heap, (-size, next(order), job))
+                        changed.notify_all()
+            finally:
+                async with changed:
+                    finished = True
+                    changed.notify_all()
+
+        async def worker():
+            while True:
+                async with changed:
+                    await changed.wait_for(lambda: heap or finished)
+                    if not heap:
+                        return
+                    _, _, job = heapq.heappop(heap)
+                    changed.notify_all()
+                await handler(job)
+
+        tasks = [asyncio.ensure_future(feed()), *(asyncio.ensure_future(worker()) for _ in range(self.workers))]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Một worker lỗi hoặc bị hủy: dừng các worker còn lại trước khi trả về
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+
+async def _iterate(items):
+    for item in items:
+        yield item
@@ -0,0 +1,112 @@
+import os
+import asyncio
+import hashlib
+
+
+LOCKS_DIR = "locks"
+
+# Thời gian chờ giữa các lần thử lấy khóa file (giây)
+LOCK_POLL_INTERVAL = 0.1
+
+
+def _try_lock(fd):
+    """ Thử khóa file (không chờ), trả về False nếu tiến trình khác đang giữ khóa """
+
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd):
+    if os.name == "nt":
+        import msvcrt
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class FileLock:
+    """ Khóa file dùng giữa các tiến trình của script (msvcrt trên Windows, fcntl trên Linux/macOS) """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    async def __aenter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        waited = False
+        while not _try_lock(self.fd):
+            if not waited:
+                print(f"Đang chờ tiến trình khác xử lý xong ({os.path.basename(self.path)})...")
+                waited = True
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+        return self
+
+    async def __aexit__(self, *exc):
+        try:
+            _unlock(self.fd)
+        finally:
+            os.close(self.fd)
+            self.fd = None
+
+
+class SingleFlight:
+    """ Gộp các tác vụ giống nhau: tác vụ đầu tiên chạy, các tác vụ cùng key chờ và dùng chung kết quả """
+
+    def __init__(self, cached_path):
+        self.locks_path = os.path.join(cached_path, LOCKS_DIR)
+        self._flights = {}
+        self.stats = {"runs": 0, "shared": 0}
+
+    def lock_path(self, key):
+        return os.path.join(self.locks_path, f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.lock")
+
+    async def run(self, key, func):
+        """ Chạy func() (coroutine) một lần cho mỗi key, giữ khóa file trong lúc chạy để tiến trình khác cũng phải chờ """
+
+        future = self._flights.get(key)
+        if future is not None:
+            self.stats["shared"] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._flights[key] = future
+        self.stats["runs"] += 1
+        try:
+            async with FileLock(self.lock_path(key)):
+                result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Tránh cảnh báo "exception was never retrieved" khi không có tác vụ nào chờ
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
+
+
+_flights = {}
+
+
+def get_single_flight(cached_path):
+    """ Bộ gộp tác vụ dùng chung cho thư mục cached """
+
+    cached_path = os.path.abspath(cached_path)
+    if cached_path not in _flights:
+        _flights[cached_path] = SingleFlight(cached_path)
+    return _flights[cached_path]
@@ -0,0 +1,239 @@
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+
+
+INVENTORY_FILE = "inventory.json"
+
+TABLE_PREFIX_RE = re.compile(r"""\$table_prefix\s*=\s*['"]([^'"]*)['"]""")
+
+# Database hệ thống của MySQL / MariaDB, không phải database của website
+SYSTEM_DATABASES = {"information_schema", "mysql", "performance_schema", "sys", "phpmyadmin"}
+
+
+def _read_site_files(website_path):
+    """ Metadata đọc từ file của website: prefix (wp-config.php), SSL (.htaccess chuyển hướng HTTPS) """
+
+    info = {"prefix": None, "ssl": False, "wordpress": False}
+    try:
+        with open(os.path.join(website_path, "wp-config.php"), "r", encoding="utf-8", errors="replace") as f:
+            match = TABLE_PREFIX_RE.search(f.read())
+        info["wordpress"] = True
+        info["prefix"] = match.group(1) if match else None
+    except OSError:
+        pass
+    try:
+        with open(os.path.join(website_path, ".htaccess"), "r", encoding="utf-8", errors="replace") as f:
+            info["ssl"] = "%{HTTPS} off" in f.read()
+    except OSError:
+        pass
+    return info
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class SiteInventory:
+    """ Danh sách website (thư mục trong www) và database của Laragon, kèm metadata từng website.
+    Lưu trong tmp/cached/inventory.json, chỉ đọc lại website có thư mục / wp-config.php / .htaccess thay đổi """
+
+    def __init__(self, laragon_path):
+        self.laragon_sites_path = os.path.join(laragon_path, "www")
+        self.index_path = os.path.join(laragon_path, "tmp", "cached", INVENTORY_FILE)
+        self.sites = {}
+        self.databases = {}
+        # True khi lần quét gần nhất không truy vấn được MySQL, self.databases là danh sách đã lưu lần trước
+        self.databases_stale = False
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.sites = data.get("sites", {})
+            self.databases = data.get("databases", {})
+        except (OSError, ValueError):
+            self.sites, self.databases = {}, {}
+
+    def save(self):
+        """ Ghi index (ghi file tạm rồi đổi tên) """
+
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = f"{self.index_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"sites": self.sites, "databases": self.databases}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def _scan_sites(self, with_sizes=False):
+        """ Quét www một lần bằng scandir, chỉ đọc lại metadata của website đã thay đổi """
+
+        from scheduler import path_size
+
+        sites = {}
+        try:
+            entries = list(os.scandir(self.laragon_sites_path))
+        except FileNotFoundError:
+            entries = []
+
+        for entry in entries:
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            website_path = entry.path
+            # Dấu thời gian thay đổi: thư mục website, wp-config.php, .htaccess, wp-content
+            stamp = [_mtime(website_path), _mtime(os.path.join(website_path, "wp-config.php")),
+                     _mtime(os.path.join(website_path, ".htaccess")), _mtime(os.path.join(website_path, "wp-content"))]
+
+            site = self.sites.get(entry.name)
+            if site is None or site.get("stamp") != stamp:
+                site = dict(_read_site_files(website_path), stamp=stamp, files_size=None)
+            # Dung lượng file được tính lại mỗi lần như dung lượng database: thay đổi trong uploads/, plugins/...
+            # không làm đổi dấu thời gian ở trên
+            if with_sizes:
+                site["files_size"] = path_size(website_path)
+            site["modified"] = max(value for value in stamp if value is not None)
+            sites[entry.name] = site
+
+        return sites
+
+    async def _query_databases(self, with_sizes=False):
+        """ Tên tất cả database trong một truy vấn (và dung lượng, số bảng nếu with_sizes) """
+
+        from database_pool import db_pool
+
+        rows = await db_pool.fetch_all("SELECT SCHEMA_NAME FROM information_schema.SCHEMATA")
+        databases = {row[0]: {"size": None, "tables": None} for row in rows if row[0] not in SYSTEM_DATABASES}
+
+        if with_sizes:
+            rows = await db_pool.fetch_all(
+                "SELECT table_schema, COUNT(*), COALESCE(SUM(data_length + index_length), 0) FROM information_schema.TABLES GROUP BY table_schema"
+            )
+            for name, tables, size in rows:
+                if name in databases:
+                    databases[name] = {"size": int(size), "tables": int(tables)}
+        return databases
+
+    async def _try_query_databases(self, with_sizes=False):
+        """ Như _query_databases nhưng trả về None (kèm cảnh báo) khi không truy vấn được MySQL """
+
+        try:
+            return await self._query_databases(with_sizes)
+        except Exception as e:
+            # DatabaseError, lỗi kết nối của aiomysql, không chạy được mysql CLI...
+            print(f"Không lấy được danh sách database ({e}), dùng danh sách đã lưu lần trước.")
+            return None
+
+    async def refresh(self, with_sizes=False):
+        """ Cập nhật danh sách website và database. with_sizes: tính cả dung lượng file / database (chậm hơn).
+        MySQL không chạy được thì giữ danh sách database đã lưu và đặt databases_stale """
+
+        async with self._lock:
+            sites, databases = await asyncio.gather(
+                asyncio.to_thread(self._scan_sites, with_sizes),
+                self._try_query_databases(with_sizes),
+            )
+            self.sites = sites
+            self.databases_stale = databases is None
+            if databases is not None:
+                self.databases = databases
+            self._loaded = True
+            try:
+                await asyncio.to_thread(self.save)
+            except OSError as e:
+                print(f"Không thể lưu danh sách website: {e}")
+        return self
+
+    async def ensure_loaded(self):
+        """ Quét một lần cho mỗi lần chạy script, các lần kiểm tra sau dùng lại kết quả """
+        if not self._loaded:
+            await self.refresh()
+        return self
+
+    def site_names(self):
+        return sorted(self.sites)
+
+    def site_exists(self, website_name):
+        return website_name in self.sites
+
+    def database_exists(self, db_name):
+        return db_name in self.databases
+
+    def check_available(self, website_name):
+        """ Trả về thông báo lỗi nếu thư mục hoặc database đã tồn tại, None nếu tên còn trống """
+
+        if self.site_exists(website_name):
+            return "Thư mục website đã tồn tại"
+        if self.database_exists(website_name):
+            return "Database đã tồn tại"
+        return None
+
+    def add(self, website_name, database=True):
+        """ Ghi nhận website mới (hoặc đang được tạo) để các lần kiểm tra sau trong cùng lần chạy thấy được """
+
+        self.sites.setdefault(website_name, {"prefix": None, "ssl": False, "wordpress": False, "stamp": None, "files_size": None, "modified": time.time()})
+        if database:
+            self.databases.setdefault(website_name, {"size": None, "tables": None})
+
+    def remove(self, website_names):
+        """ Bỏ website đã xóa khỏi index """
+
+        for website_name in website_names:
+            self.sites.pop(website_name, None)
+            self.databases.pop(website_name, None)
+        try:
+            self.save()
+        except OSError:
+            pass
+
+
+_inventories = {}
+
+
+def get_site_inventory(laragon_path):
+    """ Index website dùng chung cho thư mục Laragon """
+
+    laragon_path = os.path.abspath(laragon_path)
+    if laragon_path not in _inventories:
+        _inventories[laragon_path] = SiteInventory(laragon_path)
+    return _inventories[laragon_path]
+
+
+def format_size(size):
+    if size is None:
+        return "-"
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+async def print_inventory(laragon_path):
+    """ In danh sách website: prefix, dung lượng database / file, SSL, thời gian sửa đổi """
+
+    inventory = await get_site_inventory(laragon_path).refresh(with_sizes=True)
+    names = sorted(set(inventory.sites) | set(inventory.databases))
+    if not names:
+        print("Không có website nào!")
+        return
+
+    print(f"\n{'Website':<30} {'Prefix':<10} {'Database':>12} {'Bảng':>6} {'File':>12} {'SSL':>4}  Sửa đổi")
+    for name in names:
+        site = inventory.sites.get(name)
+        database = inventory.databases.get(name)
+        modified = time.strftime("%Y-%m-%d %H:%M", time.localtime(site["modified"])) if site and site.get("modified") else "-"
+        print(
+            f"{name:<30} {(site or {}).get('prefix') or '-':<10} "
+            f"{format_size(database['size']) if database else 'không có':>12} {database['tables'] if database and database['tables'] is not None else '-':>6} "
+            f"{format_size(site['files_size']) if site else 'không có':>12} {'có' if site and site.get('ssl') else '':>4}  {modified}"
+        )
+    print(f"\n{len(inventory.sites)} website, {len(inventory.databases)} database")
+    if inventory.databases_stale:
+        print("Không kết nối được MySQL: danh sách / dung lượng database là dữ liệu đã lưu lần trước.")
@@ -0,0 +1,200 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import asyncio
+import uuid
+from datetime import datetime
+import aiofiles
+from commands import run_command, mysql_args
+from file_deploy import detach_file, remove_tree, seal_cache_tree
+from tracing import traced
+import config
+
+
+TEMPLATE_INFO_FILE = "template.json"
+TEMPLATE_DB_FILE = "database.sql"
+TEMPLATE_FILES_DIR = "files"
+
+# Các file riêng của từng website, không đưa vào template
+TEMPLATE_IGNORE_FILES = ["wp_credentials.txt"]
+
+
+def get_templates_path(cached_path):
+    """ Thư mục chứa các template website """
+    return os.path.join(cached_path, "templates")
+
+
+def read_wp_version(wp_core_dir):
+    """ Đọc phiên bản WordPress từ wp-includes/version.php """
+
+    version_file = os.path.join(wp_core_dir, "wp-includes", "version.php")
+    try:
+        with open(version_file, "r", encoding="utf-8") as f:
+            match = re.search(r"\$wp_version\s*=\s*'([^']+)'", f.read())
+            return match.group(1) if match else None
+    except OSError:
+        return None
+
+
+def template_key(fields):
+    """ Tạo key cho template từ (phiên bản WP, ngôn ngữ, options, plugins, theme) """
+    data = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+
+
+def find_template(cached_path, key):
+    """ Tìm template theo key, trả về None nếu chưa có hoặc không đầy đủ """
+
+    template_path = os.path.join(get_templates_path(cached_path), key)
+    info_file = os.path.join(template_path, TEMPLATE_INFO_FILE)
+    if not (os.path.isfile(info_file)
+            and os.path.isfile(os.path.join(template_path, TEMPLATE_DB_FILE))
+            and os.path.isdir(os.path.join(template_path, TEMPLATE_FILES_DIR))):
+        return None
+
+    try:
+        with open(info_file, "r", encoding="utf-8") as f:
+            template = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    template["path"] = template_path
+    return template
+
+
+def list_templates(cached_path):
+    """ Danh sách các template đã lưu """
+
+    templates_path = get_templates_path(cached_path)
+    if not os.path.isdir(templates_path):
+        return []
+
+    templates = []
+    for entry in os.scandir(templates_path):
+        if entry.is_dir() and ".tmp-" not in entry.name:
+            template = find_template(cached_path, entry.name)
+            if template:
+                templates.append(template)
+    return sorted(templates, key=lambda t: t.get("created", ""))
+
+
+def clear_templates(cached_path, key=None):
+    """ Xóa template theo key (hoặc tất cả nếu không có key), trả về số template đã xóa """
+
+    templates_path = get_templates_path(cached_path)
+    if not os.path.isdir(templates_path):
+        return 0
+
+    count = 0
+    for entry in os.scandir(templates_path):
+        if entry.is_dir() and (key is None or entry.name == key or entry.name.startswith(f"{key}.tmp-")):
+            remove_tree(entry.path)
+            count += 1
+    return count
+
+
+@traced("template_snapshot")
+async def snapshot_site(cached_path, key, fields, website_name, website_path, website_url):
+    """ Lưu website đã cấu hình xong thành template (cây thư mục + file SQL) """
+
+    templates_path = get_templates_path(cached_path)
+    os.makedirs(templates_path, exist_ok=True)
+    final_path = os.path.join(templates_path, key)
+    tmp_path = os.path.join(templates_path, f"{key}.tmp-{uuid.uuid4().hex[:8]}")
+
+    print(f"Lưu website {website_name} thành template {key}...")
+    try:
+        await asyncio.to_thread(
+            shutil.copytree, website_path, os.path.join(tmp_path, TEMPLATE_FILES_DIR), copy_function=shutil.copyfile,
+            ignore=lambda folder, names: [n for n in names if folder == website_path and n in TEMPLATE_IGNORE_FILES]
+        )
+
+        db_file = os.path.join(tmp_path, TEMPLATE_DB_FILE)
+        result = await run_command(mysql_args(website_name, "--single-transaction", "--skip-comments", f"--result-file={db_file}", program="mysqldump"))
+        if not result.ok or not os.path.exists(db_file):
+            raise RuntimeError("Không thể xuất database")
+
+        info = {
+            "key": key,
+            "fields": fields,
+            "website_name": website_name,
+            "website_url": website_url,
+            "created": datetime.now().isoformat(timespec="seconds"),
+        }
+        async with aiofiles.open(os.path.join(tmp_path, TEMPLATE_INFO_FILE), "w", encoding="utf-8") as f:
+            await f.write(json.dumps(info, indent=4, ensure_ascii=False))
+
+        if config.deploy_mode == "link":
+            await asyncio.to_thread(seal_cache_tree, os.path.join(tmp_path, TEMPLATE_FILES_DIR))
+
+        if os.path.exists(final_path):
+            await asyncio.to_thread(remove_tree, final_path)
+        os.rename(tmp_path, final_path)
+        print(f"Đã lưu template: {key}\n")
+        return True
+
+    except Exception as e:
+        print(f"Lỗi khi lưu template {key}: {e}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        return False
+
+
+async def update_wp_config_db_name(website_path, db_name):
+    """ Đổi DB_NAME trong wp-config.php của website được clone """
+
+    wp_config_path = os.path.join(website_path, "wp-config.php")
+    detach_file(wp_config_path)
+    async with aiofiles.open(wp_config_path, "r", encoding="utf-8") as f:
+        content = await f.read()
+
+    content = re.sub(
+        r"define\(\s*['\"]DB_NAME['\"]\s*,\s*['\"][^'\"]*['\"]\s*\)",
+        f"define( 'DB_NAME', '{db_name}' )",
+        content
+    )
+
+    async with aiofiles.open(wp_config_path, "w", encoding="utf-8") as f:
+        await f.write(content)
+
+
+async def build_template(inputs, selected_plugins=None):
+    """ Dựng template bằng một website tạm, lưu lại rồi xóa website tạm """
+
+    from wp_installer import WPInstaller
+    from delete_website import delete_website
+    from wp_worker import wp_workers
+
+    probe = WPInstaller(inputs)
+    fields = await probe.template_fields(selected_plugins)
+    key = template_key(fields)
+
+    inputs.website_name = f"tpl-{key}"
+    installer = WPInstaller(inputs)
+
+    print(f"Dựng template {key}: {fields}")
+    try:
+        await installer.build_website(selected_plugins)
+        # WP worker của website tạm không được giữ thư mục / database trong lúc lưu template và xóa website
+        await wp_workers.close(installer.website_path)
+        return await snapshot_site(installer.cached_path, key, fields, installer.website_name, installer.website_path, installer.website_url)
+    finally:
+        await wp_workers.close(installer.website_path)
+        await delete_website(installer.website_name, installer.laragon_sites_path)
+
+
+async def print_templates(cached_path):
+    """ In danh sách template """
+
+    templates = list_templates(cached_path)
+    if not templates:
+        print("Chưa có template nào!")
+        return
+
+    print("\nDanh sách template:")
+    for template in templates:
+        fields = template["fields"]
+        plugins = ", ".join(fields.get("plugins") or []) or "-"
+        print(f"- {template['key']}: WordPress {fields.get('wp_version')}, ngôn ngữ: {fields.get('language')}, "
+              f"options: {fields.get('options')}, plugins: {plugins}, theme: {fields.get('theme')} (tạo lúc {template['created']})")
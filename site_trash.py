@@ -0,0 +1,166 @@
+""" Thùng rác cho website đã xóa: đổi tên thư mục vào tmp/trash (tức thì), xóa thật trong một tiến trình chạy nền.
+
+Mục không xóa được (file đang bị khóa...) được để lại trong trash và chỉ được thử lại ở lần xóa website sau
+(khi start_purge chạy lại), không có lịch dọn định kỳ.
+
+Chạy trực tiếp để dọn thùng rác:
+    python site_trash.py <đường dẫn thư mục trash>
+"""
+
+import os
+import sys
+import time
+import uuid
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Hậu tố của mục đang được một tiến trình dọn (tránh hai tiến trình cùng xóa một thư mục)
+PURGING_SUFFIX = ".purging"
+
+
+def get_trash_path(laragon_sites_path):
+    """ Thư mục trash nằm cùng ổ đĩa với www (<laragon>/tmp/trash) để đổi tên không phải copy dữ liệu """
+    return os.path.join(os.path.dirname(os.path.abspath(laragon_sites_path)), "tmp", "trash")
+
+
+def move_to_trash(path, trash_path):
+    """ Đổi tên thư mục vào trash, trả về đường dẫn mới. Raise OSError nếu không đổi tên được
+    (khác ổ đĩa, file đang bị khóa...) """
+
+    os.makedirs(trash_path, exist_ok=True)
+    target = os.path.join(trash_path, f"{os.path.basename(path)}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}")
+    os.rename(path, target)
+    return target
+
+
+def start_purge(trash_path):
+    """ Chạy tiến trình nền (tách khỏi script, độ ưu tiên thấp) để xóa các mục trong trash """
+
+    kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL, "close_fds": True}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.BELOW_NORMAL_PRIORITY_CLASS
+    else:
+        kwargs["start_new_session"] = True
+
+    try:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), trash_path], **kwargs)
+        return True
+    except OSError as e:
+        print(f"Không chạy được tiến trình dọn thùng rác ({e}), các thư mục sẽ được xóa ở lần xóa sau")
+        return False
+
+
+def _pid_alive(pid):
+    """ Tiến trình pid còn chạy không (không chắc chắn thì coi như còn chạy) """
+
+    if pid == os.getpid():
+        return True
+    if os.name != "nt":
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            # PermissionError: tiến trình của user khác
+            return True
+        return True
+
+    import ctypes
+    from ctypes import wintypes
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    STILL_ACTIVE = 259
+    ERROR_INVALID_PARAMETER = 87
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+    kernel32.GetExitCodeProcess.argtypes = [wintypes.HANDLE, ctypes.POINTER(wintypes.DWORD)]
+    kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        return ctypes.get_last_error() != ERROR_INVALID_PARAMETER
+    try:
+        code = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+            return True
+        return code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _claim(trash_path, name):
+    """ Đánh dấu mục đang được tiến trình này xóa bằng cách đổi tên, trả về None nếu tiến trình khác đã nhận """
+
+    if name.endswith(PURGING_SUFFIX):
+        # Mục đã có tiến trình nhận: chỉ lấy lại khi tiến trình đó (pid trong tên) đã dừng giữa chừng
+        name_base, _, pid = name[:-len(PURGING_SUFFIX)].rpartition(".")
+        if not pid.isdigit() or _pid_alive(int(pid)):
+            return None
+    else:
+        name_base = name
+    claimed = os.path.join(trash_path, f"{name_base}.{os.getpid()}{PURGING_SUFFIX}")
+    try:
+        os.rename(os.path.join(trash_path, name), claimed)
+        return claimed
+    except OSError:
+        return None
+
+
+def _remove(path):
+    """ Xóa file hoặc thư mục, trả về lỗi (nếu có) thay vì raise """
+
+    from file_deploy import remove_tree
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            remove_tree(path)
+        else:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        return e
+    return None
+
+
+def _remove_entry(executor, path):
+    """ Xóa một mục trong trash: các thư mục con được xóa song song (tối đa số thread của executor) """
+
+    try:
+        children = [os.path.join(path, name) for name in os.listdir(path)] if os.path.isdir(path) else []
+    except OSError:
+        children = []
+    errors = [error for error in executor.map(_remove, children) if error]
+    return errors[0] if errors else _remove(path)
+
+
+def purge(trash_path, workers=None):
+    """ Xóa toàn bộ mục trong trash (lặp lại đến khi trống vì có thể có mục mới được chuyển vào) """
+
+    import config
+
+    failed = set()
+    with ThreadPoolExecutor(max_workers=workers or config.trash_purge_workers) as executor:
+        while True:
+            try:
+                names = [name for name in os.listdir(trash_path) if name not in failed]
+            except FileNotFoundError:
+                return
+            claimed = [path for path in (_claim(trash_path, name) for name in names) if path]
+            if not claimed:
+                return
+            for path in claimed:
+                if _remove_entry(executor, path) is not None:
+                    # Không xóa được (file đang bị khóa...), để lại cho lần xóa website sau
+                    failed.add(os.path.basename(path))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    if os.name != "nt":
+        os.nice(10)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    purge(sys.argv[1])
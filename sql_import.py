@@ -0,0 +1,257 @@
+import os
+import re
+import time
+import asyncio
+import config
+from scheduler import limits
+from commands import mysql_args, spawn
+from tracing import span
+
+
+class SqlImportError(Exception):
+    """Lỗi khi import database"""
+
+
+# Các dòng bắt đầu một phần dữ liệu của bảng
+TABLE_LINE_RE = re.compile(
+    rb"^(?:DROP TABLE IF EXISTS|DROP TABLE|CREATE TABLE IF NOT EXISTS|CREATE TABLE|INSERT INTO|INSERT IGNORE INTO|REPLACE INTO"
+    rb"|LOCK TABLES|ALTER TABLE|/\*!40000 ALTER TABLE|-- Table structure for table|-- Dumping data for table"
+    rb"|-- Indexes for table|-- AUTO_INCREMENT for table|-- Constraints for table)\s+`?([^`\s(;]+)`?"
+)
+
+# Các dòng bắt đầu view, trigger, procedure... cần chạy sau khi đã có đủ các bảng
+POST_LINE_RE = re.compile(
+    rb"^(?:DELIMITER|CREATE (?:ALGORITHM|DEFINER|VIEW|TRIGGER|PROCEDURE|FUNCTION|EVENT)|/\*!50001|/\*!50003|/\*!50106"
+    rb"|-- Temporary (?:table|view) structure|-- Final view structure|-- Dumping (?:routines|events)|-- Triggers)"
+)
+
+POST_SEGMENT = "__post__"
+
+# Thiết lập session khi import: tắt kiểm tra khóa duy nhất / khóa ngoại và autocommit, commit một lần ở cuối
+SESSION_START = b"SET autocommit=0;\nSET unique_checks=0;\nSET foreign_key_checks=0;\n"
+SESSION_END = b"\nCOMMIT;\nSET unique_checks=1;\nSET foreign_key_checks=1;\n"
+
+READ_BATCH_SIZE = 4 * 1024 * 1024
+
+
+def scan_dump(path, line_hook=None):
+    """ Đọc file SQL một lần, chia theo bảng (chỉ ghi vị trí, không giữ dữ liệu).
+    Trả về (phần đầu file, {bảng: [(vị trí bắt đầu, vị trí kết thúc), ...]}) """
+
+    segments = {}
+    current = None
+    start = 0
+    preamble_end = None
+    offset = 0
+
+    with open(path, "rb", buffering=1024 * 1024) as f:
+        for line in f:
+            if line_hook:
+                line_hook(line)
+
+            table = None
+            if POST_LINE_RE.match(line):
+                table = POST_SEGMENT
+            else:
+                match = TABLE_LINE_RE.match(line)
+                if match:
+                    table = match.group(1).decode("utf-8", "replace")
+
+            if table and table != current:
+                if current is None:
+                    preamble_end = offset
+                else:
+                    segments.setdefault(current, []).append((start, offset))
+                current = table
+                start = offset
+
+            offset += len(line)
+
+    if current is None:
+        return offset, {}
+
+    segments.setdefault(current, []).append((start, offset))
+    return preamble_end, segments
+
+
+def _read_preamble(path, length):
+    with open(path, "rb") as f:
+        return f.read(length)
+
+
+def _count_rows(line):
+    """ Ước tính số dòng dữ liệu trong một dòng INSERT """
+    if line.startswith((b"INSERT", b"REPLACE")):
+        return line.count(b"),(") + 1 if line.rstrip().endswith(b");") else 0
+    if line.startswith(b"("):
+        return 1
+    return 0
+
+
+class _RangeReader:
+    """ Đọc các đoạn (start, end) của file theo từng khối dòng, áp dụng transform cho từng dòng """
+
+    def __init__(self, path, ranges, transform=None):
+        self.file = open(path, "rb", buffering=1024 * 1024)
+        self.ranges = list(ranges)
+        self.transform = transform
+        self.remaining = 0
+        self.rows = 0
+
+    def read_batch(self):
+        """ Trả về khối dữ liệu tiếp theo, b"" khi hết """
+
+        chunks = []
+        size = 0
+        while size < READ_BATCH_SIZE:
+            if self.remaining <= 0:
+                if not self.ranges:
+                    break
+                start, end = self.ranges.pop(0)
+                self.file.seek(start)
+                self.remaining = end - start
+                continue
+
+            line = self.file.readline(self.remaining)
+            if not line:
+                self.remaining = 0
+                continue
+            self.remaining -= len(line)
+
+            self.rows += _count_rows(line)
+            if self.transform:
+                line = self.transform(line)
+            chunks.append(line)
+            size += len(line)
+
+        return b"".join(chunks)
+
+    def close(self):
+        self.file.close()
+
+
+async def _import_ranges(db_name, path, table, ranges, preamble, transform=None):
+    """ Import các đoạn dữ liệu của một bảng qua một kết nối mysql riêng """
+
+    with span("import_table", "subprocess", table=table) as current:
+        stats = await _import_table(db_name, path, table, ranges, preamble, transform)
+        current.add_bytes(stats["bytes"])
+        current.set(rows=stats["rows"])
+        return stats
+
+
+async def _import_table(db_name, path, table, ranges, preamble, transform=None):
+    start_time = time.perf_counter()
+    reader = _RangeReader(path, ranges, transform)
+    mysql = mysql_args(db_name, '--default-character-set=utf8mb4', '--max-allowed-packet=1G')
+
+    sent = 0
+    async with spawn(mysql, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.DEVNULL) as process:
+        stderr_task = asyncio.create_task(process.stderr.read())
+        try:
+            process.stdin.write(SESSION_START + preamble)
+            while True:
+                data = await asyncio.to_thread(reader.read_batch)
+                if not data:
+                    break
+                sent += len(data)
+                process.stdin.write(data)
+                await process.stdin.drain()
+            process.stdin.write(SESSION_END)
+            await process.stdin.drain()
+            process.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            reader.close()
+
+        try:
+            returncode = await asyncio.wait_for(process.wait(), config.command_timeout)
+        except asyncio.TimeoutError:
+            stderr_task.cancel()
+            raise SqlImportError(f"Import bảng {table} chạy quá {config.command_timeout} giây, đã dừng")
+        stderr = (await stderr_task).decode("utf-8", "replace").strip()
+
+    if returncode != 0:
+        raise SqlImportError(f"Lỗi khi import bảng {table}: {stderr}")
+
+    elapsed = max(time.perf_counter() - start_time, 1e-6)
+    return {
+        "table": table,
+        "bytes": sent,
+        "rows": reader.rows,
+        "seconds": elapsed,
+        "bytes_per_second": sent / elapsed,
+        "rows_per_second": reader.rows / elapsed,
+    }
+
+
+def _print_table_stats(stats):
+    table = "(view, trigger...)" if stats["table"] == POST_SEGMENT else stats["table"]
+    print(f"  - {table}: {stats['bytes'] / 1024 / 1024:.1f} MB, ~{stats['rows']} dòng trong {stats['seconds']:.1f}s "
+          f"({stats['bytes_per_second'] / 1024 / 1024:.1f} MB/s, {stats['rows_per_second']:.0f} dòng/s)")
+
+
+async def import_sql_file(db_name, path, transform=None, line_hook=None, workers=None):
+    """ Import file SQL: chia theo bảng và import song song qua nhiều kết nối, trả về thống kê từng bảng """
+
+    workers = workers or config.sql_import_workers
+    file_size = os.path.getsize(path)
+    start_time = time.perf_counter()
+
+    print(f"Import database: {os.path.basename(path)} ({file_size / 1024 / 1024:.1f} MB)")
+    async with limits.sql():
+        return await _import_sql_file(db_name, path, transform, line_hook, workers, file_size, start_time)
+
+
+async def _import_sql_file(db_name, path, transform, line_hook, workers, file_size, start_time):
+    """ Phần import chính, chạy khi đã giữ một suất import SQL của scheduler.
+
+    File được đọc hai lần: lần đầu (scan_dump) chỉ tìm vị trí từng bảng và url cũ (line_hook), lần sau mỗi bảng đọc
+    đoạn của mình và gửi vào mysql. Không gộp thành một lần đọc được vì url cũ nằm trong bảng options, đứng sau các
+    bảng comments / links cũng cần đổi url, và kích thước từng bảng cần có trước để chạy bảng lớn trước; lần đọc thứ
+    hai thường lấy từ page cache của hệ điều hành """
+
+    preamble_end, segments = await asyncio.to_thread(scan_dump, path, line_hook)
+    preamble = await asyncio.to_thread(_read_preamble, path, preamble_end) if segments else b""
+
+    if not segments:
+        jobs = [("(toàn bộ)", [(0, file_size)])]
+    elif file_size < config.sql_import_parallel_min_size:
+        # File nhỏ: import tuần tự qua một kết nối
+        jobs = [("(toàn bộ)", [(preamble_end, file_size)])]
+    else:
+        # Bảng lớn chạy trước để rút ngắn tổng thời gian
+        jobs = sorted(
+            ((table, ranges) for table, ranges in segments.items() if table != POST_SEGMENT),
+            key=lambda job: sum(end - start for start, end in job[1]),
+            reverse=True
+        )
+
+    semaphore = asyncio.Semaphore(workers)
+
+    async def run_job(table, ranges):
+        async with semaphore:
+            stats = await _import_ranges(db_name, path, table, ranges, preamble, transform)
+            _print_table_stats(stats)
+            return stats
+
+    # Một bảng lỗi: dừng các bảng còn lại (dừng cả tiến trình mysql) thay vì tiếp tục ghi vào database sẽ bị báo lỗi
+    tasks = [asyncio.create_task(run_job(table, ranges)) for table, ranges in jobs]
+    try:
+        results = list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    # View, trigger, procedure chạy sau cùng khi đã có đủ các bảng
+    if len(jobs) > 1 and POST_SEGMENT in segments:
+        results.append(await run_job(POST_SEGMENT, segments[POST_SEGMENT]))
+
+    elapsed = max(time.perf_counter() - start_time, 1e-6)
+    total_rows = sum(stats["rows"] for stats in results)
+    print(f"Đã import {len(results)} phần ({file_size / 1024 / 1024:.1f} MB, ~{total_rows} dòng) trong {elapsed:.1f}s "
+          f"({file_size / 1024 / 1024 / elapsed:.1f} MB/s)\n")
+    return results
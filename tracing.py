@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import functools
+import contextvars
+
+
+# Website đang được xử lý trong task hiện tại (mỗi website là một dòng trên timeline)
+_current_site = contextvars.ContextVar("trace_site", default="main")
+_current_span = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    """ Một khoảng thời gian được đo: wall time, CPU của tiến trình con và số bytes đã xử lý.
+    CPU được đo riêng cho từng tiến trình con khi kết thúc (commands.spawn) và cộng dồn lên span cha """
+
+    def __init__(self, tracer, name, category, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.bytes = 0
+        self.cpu = 0.0
+        self._token = None
+
+    def add_bytes(self, count):
+        self.bytes += count
+
+    def add_cpu(self, seconds):
+        self.cpu += seconds
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        if not self.tracer.enabled:
+            return self
+        self.parent = _current_span.get()
+        self._token = _current_span.set(self)
+        self.site = _current_site.get()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._token is None:
+            return False
+        end = time.perf_counter()
+        _current_span.reset(self._token)
+        self._token = None
+        if self.parent is not None:
+            self.parent.add_cpu(self.cpu)
+        self.tracer.record({
+            "name": self.name,
+            "category": self.category,
+            "site": self.site,
+            "parent": self.parent.name if self.parent else None,
+            "start": self.start - self.tracer.start_time,
+            "duration": end - self.start,
+            "child_cpu": self.cpu,
+            "bytes": self.bytes,
+            "error": exc_type.__name__ if exc_type else None,
+            "attrs": self.attrs,
+        })
+        return False
+
+
+class Tracer:
+    """ Thu thập span của các bước cài đặt / restore, xuất ra JSON và Chrome trace (chrome://tracing, Perfetto) """
+
+    def __init__(self):
+        self.enabled = False
+        self.output_path = None
+        self.spans = []
+        self.start_time = time.perf_counter()
+
+    def enable(self, output_path):
+        self.enabled = True
+        self.output_path = output_path
+        self.start_time = time.perf_counter()
+
+    def span(self, name, category="phase", **attrs):
+        return Span(self, name, category, attrs)
+
+    def record(self, span):
+        self.spans.append(span)
+
+    def set_site(self, site):
+        """ Gán website cho task hiện tại, các span sau đó nằm trên dòng của website này """
+        _current_site.set(site)
+
+    def chrome_trace(self):
+        """ Chuyển span sang định dạng trace event của Chrome """
+
+        pid = os.getpid()
+        tids = {}
+        events = []
+        for span in self.spans:
+            if span["site"] not in tids:
+                tids[span["site"]] = len(tids) + 1
+                events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tids[span["site"]], "args": {"name": span["site"]}})
+
+            args = dict(span["attrs"], child_cpu=round(span["child_cpu"], 3), bytes=span["bytes"])
+            if span["error"]:
+                args["error"] = span["error"]
+            events.append({
+                "name": span["name"],
+                "cat": span["category"],
+                "ph": "X",
+                "ts": round(span["start"] * 1_000_000),
+                "dur": round(span["duration"] * 1_000_000),
+                "pid": pid,
+                "tid": tids[span["site"]],
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def print_summary(self):
+        """ In tổng thời gian theo từng bước """
+
+        totals = {}
+        for span in self.spans:
+            total = totals.setdefault(span["name"], {"count": 0, "duration": 0.0, "child_cpu": 0.0, "bytes": 0})
+            total["count"] += 1
+            total["duration"] += span["duration"]
+            total["child_cpu"] += span["child_cpu"]
+            total["bytes"] += span["bytes"]
+
+        print("\nThời gian theo từng bước:")
+        for name, total in sorted(totals.items(), key=lambda item: item[1]["duration"], reverse=True):
+            line = f"  - {name}: {total['duration']:.2f}s ({total['count']} lần, CPU tiến trình con {total['child_cpu']:.2f}s"
+            if total["bytes"]:
+                line += f", {total['bytes'] / 1024 / 1024:.1f} MB"
+            print(line + ")")
+
+    def export(self):
+        """ Ghi trace ra file: <output_path> (Chrome trace) và <output_path>.spans.json (danh sách span) """
+
+        if not self.enabled or not self.spans:
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+        with open(f"{self.output_path}.spans.json", "w", encoding="utf-8") as f:
+            json.dump(self.spans, f, ensure_ascii=False, indent=2)
+
+        self.print_summary()
+        print(f"\nĐã ghi trace vào {self.output_path} (mở bằng chrome://tracing hoặc https://ui.perfetto.dev)")
+
+
+tracer = Tracer()
+
+
+def span(name, category="phase", **attrs):
+    """ with span("import"): ... đo thời gian một bước """
+    return tracer.span(name, category, **attrs)
+
+
+def traced(name, category="phase"):
+    """ Decorator đo thời gian một coroutine """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(name, category):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_bytes(count):
+    """ Cộng số bytes đã xử lý vào span đang chạy """
+    current = _current_span.get()
+    if current is not None:
+        current.add_bytes(count)
+
+
+def add_cpu(seconds):
+    """ Cộng thời gian CPU của một tiến trình con đã kết thúc vào span đang chạy """
+    current = _current_span.get()
+    if current is not None:
+        current.add_cpu(seconds)
+
+
+def set_site(site):
+    """ Gán website cho task hiện tại (dòng trên timeline) """
+    tracer.set_site(site)
@@ -0,0 +1,151 @@
+import re
+import threading
+from urllib.parse import quote, urlsplit
+
+
+# Giá trị siteurl / home trong câu lệnh INSERT của bảng options
+SITE_URL_RE = re.compile(rb"\(\s*\d+\s*,\s*'(siteurl|home)'\s*,\s*'([^'\\]*)'")
+
+# Chuỗi SQL trong dấu nháy đơn
+SQL_STRING_RE = re.compile(rb"'((?:[^'\\]|\\.|'')*)'", re.S)
+
+# Chuỗi PHP serialize: s:<độ dài>:"
+SERIALIZED_STRING_RE = re.compile(rb's:(\d+):"')
+
+SQL_UNESCAPE = {b"0": b"\0", b"b": b"\b", b"n": b"\n", b"r": b"\r", b"t": b"\t", b"Z": b"\x1a"}
+SQL_UNESCAPE_RE = re.compile(rb"\\(.)|''", re.S)
+SQL_ESCAPE_RE = re.compile(rb"[\\'\"\0\n\r\x1a]")
+SQL_ESCAPE = {b"\\": b"\\\\", b"'": b"\\'", b'"': b'\\"', b"\0": b"\\0", b"\n": b"\\n", b"\r": b"\\r", b"\x1a": b"\\Z"}
+
+
+def sql_unescape(data):
+    """ Bỏ escape của chuỗi SQL (theo cách mysqldump escape) """
+    return SQL_UNESCAPE_RE.sub(lambda m: b"'" if m.group(1) is None else SQL_UNESCAPE.get(m.group(1), m.group(1)), data)
+
+
+def sql_escape(data):
+    """ Escape chuỗi để ghi lại vào câu lệnh SQL """
+    return SQL_ESCAPE_RE.sub(lambda m: SQL_ESCAPE[m.group(0)], data)
+
+
+def _url_parts(url):
+    """ Tách url thành (host + path) không có dấu / ở cuối """
+    parts = urlsplit(url if "://" in url else f"http://{url}")
+    return f"{parts.netloc}{parts.path}".rstrip("/")
+
+
+class UrlRewriter:
+    """ Thay url cũ bằng url mới trong từng dòng SQL khi import, sửa lại độ dài chuỗi PHP serialize """
+
+    def __init__(self, new_url, old_urls=None, replacements=None):
+        self.new_url = new_url.rstrip("/")
+        self.old_urls = list(old_urls or [])
+        self.extra_replacements = list(replacements or [])
+        self._pairs = None
+        self._needles = None
+        self._lock = threading.Lock()
+        self.replaced_lines = 0
+
+    def detect_line(self, line):
+        """ Dùng làm line_hook khi đọc file SQL: lấy siteurl / home của website cũ """
+
+        if b"siteurl" not in line and b"'home'" not in line:
+            return
+        for match in SITE_URL_RE.finditer(line):
+            url = match.group(2).decode("utf-8", "replace").rstrip("/")
+            if url and url not in self.old_urls:
+                self.old_urls.append(url)
+
+    def _build_pairs(self):
+        """ Tạo danh sách (chuỗi cũ, chuỗi mới) cho tất cả các dạng url: http, https, //, JSON, urlencode """
+
+        new_hostpath = _url_parts(self.new_url)
+        pairs = []
+        hostpaths = []
+        for old_url in self.old_urls:
+            hostpath = _url_parts(old_url)
+            if not hostpath or hostpath == new_hostpath:
+                continue
+            variants = [hostpath]
+            variants.append(hostpath[4:] if hostpath.startswith("www.") else f"www.{hostpath}")
+            for variant in variants:
+                if variant not in hostpaths:
+                    hostpaths.append(variant)
+
+        # Url dài thay trước để không thay nhầm một phần
+        for hostpath in sorted(hostpaths, key=len, reverse=True):
+            for scheme in ("https://", "http://"):
+                pairs.append((f"{scheme}{hostpath}", self.new_url))
+                pairs.append((f"{scheme}{hostpath}".replace("/", "\\/"), self.new_url.replace("/", "\\/")))
+                pairs.append((quote(f"{scheme}{hostpath}", safe=""), quote(self.new_url, safe="")))
+            pairs.append((f"//{hostpath}", f"//{new_hostpath}"))
+            pairs.append((f"\\/\\/{hostpath}".replace("/", "\\/"), f"\\/\\/{new_hostpath}".replace("/", "\\/")))
+
+        pairs = [(old.encode("utf-8"), new.encode("utf-8")) for old, new in pairs]
+        pairs.extend((old.encode("utf-8"), new.encode("utf-8")) for old, new in self.extra_replacements)
+
+        self._pairs = pairs
+        self._needles = sorted({old for old, _ in pairs}, key=len)
+        if hostpaths:
+            print(f"Thay url {', '.join(self.old_urls)} thành {self.new_url} trong lúc import")
+
+    def _replace(self, data):
+        for old, new in self._pairs:
+            if old in data:
+                data = data.replace(old, new)
+        return data
+
+    def _has_needle(self, data):
+        return any(needle in data for needle in self._needles)
+
+    def rewrite_php(self, data):
+        """ Thay url trong dữ liệu PHP, tính lại độ dài của các chuỗi serialize (kể cả serialize lồng nhau) """
+
+        if not self._has_needle(data):
+            return data
+
+        out = []
+        pos = 0
+        while True:
+            match = SERIALIZED_STRING_RE.search(data, pos)
+            if not match:
+                break
+
+            length = int(match.group(1))
+            start = match.end()
+            end = start + length
+            if data[end:end + 2] != b'";':
+                # Không phải chuỗi serialize hợp lệ, xử lý như văn bản thường
+                out.append(self._replace(data[pos:match.end()]))
+                pos = match.end()
+                continue
+
+            out.append(self._replace(data[pos:match.start()]))
+            inner = self.rewrite_php(data[start:end])
+            out.append(b's:%d:"' % len(inner))
+            out.append(inner)
+            out.append(b'";')
+            pos = end + 2
+
+        out.append(self._replace(data[pos:]))
+        return b"".join(out)
+
+    def _rewrite_literal(self, match):
+        literal = match.group(1)
+        if not self._has_needle(literal):
+            return match.group(0)
+        return b"'" + sql_escape(self.rewrite_php(sql_unescape(literal))) + b"'"
+
+    def rewrite_line(self, line):
+        """ Dùng làm transform khi import: thay url trong các chuỗi của dòng SQL """
+
+        if self._pairs is None:
+            with self._lock:
+                if self._pairs is None:
+                    self._build_pairs()
+
+        if not self._pairs or not self._has_needle(line):
+            return line
+
+        self.replaced_lines += 1
+        return SQL_STRING_RE.sub(self._rewrite_literal, line)
@@ -2,27 +2,21 @@ import os
 import sys
 # import urllib.request
 import shutil
-import subprocess
 import asyncio
 import aiofiles
-import aiohttp
-import zipfile
+from scheduler import limits
+from tracing import span
+from commands import open_browser, reload_apache
 
-async def check_and_download_file(url, file_path):
-    """ Kiểm tra tệp có tồn tại không và tải tệp xuống """
-    if not os.path.exists(file_path):
-        print(f"Tệp {file_path} không tồn tại, đang tải tệp xuống...\n")
-        try:
-            async with aiofiles.open(file_path, "wb") as f:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url) as response:
-                        async for chunk in response.content.iter_chunked(1024):
-                            await f.write(chunk)
-        except Exception as e:
-            print(f"Lỗi khi tải tệp: {e}")
-            sys.exit(1)
-    else:
-        print(f"Tệp {file_path} đã tồn tại, không cần tải xuống.")
+async def check_and_download_file(url, file_path, max_age=None):
+    """ Kiểm tra tệp có trong cache không và tải tệp xuống """
+
+    from download_cache import get_download_cache
+    try:
+        return await get_download_cache(os.path.dirname(file_path)).fetch(url, file_path, max_age)
+    except Exception as e:
+        print(f"Lỗi khi tải tệp: {e}")
+        sys.exit(1)
 
 async def copy_file_folder(source_path, destination_path):
     """ Copy file, folder """
@@ -37,7 +31,8 @@ async def copy_file_folder(source_path, destination_path):
             file_name = os.path.basename(source_path)
             folder_name = os.path.dirname(source_path)
             source_path = os.path.join(folder_name, file_name)
-            await asyncio.to_thread(shutil.copy2, source_path, destination_path)
+            async with limits.disk():
+                await asyncio.to_thread(shutil.copy2, source_path, destination_path)
             return file_name, folder_name
         
         except (OSError, IOError) as e:
@@ -65,7 +60,8 @@ async def copy_file_folder(source_path, destination_path):
                 print(f"Lỗi khi sao chép folder: {e}")
                 sys.exit(1)
 
-        await asyncio.gather(*tasks)
+        async with limits.disk():
+            await asyncio.gather(*tasks)
 
         print(f"Đã sao chép các tệp thành công!\n")
     except Exception as e:
@@ -109,19 +105,27 @@ Email: {wp_admin_email}
 async def reload_laragon(laragon_path, website_url, custom_slug=None):
     """ Reload Apache Server """
     # Reload Apache Server
-    await asyncio.to_thread(subprocess.run, f'{os.path.join(laragon_path, "laragon.exe")} reload apache', shell=True)
+    await reload_apache(laragon_path)
 
     # Truy cập website  
     slug = custom_slug if custom_slug else "wp-admin"
-    await asyncio.to_thread(subprocess.run, f'start "" "{website_url}/{slug}"', shell=True)
+    await open_browser(f"{website_url}/{slug}")
 
 
 async def extract_zip_file(zip_file, extract_path):
-    """ Giải nén tệp zip """
+    """ Giải nén tệp zip trong thread (không chặn event loop), các tệp được ghi song song """
+
+    from zip_extract import extract_zip
     try:
-        with zipfile.ZipFile(zip_file, "r") as zip_ref:
-            zip_ref.extractall(extract_path)
+        with span("extract", "disk", file=os.path.basename(zip_file)) as current:
+            stats = await asyncio.to_thread(extract_zip, zip_file, extract_path)
+            current.add_bytes(stats.bytes)
     except Exception as e:
         print(f"Lỗi khi giải nén tệp: {e}")
         sys.exit(1)
 
+    skipped = f", bỏ qua {stats.skipped} tệp đã có" if stats.skipped else ""
+    print(f"Đã giải nén {os.path.basename(zip_file)}: {stats.files} tệp, {stats.bytes / (1024 * 1024):.1f} MB "
+          f"trong {stats.seconds:.2f}s ({stats.mbps:.1f} MB/s){skipped}")
+    return stats
+
@@ -0,0 +1,122 @@
+import os
+import json
+import shlex
+import base64
+import uuid
+import aiofiles
+import config
+from commands import run_command
+from tracing import span
+
+
+RESULT_MARKER = "__WP_BATCH_RESULT__"
+
+# Script PHP chạy lần lượt các lệnh WP-CLI trong cùng tiến trình (WordPress chỉ bootstrap một lần)
+BATCH_SCRIPT = """<?php
+$commands = json_decode(base64_decode('%s'), true);
+$results = array();
+foreach ($commands as $command) {
+    $start = microtime(true);
+    try {
+        $r = WP_CLI::runcommand($command, array('return' => 'all', 'launch' => false, 'exit_error' => false));
+        $results[] = array('command' => $command, 'code' => $r->return_code, 'stdout' => $r->stdout, 'stderr' => $r->stderr, 'time' => microtime(true) - $start);
+    } catch (\\Throwable $e) {
+        $results[] = array('command' => $command, 'code' => 1, 'stdout' => '', 'stderr' => $e->getMessage(), 'time' => microtime(true) - $start);
+    }
+}
+echo "\\n%s" . json_encode($results);
+"""
+
+
+class WPBatch:
+    """ Gom nhiều lệnh WP-CLI và chạy trong WP worker của website, hoặc một tiến trình PHP qua `wp eval-file` """
+
+    def __init__(self, website_path, cached_path):
+        self.website_path = website_path
+        self.cached_path = cached_path
+        self.wp_cli = ["wp", f"--path={self.website_path}"]
+        self.commands = []
+
+    def add(self, command):
+        """ Thêm một lệnh WP-CLI (không có tiền tố `wp`), ví dụ: 'option update posts_per_page 30' """
+        self.commands.append(command)
+        return self
+
+    def extend(self, commands):
+        """ Thêm nhiều lệnh WP-CLI """
+        self.commands.extend(commands)
+        return self
+
+    async def run(self, print_output=False, print_text=None):
+        """ Chạy toàn bộ lệnh đã gom, trả về kết quả của từng lệnh """
+
+        if not self.commands:
+            return []
+
+        if print_text:
+            print(print_text)
+
+        with span("wp_batch", commands=len(self.commands)):
+            results = None
+            if config.use_wp_worker:
+                from wp_worker import wp_workers
+                results = await wp_workers.run(self.website_path, self.cached_path, self.commands)
+            if results is None and config.use_wp_batch:
+                results = await self._run_batch()
+
+        if results is not None:
+            for item in results:
+                if print_output and item["stdout"]:
+                    print(item["stdout"])
+                if item["code"] != 0:
+                    print(f"Lỗi khi thực thi lệnh 'wp {item['command']}': {item['stderr']}")
+
+        # Các lệnh chưa chạy (worker dừng giữa chừng, không chạy được theo lô) chạy bằng tiến trình riêng
+        remaining = self.commands[len(results or []):]
+        if remaining:
+            with span("wp_batch", commands=len(remaining), fallback=True):
+                results = (results or []) + await self._run_separately(remaining, print_output)
+
+        self.commands = []
+        return results
+
+    async def _run_batch(self):
+        """ Chạy các lệnh trong một lần bootstrap WordPress, trả về None nếu không chạy được """
+
+        batch_dir = os.path.join(self.cached_path, "wp-batch")
+        os.makedirs(batch_dir, exist_ok=True)
+        script_path = os.path.join(batch_dir, f"batch-{uuid.uuid4().hex}.php")
+
+        payload = base64.b64encode(json.dumps(self.commands).encode("utf-8")).decode("ascii")
+        async with aiofiles.open(script_path, "w", encoding="utf-8") as f:
+            await f.write(BATCH_SCRIPT % (payload, RESULT_MARKER))
+
+        try:
+            result = await run_command([*self.wp_cli, "eval-file", script_path], resource="php")
+        finally:
+            try:
+                os.remove(script_path)
+            except OSError:
+                pass
+
+        if RESULT_MARKER not in result.stdout:
+            print("Không thể chạy WP-CLI theo lô, chuyển sang chạy từng lệnh.")
+            return None
+
+        try:
+            return json.loads(result.stdout.rsplit(RESULT_MARKER, 1)[1].strip())
+        except ValueError:
+            print("Không đọc được kết quả WP-CLI theo lô, chuyển sang chạy từng lệnh.")
+            return None
+
+    async def _run_separately(self, commands, print_output=False):
+        """ Chạy lần lượt mỗi lệnh bằng một tiến trình `wp` riêng (cách cũ), giữ đúng thứ tự các lệnh """
+
+        results = []
+        for command in commands:
+            result = await run_command([*self.wp_cli, *shlex.split(command)], print_output=print_output, resource="php")
+            if result.error or result.timed_out:
+                results.append({"command": command, "code": 1, "stdout": result.stdout, "stderr": result.stderr or "Không chạy được lệnh"})
+            else:
+                results.append({"command": command, "code": result.returncode, "stdout": result.stdout, "stderr": result.stderr})
+        return results
@@ -1,32 +1,57 @@
 from input_handler import WebsiteInputs
-from utilities import check_and_download_file, copy_file_folder, extract_zip_file
-from commands import run_command, run_sql_command
+from utilities import check_and_download_file, copy_file_folder
+from commands import run_command
+from sql_import import import_sql_file
+from url_rewrite import UrlRewriter
 import os
 import json
+import hashlib
+import functools
 from main import get_laragon_path
 from utilities import save_wp_credentials, print_info, reload_laragon
 from database_handler import create_database
+from database_pool import db_pool, quote_identifier
+from wp_batch import WPBatch
+from wp_worker import wp_workers
+from wp_password import hash_password
+from file_deploy import deploy_tree, detach_file, verify_cache_tree
+from artifact_cache import get_artifact_cache
+from single_flight import get_single_flight
+from tracing import set_site, span, traced
+from site_template import clear_templates, find_template, read_wp_version, snapshot_site, template_key, update_wp_config_db_name, TEMPLATE_DB_FILE, TEMPLATE_FILES_DIR
 import config
 import asyncio, aiofiles
 
 
-# Tải tài nguyên từ file resource.json
-try:
-    with open(config.resource_path, 'r', encoding='utf-8') as f:
-        resource = json.load(f)
-        plugins = resource['plugins']
-        themes = resource['themes']
-except Exception as e:
-    print(f"Không thể đọc file resource.json: {e}")
-
-
-laragon_path, laragon_sites_path, cached_path = get_laragon_path()
+@functools.lru_cache(maxsize=None)
+def load_resources():
+    """ Đọc danh sách plugins, themes từ file resource.json (chỉ đọc một lần, khi cần dùng) """
+    try:
+        with open(config.resource_path, 'r', encoding='utf-8') as f:
+            resource = json.load(f)
+        return resource['plugins'], resource['themes']
+    except Exception as e:
+        print(f"Không thể đọc file resource.json: {e}")
+        return [], []
+
+@functools.lru_cache(maxsize=None)
+def load_options_profile():
+    """ Đọc bộ options (config.options_profile) từ file options_profile.json:
+    "options" ghi thẳng vào bảng options, "wp_cli" là các lệnh không ghi được bằng SQL (wp-config, permalink) """
+    try:
+        with open(config.options_profile_path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)[config.options_profile]
+        return {"options": {name: str(value) for name, value in profile.get("options", {}).items()}, "wp_cli": list(profile.get("wp_cli", []))}
+    except Exception as e:
+        print(f"Không thể đọc options '{config.options_profile}' trong file {config.options_profile_path}: {e}")
+        return None
 
 class WPInstaller :
     """Install WordPress"""
 
     def __init__(self, inputs: WebsiteInputs):
-        
+
+        laragon_path, laragon_sites_path, cached_path = get_laragon_path()
         self.laragon_path = laragon_path
         self.laragon_sites_path = laragon_sites_path
         self.cached_path = cached_path
@@ -44,36 +69,58 @@ class WPInstaller :
         
         self.website_path = os.path.join(self.laragon_sites_path, self.website_name)
 
-        self.wp_cli_cmd = f'wp --path=\"{self.website_path}\"'        
+        self.wp_cli = ["wp", f"--path={self.website_path}"]
 
-    async def install_wp_core(self):
-        """ Cài đặt WordPress Core """
+    def wp_batch(self):
+        """ Tạo lô lệnh WP-CLI chạy trong một lần bootstrap WordPress """
+        return WPBatch(self.website_path, self.cached_path)
 
-        # Copy WordPress Core từ thư mục cached
+    async def prepare_wp_core(self):
+        """ Tải và giải nén WordPress Core vào thư mục cached, trả về đường dẫn thư mục core.
+        Khi nhiều website cài cùng lúc, chỉ một tác vụ tải / giải nén, các tác vụ khác chờ kết quả """
+
+        return await get_single_flight(self.cached_path).run("wp-core", self._prepare_wp_core)
+
+    async def _prepare_wp_core(self):
         wp_core_file = os.path.join(self.cached_path, "wordpress.latest.zip")
-        await check_and_download_file("https://wordpress.org/latest.zip", wp_core_file)
+        entry = await check_and_download_file(config.wp_core_url, wp_core_file)
 
-        wp_core_dir = os.path.join(self.cached_path, "wordpress")
+        # Bản giải nén theo sha256 của wordpress.latest.zip, tự giải nén lại khi có phiên bản mới
+        tree_path = await get_artifact_cache(self.cached_path).get_tree(wp_core_file, entry["sha256"] if entry else None)
+        wp_core_dir = os.path.join(tree_path, "wordpress")
 
-        if not os.path.exists(wp_core_dir):
-            await extract_zip_file(wp_core_file, self.cached_path)
+        return wp_core_dir
+
+    @traced("core_copy")
+    async def install_wp_core(self):
+        """ Cài đặt WordPress Core """
+
+        # Copy WordPress Core từ thư mục cached
+        wp_core_dir = await self.prepare_wp_core()
 
         print(f"Sao chép tệp {wp_core_dir} vào {self.website_path}...")
-        await copy_file_folder(wp_core_dir, self.website_path)
+        await deploy_tree(wp_core_dir, self.website_path)
 
+    @traced("config")
     async def edit_wp_config(self):
         """ Tạo file wp-config.php """
-        wp_config_cmd = f"config create --dbname={self.website_name} --dbuser=root --dbpass= --dbhost=localhost"
-        await run_command(f"{self.wp_cli_cmd} {wp_config_cmd}", print_text=f"Tạo file wp-config.php")
+        wp_config_cmd = ["config", "create", f"--dbname={self.website_name}", "--dbuser=root", "--dbpass=", "--dbhost=localhost"]
+        await run_command([*self.wp_cli, *wp_config_cmd], print_text=f"Tạo file wp-config.php", resource="php")
 
+    @traced("install")
     async def install_wordpress(self):
         """ Cài đặt WordPress """
-        wp_install_cmd = f'core install --url="{self.website_url}/" --admin_user="{self.wp_admin}" --admin_password="{self.wp_admin_password}" --title="{self.website_name}" --admin_email="{self.wp_admin_email}"'
-        await run_command(f"{self.wp_cli_cmd} {wp_install_cmd}", print_text=f"Cài đặt WordPress")
+        wp_install_cmd = [
+            "core", "install", f"--url={self.website_url}/", f"--admin_user={self.wp_admin}", f"--admin_password={self.wp_admin_password}",
+            f"--title={self.website_name}", f"--admin_email={self.wp_admin_email}"
+        ]
+        await run_command([*self.wp_cli, *wp_install_cmd], print_text=f"Cài đặt WordPress", resource="php")
 
     async def choose_install_plugin(self, plugin_choices=None):
         """ Chọn plugins để cài đặt """
 
+        plugins, _ = load_resources()
+
         # In danh sách plugin để người dùng chọn nếu không có argument
         if plugin_choices is None:
             print("\nDanh sách plugins:\n")
@@ -103,13 +150,14 @@ class WPInstaller :
 
         return selected_plugins_dict
 
+    @traced("plugins")
     async def install_plugins(self, selected_plugins=None):
         """ Xóa plugin mặc định và cài đặt plugin theo danh sách (nếu có) """
 
-        await asyncio.gather(
-            run_command(f"{self.wp_cli_cmd} plugin delete hello"),
-            run_command(f"{self.wp_cli_cmd} plugin delete akismet"),
-        )        
+        await self.wp_batch().extend([
+            "plugin delete hello",
+            "plugin delete akismet",
+        ]).run()
 
         # Nếu không có danh sách plugin, dừng lại
         if not selected_plugins:
@@ -124,18 +172,20 @@ class WPInstaller :
             download_tasks.append(check_and_download_file(details["url"], local_path))
             plugins_list.append(local_path)
 
-        await asyncio.gather(*download_tasks)
+        entries = await asyncio.gather(*download_tasks)
 
+        # Mỗi tệp zip chỉ giải nén một lần vào cache, sau đó copy / link vào website
+        artifact_cache = get_artifact_cache(self.cached_path)
         plugins_path = os.path.join(self.website_path, "wp-content", "plugins")
         tasks = []
-        for plugin in plugins_list:
+        for plugin, entry in zip(plugins_list, entries):
             if "wordfence" in plugin:
                 tasks.append(self.wordfence_activate())   
-            tasks.append(extract_zip_file(plugin, plugins_path))
+            tasks.append(artifact_cache.deploy(plugin, plugins_path, entry["sha256"] if entry else None))
 
         await asyncio.gather(*tasks)
 
-        await run_command(f"{self.wp_cli_cmd} plugin activate --all")
+        await self.wp_batch().add("plugin activate --all").run()
 
 
     async def wordfence_activate(self):
@@ -146,84 +196,75 @@ class WPInstaller :
         mu_plugins_path = os.path.join(self.website_path, "wp-content", "mu-plugins")
         await copy_file_folder(wordfence_activate_file, mu_plugins_path)
 
+    @traced("themes")
     async def install_themes(self, condition=True):
         """ Nếu 'True' thì cài đặt Flatsome và xóa các theme mặc định, nếu 'False' thì chỉ cài đặt Flatsome """
 
+        _, themes = load_resources()
         flatsome_file = os.path.join(self.cached_path, themes[0]["file_name"])
-        if not os.path.exists(flatsome_file):
-            await check_and_download_file(themes[0]["url"], flatsome_file)
+        entry = await check_and_download_file(themes[0]["url"], flatsome_file)
 
         theme_path = os.path.join(self.website_path, "wp-content", "themes")
+        batch = self.wp_batch()
         if condition:
-            await extract_zip_file(flatsome_file, theme_path)
-            await run_command(f'{self.wp_cli_cmd} theme activate flatsome', print_text=f"Cài đặt theme Flatsome")
+            await get_artifact_cache(self.cached_path).deploy(flatsome_file, theme_path, entry["sha256"] if entry else None)
+            print("Cài đặt theme Flatsome")
+            batch.add("theme activate flatsome")
 
-        default_themes_cmds = [
+        # Theme đang kích hoạt phải được đổi trước khi xóa theme mặc định nên chạy cùng một lô theo thứ tự
+        batch.extend([
             "theme delete twentytwentythree",
             "theme delete twentytwentyfour",
             "theme delete twentytwentyfive",
-        ]
+        ])
 
-        tasks= [run_command(f"{self.wp_cli_cmd} {theme_cmd}") for theme_cmd in default_themes_cmds]        
-
-        await asyncio.gather(*tasks)
+        await batch.run()
 
+    @traced("languages")
     async def install_languages(self):
         """ Cấu hình ngôn ngữ website """
 
         print(f"Cấu hình ngôn ngữ website: {self.language}")
-        language_cmds = [
+        await self.wp_batch().extend([
             f"language core install {self.language}",
             f"site switch-language {self.language}"
-            ]
-        
-        for language_cmd in language_cmds:
-            await run_command(f"{self.wp_cli_cmd} {language_cmd}")
+        ]).run()
 
+    @traced("options")
     async def install_options(self):
         """ Cấu hình options """
 
+        profile = load_options_profile() if self.apply_options else None
+        if not profile:
+            return
+
         print("Cấu hình options")
-        if self.apply_options:
-            option_cmds = [
-                'config set WP_MEMORY_LIMIT 256M',
-                'rewrite structure "/%category%/%postname%/"',
-                'option update timezone_string "Asia/Ho_Chi_Minh"',
-                'option update time_format "H:i"',
-                'option update date_format "d/m/Y"',
-                'option update large_size_w 0',
-                'option update large_size_h 0',
-                'option update medium_large_size_w 0',
-                'option update medium_large_size_h 0',
-                'option update medium_size_w 0',
-                'option update medium_size_h 0',
-                'option update thumbnail_size_w 0',
-                'option update thumbnail_size_h 0',
-                'option update thumbnail_crop 0',
-                'option update comment_moderation 1',
-                'option update default_ping_status closed',
-                'option update posts_per_page 30',
-                'option update posts_per_rss 210',
-                'option update rss_use_excerpt 1',
-                'option update avatar_default identicon'
-            ]
-
-            tasks = []
-            for cmd in option_cmds:
-                try:
-                    full_cmd = f"{self.wp_cli_cmd} {cmd}"
-                    tasks.append(run_command(full_cmd, print_output=True))
-                except Exception as e:
-                    print(f"Lỗi khi thực thi lệnh '{cmd}': {e}")
-                    continue
-
-            await asyncio.gather(*tasks)
+        # Toàn bộ options trong một câu lệnh / transaction, các lệnh còn lại chạy chung một lô WP-CLI
+        tasks = [self.wp_batch().extend(profile["wp_cli"]).run(print_output=True)]
+        if profile["options"]:
+            tasks.append(db_pool.transaction(self._options_statements(profile["options"]), self.website_name))
+        await asyncio.gather(*tasks)
+
+    @staticmethod
+    def _options_statements(options, prefix="wp_"):
+        """ Ghi (thêm hoặc cập nhật) nhiều options bằng một câu INSERT ... ON DUPLICATE KEY UPDATE """
 
+        options_table = quote_identifier(f"{prefix}options")
+        values = ", ".join(["(%s, %s, 'yes')"] * len(options))
+        params = tuple(item for name, value in options.items() for item in (name, value))
+        return [(
+            f"INSERT INTO {options_table} (option_name, option_value, autoload) VALUES {values} "
+            "ON DUPLICATE KEY UPDATE option_value = VALUES(option_value)",
+            params
+        )]
+
+    @traced("htaccess")
     async def edit_htaccess(self):
         """ Chỉnh sửa file .htaccess để thêm quy tắc chuyển hướng từ HTTP sang HTTPS. """
 
         htaccess_path = os.path.join(self.website_path, '.htaccess')
         print(f'Tạo file .htaccess: {htaccess_path}\n')
+        detach_file(htaccess_path)
 
         # Nội dung gốc của .htaccess (nếu file chưa tồn tại)
         default_htaccess = """# BEGIN WordPress
@@ -266,44 +307,71 @@ RewriteRule (.*) https://%{HTTP_HOST}%{REQUEST_URI} [L,R=301,NE]
         except Exception as e:
             print(f"Lỗi không xác định: {e}")
     
+    def _url_statements(self, prefix="wp_"):
+        options_table = quote_identifier(f"{prefix}options")
+        return [
+            (f"UPDATE {options_table} SET option_value = %s WHERE option_name IN ('home', 'siteurl')", (self.website_url,)),
+        ]
+
+    @traced("url")
     async def change_url(self, prefix="wp_"):
-        """ Thay đổi url website """        
+        """ Thay đổi url website """
 
         print(f'\nThay đổi url website thành: "{self.website_url}"')
+        await db_pool.transaction(self._url_statements(prefix), self.website_name)
+
+    def _admin_statements(self, prefix="wp_"):
+        """ Đổi admin email, username / mật khẩu (hash phpass) / email của user đầu tiên """
+
+        options_table = quote_identifier(f"{prefix}options")
+        users_table = quote_identifier(f"{prefix}users")
+        return [
+            (f"UPDATE {options_table} SET option_value = %s WHERE option_name = 'admin_email'", (self.wp_admin_email,)),
+            (
+                f"UPDATE {users_table} SET user_pass = %s, user_login = %s, user_email = %s "
+                f"WHERE ID = (SELECT ID FROM (SELECT MIN(ID) AS ID FROM {users_table}) AS first_user)",
+                (hash_password(self.wp_admin_password), self.wp_admin, self.wp_admin_email)
+            ),
+        ]
 
-        await asyncio.gather(
-            run_sql_command(f'{self.website_name} -e "UPDATE {prefix}options SET option_value = \'{self.website_url}\' WHERE option_name = \'home\';"'),
-            run_sql_command(f'{self.website_name} -e "UPDATE {prefix}options SET option_value = \'{self.website_url}\' WHERE option_name = \'siteurl\';"')
-        )
+    @traced("admin")
+    async def change_admin_info(self, prefix="wp_", change_url=False):
+        """Thay đổi thông tin admin (và url nếu change_url) trong một transaction"""
 
-    async def change_admin_info(self, prefix="wp_"):
-        """Thay đổi thông tin admin"""
+        statements = self._admin_statements(prefix)
+        if change_url:
+            print(f'\nThay đổi url website thành: "{self.website_url}"')
+            statements = self._url_statements(prefix) + statements
 
-        # Lấy ID của admin user đầu tiên
-        result = await run_sql_command(f'{self.website_name} --skip-column-names --silent -e "SELECT ID FROM {prefix}users;"')
-        user_id = result.stdout.replace('\n', ',').split(',')
-        print(f'\nDanh sách ID: {user_id if user_id else "Không tìm thấy ID"}')
-        
-        tasks = [run_sql_command(f'{self.website_name} -e "UPDATE {prefix}options SET option_value = \'{self.wp_admin_email}\' WHERE option_name = \'admin_email\';"', print_text=f"Thay đổi admin email")]
-        if user_id:
-            commands = [
-                run_sql_command(f'{self.website_name} -e "UPDATE {prefix}users SET user_pass = MD5(\'{self.wp_admin_password}\') WHERE ID = {user_id[0]};"', print_text=f"Đặt lại mật khẩu admin"),
-                run_sql_command(f'{self.website_name} -e "UPDATE {prefix}users SET user_login = \'{self.wp_admin}\' WHERE ID = {user_id[0]};"', print_text=f"Đặt lại admin username"),
-                run_sql_command(f'{self.website_name} -e "UPDATE {prefix}users SET user_email = \'{self.wp_admin_email}\' WHERE ID = {user_id[0]};"', print_text=f"Thay đổi user email"),
-            ]
-            tasks.extend(commands)
-
-        await asyncio.gather(*tasks)
+        print("Đặt lại admin email, mật khẩu, username và email của admin")
+        await db_pool.transaction(statements, self.website_name)
 
         # Flush rewrite rules, cache
-        await asyncio.gather(
-            run_command(f'{self.wp_cli_cmd} rewrite flush'),
-            run_command(f'{self.wp_cli_cmd} cache flush')
-        )
+        await self.wp_batch().extend([
+            "rewrite flush",
+            "cache flush"
+        ]).run()
+
+    async def template_fields(self, selected_plugins=None):
+        """ Các thông tin xác định template: phiên bản WP, ngôn ngữ, options, plugins, theme """
+
+        wp_version = read_wp_version(await self.prepare_wp_core())
+        profile = load_options_profile() if self.apply_options else None
+        options = hashlib.sha1(json.dumps(profile, sort_keys=True).encode("utf-8")).hexdigest()[:10] if profile else "none"
+        plugins = sorted(details["file_name"] for details in (selected_plugins or {}).values())
+
+        return {
+            "wp_version": wp_version,
+            "language": self.language,
+            "options": options,
+            "plugins": plugins,
+            "theme": load_resources()[1][0]["file_name"],
+        }
+
+    @traced("build_website")
+    async def build_website(self, selected_plugins=None):
+        """ Cài đặt và cấu hình đầy đủ một website mới """
 
-    async def create_new_website(self, selected_plugins=None):
-        """ Tạo website mới """        
-        
         # Chạy tuần tự
         await create_database(self.website_name)
         await self.install_wp_core()
@@ -319,6 +387,58 @@ RewriteRule (.*) https://%{HTTP_HOST}%{REQUEST_URI} [L,R=301,NE]
             save_wp_credentials(self.website_path, self.website_url, self.wp_admin, self.wp_admin_password, self.wp_admin_email)
         )
 
+    @traced("template_clone")
+    async def clone_from_template(self, template):
+        """ Tạo website bằng cách clone template, sau đó đổi url và thông tin admin """
+
+        print(f"Tạo website từ template {template['key']}")
+        await create_database(self.website_name)
+
+        print(f"Sao chép template vào {self.website_path}...")
+        await deploy_tree(os.path.join(template["path"], TEMPLATE_FILES_DIR), self.website_path)
+        await update_wp_config_db_name(self.website_path, self.website_name)
+
+        # Đổi url của template thành url mới ngay trong lúc import
+        rewriter = UrlRewriter(self.website_url, [template["website_url"]])
+        await import_sql_file(self.website_name, os.path.join(template["path"], TEMPLATE_DB_FILE), transform=rewriter.rewrite_line)
+
+        await self.wp_batch().add("config shuffle-salts").run()
+
+        await asyncio.gather(
+            self.change_admin_info(),
+            self.edit_htaccess(),
+            save_wp_credentials(self.website_path, self.website_url, self.wp_admin, self.wp_admin_password, self.wp_admin_email)
+        )
+
+    async def create_new_website(self, selected_plugins=None):
+        """ Tạo website mới """        
+
+        set_site(self.website_name)
+        try:
+            with span("create_website", website=self.website_name):
+                await self._create_new_website(selected_plugins)
+        finally:
+            await wp_workers.close(self.website_path)
+
         await print_info(self.website_url, self.wp_admin, self.wp_admin_password, self.wp_admin_email)
         await reload_laragon(self.laragon_path, self.website_url)
 
+    async def _create_new_website(self, selected_plugins=None):
+        if config.use_site_templates:
+            fields = await self.template_fields(selected_plugins)
+            key = template_key(fields)
+            template = find_template(self.cached_path, key)
+
+            template_files = os.path.join(template["path"], TEMPLATE_FILES_DIR) if template else None
+            if template and config.deploy_mode == "link" and not await asyncio.to_thread(verify_cache_tree, template_files):
+                print(f"Template {key} đã bị thay đổi, dựng lại template...")
+                clear_templates(self.cached_path, key)
+                template = None
+
+            if template:
+                await self.clone_from_template(template)
+            else:
+                await self.build_website(selected_plugins)
+                await snapshot_site(self.cached_path, key, fields, self.website_name, self.website_path, self.website_url)
+        else:
+            await self.build_website(selected_plugins)
@@ -0,0 +1,69 @@
+import hmac
+import hashlib
+import secrets
+
+
+# Băm mật khẩu theo chuẩn phpass "portable" của WordPress ($P$...), WordPress đọc được ở mọi phiên bản
+ITOA64 = "./0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+# WordPress dùng PasswordHash(8, true): 2^(8 + 5) = 8192 vòng MD5, ký tự 'B' trong hash
+ITERATION_COUNT_LOG2 = 8
+
+
+def _encode64(data, count):
+    """ Mã hóa bytes theo bảng ITOA64 (giống PasswordHash::encode64 của phpass) """
+
+    output = []
+    i = 0
+    while i < count:
+        value = data[i]
+        i += 1
+        output.append(ITOA64[value & 0x3f])
+        if i < count:
+            value |= data[i] << 8
+        output.append(ITOA64[(value >> 6) & 0x3f])
+        if i >= count:
+            break
+        i += 1
+        if i < count:
+            value |= data[i] << 16
+        output.append(ITOA64[(value >> 12) & 0x3f])
+        if i >= count:
+            break
+        i += 1
+        output.append(ITOA64[(value >> 18) & 0x3f])
+    return "".join(output)
+
+
+def _crypt_private(password, setting):
+    """ Tính hash từ mật khẩu và phần setting ($P$ + số vòng + salt 8 ký tự), trả về None nếu setting sai """
+
+    if setting[:3] not in ("$P$", "$H$") or len(setting) < 12:
+        return None
+    count_log2 = ITOA64.find(setting[3])
+    if count_log2 < 7 or count_log2 > 30:
+        return None
+
+    salt = setting[4:12].encode("utf-8")
+    password = password.encode("utf-8")
+    digest = hashlib.md5(salt + password).digest()
+    for _ in range(1 << count_log2):
+        digest = hashlib.md5(digest + password).digest()
+
+    return setting[:12] + _encode64(digest, 16)
+
+
+def hash_password(password):
+    """ Băm mật khẩu cho cột user_pass của WordPress """
+
+    setting = "$P$" + ITOA64[min(ITERATION_COUNT_LOG2 + 5, 30)] + _encode64(secrets.token_bytes(6), 6)
+    return _crypt_private(password, setting)
+
+
+def check_password(password, stored_hash):
+    """ Kiểm tra mật khẩu với hash phpass ($P$ / $H$) hoặc MD5 cũ (32 ký tự hex) """
+
+    if len(stored_hash) <= 32:
+        return hmac.compare_digest(hashlib.md5(password.encode("utf-8")).hexdigest(), stored_hash)
+    computed = _crypt_private(password, stored_hash)
+    return computed is not None and hmac.compare_digest(computed, stored_hash)
@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import itertools
+import contextlib
+import collections
+import config
+from commands import spawn
+from scheduler import limits
+from tracing import span
+
+
+WORKER_MARKER = "__WP_WORKER__"
+
+# Script PHP chạy trong `wp eval-file`: WordPress chỉ bootstrap một lần, sau đó đọc từng lệnh (JSON) từ stdin
+WORKER_SCRIPT = """<?php
+$marker = '%s';
+fwrite(STDOUT, "\\n" . $marker . json_encode(array('ready' => true, 'pid' => getmypid())) . "\\n");
+fflush(STDOUT);
+while (($line = fgets(STDIN)) !== false) {
+    $request = json_decode(trim($line), true);
+    if (!is_array($request) || !isset($request['id'])) {
+        continue;
+    }
+    $response = array('id' => $request['id']);
+    if (isset($request['ping'])) {
+        $response['pong'] = true;
+    } else {
+        $start = microtime(true);
+        // Xóa cache trong bộ nhớ để thấy thay đổi do tiến trình khác ghi vào database (mysql, pool)
+        function_exists('wp_cache_flush_runtime') ? wp_cache_flush_runtime() : wp_cache_flush();
+        ob_start();
+        try {
+            $r = WP_CLI::runcommand($request['command'], array('return' => 'all', 'launch' => false, 'exit_error' => false));
+            $response += array('code' => $r->return_code, 'stdout' => $r->stdout, 'stderr' => $r->stderr);
+        } catch (\\Throwable $e) {
+            $response += array('code' => 1, 'stdout' => '', 'stderr' => $e->getMessage());
+        }
+        $response['stdout'] .= ob_get_clean();
+        $response['time'] = microtime(true) - $start;
+    }
+    fwrite(STDOUT, "\\n" . $marker . json_encode($response) . "\\n");
+    fflush(STDOUT);
+}
+"""
+
+# Giới hạn độ dài một dòng output của worker (kết quả JSON của một lệnh)
+STREAM_LIMIT = 64 * 1024 * 1024
+
+
+class WorkerError(Exception):
+    """ Worker không khởi động được, đã dừng hoặc trả lời sai """
+
+
+def _script_path(cached_path):
+    """ Ghi script worker vào thư mục cached (tên theo hash nội dung, chỉ ghi một lần) """
+
+    content = WORKER_SCRIPT % WORKER_MARKER
+    digest = hashlib.sha1(content.encode("utf-8")).hexdigest()[:12]
+    script_dir = os.path.join(cached_path, "wp-batch")
+    path = os.path.join(script_dir, f"wp-worker-{digest}.php")
+    if not os.path.exists(path):
+        os.makedirs(script_dir, exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    return path
+
+
+class WPWorker:
+    """ Tiến trình PHP giữ WordPress của một website đã bootstrap, nhận lệnh WP-CLI qua stdin """
+
+    def __init__(self, website_path, cached_path):
+        self.website_path = website_path
+        self.cached_path = cached_path
+        self.wp_cli = ["wp", f"--path={self.website_path}"]
+        self.process = None
+        self.commands_run = 0
+        self.last_used = 0.0
+        self.failed = False
+        self._stack = None
+        self._stderr = collections.deque(maxlen=20)
+        self._ids = itertools.count(1)
+        self.lock = asyncio.Lock()
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        """ Khởi động worker, chờ WordPress bootstrap xong """
+
+        script_path = await asyncio.to_thread(_script_path, self.cached_path)
+        stack = contextlib.AsyncExitStack()
+        try:
+            self.process = await stack.enter_async_context(spawn(
+                [*self.wp_cli, "eval-file", script_path],
+                stdin=asyncio.subprocess.PIPE, limited=False, limit=STREAM_LIMIT
+            ))
+            stderr_task = asyncio.create_task(self._drain_stderr())
+            stack.push_async_callback(self._cancel, stderr_task)
+            await asyncio.wait_for(self._read_response(), config.wp_worker_start_timeout)
+        except BaseException:
+            await stack.aclose()
+            self.process = None
+            raise
+
+        self._stack = stack
+        self.commands_run = 0
+        self.last_used = time.monotonic()
+
+    async def _drain_stderr(self):
+        """ Đọc stderr của worker trong nền (giữ vài dòng cuối để báo lỗi), tránh đầy bộ đệm pipe """
+
+        while True:
+            line = await self.process.stderr.readline()
+            if not line:
+                break
+            self._stderr.append(line.decode("utf-8", "replace").rstrip())
+
+    @staticmethod
+    async def _cancel(task):
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    async def _read_response(self):
+        """ Đọc đến dòng trả lời tiếp theo của worker, bỏ qua output khác (notice của PHP...) """
+
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                stderr = " | ".join(self._stderr) or f"mã thoát {self.process.returncode}"
+                raise WorkerError(f"WP worker đã dừng: {stderr}")
+            text = line.decode("utf-8", "replace").strip()
+            if text.startswith(WORKER_MARKER):
+                try:
+                    return json.loads(text[len(WORKER_MARKER):])
+                except ValueError as e:
+                    raise WorkerError(f"Không đọc được trả lời của WP worker: {e}")
+
+    async def _request(self, payload, timeout):
+        request_id = next(self._ids)
+        self.process.stdin.write((json.dumps(dict(payload, id=request_id)) + "\n").encode("utf-8"))
+        await self.process.stdin.drain()
+
+        response = await asyncio.wait_for(self._read_response(), timeout)
+        if response.get("id") != request_id:
+            raise WorkerError("Trả lời của WP worker không khớp với lệnh đã gửi")
+        self.last_used = time.monotonic()
+        return response
+
+    async def ping(self):
+        """ Kiểm tra worker còn phản hồi """
+
+        try:
+            return (await self._request({"ping": True}, config.wp_worker_ping_timeout)).get("pong") is True
+        except (WorkerError, asyncio.TimeoutError, OSError):
+            return False
+
+    async def run(self, command, timeout=None):
+        """ Chạy một lệnh WP-CLI (không có tiền tố `wp`), trả về dict command, code, stdout, stderr, time """
+
+        response = await self._request({"command": command}, timeout or config.command_timeout)
+        self.commands_run += 1
+        return {
+            "command": command,
+            "code": response.get("code", 1),
+            "stdout": response.get("stdout") or "",
+            "stderr": response.get("stderr") or "",
+            "time": response.get("time", 0.0),
+        }
+
+    async def close(self):
+        """ Đóng stdin để worker tự thoát, dừng cả cây tiến trình nếu không thoát kịp """
+
+        if self._stack is None:
+            return
+        stack, self._stack = self._stack, None
+        if self.alive:
+            with contextlib.suppress(OSError):
+                self.process.stdin.close()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self.process.wait(), 5)
+        await stack.aclose()
+        self.process = None
+
+
+class WPWorkerPool:
+    """ Mỗi website một WP worker, tự khởi động lại khi worker dừng, không phản hồi hoặc đã chạy đủ số lệnh """
+
+    def __init__(self):
+        self.workers = {}
+        self.counters = {"started": 0, "recycled": 0, "failed": 0, "commands": 0}
+
+    async def _ensure_started(self, worker):
+        """ Khởi động lại worker nếu cần (người gọi đang giữ worker.lock) """
+
+        if worker.alive and worker.commands_run >= config.wp_worker_max_commands:
+            self.counters["recycled"] += 1
+            await worker.close()
+        elif worker.alive and time.monotonic() - worker.last_used > config.wp_worker_ping_after and not await worker.ping():
+            print(f"WP worker của {worker.website_path} không phản hồi, khởi động lại")
+            await worker.close()
+
+        if not worker.alive:
+            await worker.close()
+            with span("wp_worker_start", website=os.path.basename(worker.website_path)):
+                await worker.start()
+            self.counters["started"] += 1
+
+    async def run(self, website_path, cached_path, commands):
+        """ Chạy lần lượt các lệnh trong worker của website.
+        Trả về kết quả các lệnh đã chạy xong (có thể thiếu các lệnh cuối nếu worker dừng giữa chừng),
+        None nếu không khởi động được worker """
+
+        worker = self.workers.setdefault(website_path, WPWorker(website_path, cached_path))
+        results = []
+        async with worker.lock, limits.php():
+            # Không khởi động lại worker đã lỗi cho đến khi website thay đổi (close)
+            if worker.failed:
+                return None
+            try:
+                await self._ensure_started(worker)
+            except (WorkerError, asyncio.TimeoutError, OSError) as e:
+                worker.failed = True
+                self.counters["failed"] += 1
+                print(f"Không khởi động được WP worker ({e}), chạy lệnh bằng tiến trình riêng.")
+                return None
+
+            for command in commands:
+                try:
+                    results.append(await worker.run(command))
+                except asyncio.TimeoutError:
+                    # Lệnh bị treo: ghi nhận lỗi, không chạy lại, dừng worker
+                    print(f"Lệnh 'wp {command}' chạy quá {config.command_timeout} giây, đã dừng WP worker.")
+                    results.append({"command": command, "code": 1, "stdout": "", "stderr": "Quá thời gian", "time": config.command_timeout})
+                    await worker.close()
+                    break
+                except (WorkerError, OSError) as e:
+                    # Worker dừng giữa chừng (lệnh gọi exit()...): các lệnh còn lại chạy bằng tiến trình riêng
+                    print(f"WP worker dừng khi chạy lệnh 'wp {command}': {e}")
+                    await worker.close()
+                    break
+            self.counters["commands"] += len(results)
+        return results
+
+    async def close(self, website_path):
+        """ Dừng worker của website (sau khi database / wp-config bị thay bằng tiến trình khác) """
+
+        worker = self.workers.pop(website_path, None)
+        if worker is not None:
+            async with worker.lock:
+                await worker.close()
+
+    async def close_all(self):
+        await asyncio.gather(*(self.close(path) for path in list(self.workers)))
+
+    def print_stats(self):
+        if self.counters["started"] or self.counters["failed"]:
+            c = self.counters
+            print(f"WP worker: {c['started']} lần khởi động, {c['commands']} lệnh, {c['recycled']} lần tái tạo, {c['failed']} lần lỗi")
+
+
+wp_workers = WPWorkerPool()
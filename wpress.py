@@ -0,0 +1,203 @@
+""" Đọc tệp .wpress của All-in-One WP Migration mà không cần WordPress / plugin.
+
+Định dạng: mỗi tệp gồm một header 4377 bytes (tên 255, kích thước 14, thời gian sửa đổi 12, thư mục 4096,
+đều là chuỗi ASCII đệm bằng byte 0) rồi đến nội dung tệp; tệp .wpress kết thúc bằng một header toàn byte 0.
+Thư mục gốc của tệp .wpress tương ứng với wp-content, kèm package.json (thông tin website) và database.sql
+(tên bảng có tiền tố SERVMASK_PREFIX_).
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+import config
+from file_deploy import safe_join, unlink_file
+
+
+NAME_SIZE = 255
+SIZE_SIZE = 14
+MTIME_SIZE = 12
+PREFIX_SIZE = 4096
+HEADER_SIZE = NAME_SIZE + SIZE_SIZE + MTIME_SIZE + PREFIX_SIZE
+EOF_BLOCK = b"\0" * HEADER_SIZE
+
+PACKAGE_FILE = "package.json"
+DATABASE_FILE = "database.sql"
+MULTISITE_FILE = "multisite.json"
+META_FILES = {PACKAGE_FILE, DATABASE_FILE, MULTISITE_FILE}
+
+# Tiền tố bảng mà All-in-One WP Migration ghi vào database.sql thay cho tiền tố thật
+SERVMASK_PREFIX = "SERVMASK_PREFIX_"
+SERVMASK_TABLE_RE = re.compile(rb"`" + SERVMASK_PREFIX.encode("ascii"))
+
+
+class WpressError(Exception):
+    """ Tệp .wpress bị hỏng hoặc không đọc được """
+
+
+@dataclass
+class WpressEntry:
+    """ Một tệp trong .wpress: đường dẫn tương đối (dấu /), kích thước, thời gian sửa đổi, vị trí nội dung """
+
+    path: str
+    size: int
+    mtime: int
+    offset: int
+
+
+def _field(header, start, size):
+    return header[start:start + size].split(b"\0", 1)[0].decode("utf-8", "replace")
+
+
+def read_index(path):
+    """ Đọc header của tất cả tệp trong .wpress (bỏ qua nội dung bằng seek, không đọc dữ liệu) """
+
+    entries = []
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(HEADER_SIZE)
+            if header == EOF_BLOCK:
+                return entries
+            if len(header) < HEADER_SIZE:
+                raise WpressError("Tệp .wpress bị cắt cụt (thiếu phần kết thúc)")
+
+            name = _field(header, 0, NAME_SIZE)
+            size = _field(header, NAME_SIZE, SIZE_SIZE)
+            mtime = _field(header, NAME_SIZE + SIZE_SIZE, MTIME_SIZE)
+            prefix = _field(header, NAME_SIZE + SIZE_SIZE + MTIME_SIZE, PREFIX_SIZE)
+            if not name or not size.isdigit():
+                raise WpressError(f"Header không hợp lệ tại vị trí {f.tell() - HEADER_SIZE}, không phải tệp .wpress")
+
+            offset = f.tell()
+            size = int(size)
+            if offset + size > file_size:
+                raise WpressError(f"Tệp .wpress bị cắt cụt tại {name}")
+            prefix = prefix.replace("\\", "/").strip("/")
+            entries.append(WpressEntry(
+                path=name if prefix in ("", ".") else f"{prefix}/{name}",
+                size=size,
+                mtime=int(mtime) if mtime.isdigit() else 0,
+                offset=offset,
+            ))
+            f.seek(size, os.SEEK_CUR)
+
+
+class WpressArchive:
+    """ Tệp .wpress đã đọc danh sách tệp, giải nén trực tiếp vào wp-content """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = read_index(path)
+        self.by_path = {entry.path: entry for entry in self.entries}
+        self.package = self._read_package()
+
+    def _read(self, entry):
+        with open(self.path, "rb") as f:
+            f.seek(entry.offset)
+            return f.read(entry.size)
+
+    def _read_package(self):
+        entry = self.by_path.get(PACKAGE_FILE)
+        if entry is None:
+            return {}
+        try:
+            return json.loads(self._read(entry).decode("utf-8-sig"))
+        except ValueError as e:
+            raise WpressError(f"package.json không hợp lệ: {e}")
+
+    def unsupported_reason(self):
+        """ Lý do không restore trực tiếp được (cần dùng plugin), None nếu đọc được """
+
+        if PACKAGE_FILE not in self.by_path:
+            return "không có package.json"
+        if DATABASE_FILE not in self.by_path:
+            return "không có database.sql"
+        if self.package.get("Encrypted"):
+            return "tệp backup được mã hóa"
+        compression = self.package.get("Compression") or {}
+        if isinstance(compression, dict) and compression.get("Enabled"):
+            return "tệp backup được nén"
+        if MULTISITE_FILE in self.by_path:
+            return "website multisite"
+        return None
+
+    def old_urls(self):
+        """ Url của website cũ trong package.json """
+        urls = [url for url in (self.package.get("SiteURL"), self.package.get("HomeURL")) if url]
+        return list(dict.fromkeys(urls))
+
+    def extract(self, wp_content_path, sql_path, workers=None):
+        """ Ghi các tệp vào wp-content và database.sql vào sql_path, nhiều tệp được ghi song song
+        (mỗi thread mở tệp .wpress riêng và đọc theo vị trí). Trả về (số tệp, số bytes, số giây) """
+
+        start = time.perf_counter()
+        wp_content_path = os.path.abspath(wp_content_path)
+        jobs = []
+        directories = {wp_content_path}
+        for entry in self.entries:
+            if entry.path == DATABASE_FILE:
+                jobs.append((entry, sql_path))
+            elif entry.path not in META_FILES:
+                try:
+                    target = safe_join(wp_content_path, entry.path)
+                except ValueError as e:
+                    raise WpressError(str(e))
+                directories.add(os.path.dirname(target))
+                jobs.append((entry, target))
+        for directory in sorted(directories):
+            os.makedirs(directory, exist_ok=True)
+
+        # Tệp lớn (database.sql, video...) chạy trước để các thread kết thúc cùng lúc
+        jobs.sort(key=lambda job: job[0].size, reverse=True)
+        local = threading.local()
+        opened = []
+        lock = threading.Lock()
+        buffer_size = config.extract_buffer_size
+
+        def copy(job):
+            entry, target = job
+            source = getattr(local, "file", None)
+            if source is None:
+                source = local.file = open(self.path, "rb")
+                with lock:
+                    opened.append(source)
+            # Tệp của WordPress core có thể được link từ thư mục cached: xóa rồi ghi tệp mới
+            unlink_file(target)
+            source.seek(entry.offset)
+            remaining = entry.size
+            with open(target, "wb") as destination:
+                while remaining:
+                    chunk = source.read(min(buffer_size, remaining))
+                    if not chunk:
+                        raise WpressError(f"Tệp .wpress bị cắt cụt tại {entry.path}")
+                    destination.write(chunk)
+                    remaining -= len(chunk)
+            if entry.mtime:
+                os.utime(target, (entry.mtime, entry.mtime))
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers or config.extract_workers) as executor:
+                list(executor.map(copy, jobs))
+        finally:
+            for source in opened:
+                source.close()
+
+        return len(jobs), sum(entry.size for entry, _ in jobs), time.perf_counter() - start
+
+
+def prefix_transform(rewriter, new_prefix="wp_"):
+    """ Transform cho import database.sql: đổi SERVMASK_PREFIX_ thành tiền tố mới ở tên bảng,
+    chuỗi trong dữ liệu (option_name, meta_key, serialize) được đổi cùng với url bởi rewriter """
+
+    replacement = b"`" + new_prefix.encode("ascii")
+
+    def transform(line):
+        if b"`" + SERVMASK_PREFIX.encode("ascii") in line:
+            line = SERVMASK_TABLE_RE.sub(replacement, line)
+        return rewriter.rewrite_line(line)
+
+    return transform
@@ -0,0 +1,142 @@
+import os
+import time
+import zlib
+import shutil
+import zipfile
+import threading
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+import config
+from file_deploy import safe_join, unlink_file
+
+
+# Tệp zip ít tệp hơn số này được giải nén trong một thread (tạo thread pool không đáng)
+PARALLEL_MIN_MEMBERS = 64
+
+
+class ZipExtractError(Exception):
+    """ Tệp zip không giải nén được (tên tệp nguy hiểm, tệp zip hỏng...) """
+
+
+@dataclass
+class ExtractStats:
+    """ Kết quả giải nén: số tệp đã ghi / bỏ qua (giống hệt tệp đã có), dung lượng và thời gian """
+
+    files: int = 0
+    skipped: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def mbps(self):
+        return self.bytes / (1024 * 1024) / self.seconds if self.seconds > 0 else 0.0
+
+
+def _same_file(path, info, buffer_size):
+    """ Tệp đã có giống hệt tệp trong zip (cùng kích thước và CRC32) """
+
+    try:
+        if os.path.getsize(path) != info.file_size:
+            return False
+        crc = 0
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(buffer_size)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+        return crc == info.CRC
+    except OSError:
+        return False
+
+
+class _Extractor:
+    """ Giải nén các tệp của một tệp zip, mỗi thread mở ZipFile riêng (ZipFile không dùng chung giữa các thread được) """
+
+    def __init__(self, zip_file, buffer_size):
+        self.zip_file = zip_file
+        self.buffer_size = buffer_size
+        self._local = threading.local()
+        self._opened = []
+        self._lock = threading.Lock()
+
+    def _zip(self):
+        archive = getattr(self._local, "archive", None)
+        if archive is None:
+            archive = self._local.archive = zipfile.ZipFile(self.zip_file, "r")
+            with self._lock:
+                self._opened.append(archive)
+        return archive
+
+    def extract(self, info, target):
+        """ Ghi một tệp, trả về True nếu đã ghi, False nếu bỏ qua """
+
+        if os.path.exists(target):
+            if _same_file(target, info, self.buffer_size):
+                return False
+            # Tệp có thể được link từ thư mục cached: xóa rồi ghi tệp mới
+            unlink_file(target)
+        with self._zip().open(info) as source, open(target, "wb") as destination:
+            shutil.copyfileobj(source, destination, self.buffer_size)
+        return True
+
+    def close(self):
+        for archive in self._opened:
+            archive.close()
+
+
+def extract_zip(zip_file, extract_path, workers=None):
+    """ Giải nén tệp zip (chạy đồng bộ, gọi trong thread): các tệp được ghi song song bởi nhiều thread,
+    tệp lớn đọc / ghi theo khối lớn, bỏ qua tệp đã có giống hệt. Trả về ExtractStats """
+
+    start = time.perf_counter()
+    extract_path = os.path.abspath(extract_path)
+    buffer_size = config.extract_buffer_size
+    stats = ExtractStats()
+
+    try:
+        with zipfile.ZipFile(zip_file, "r") as archive:
+            members = archive.infolist()
+    except zipfile.BadZipFile as e:
+        raise ZipExtractError(f"Tệp zip bị hỏng: {e}")
+
+    # Kiểm tra tên tệp và tạo thư mục trước khi ghi tệp
+    files = []
+    directories = {extract_path}
+    for info in members:
+        try:
+            target = safe_join(extract_path, info.filename)
+        except ValueError as e:
+            raise ZipExtractError(str(e))
+        if info.is_dir():
+            directories.add(target)
+        else:
+            directories.add(os.path.dirname(target))
+            files.append((info, target))
+    for directory in sorted(directories):
+        os.makedirs(directory, exist_ok=True)
+
+    # Tệp lớn chạy trước để các thread kết thúc cùng lúc
+    files.sort(key=lambda item: item[0].file_size, reverse=True)
+    # Không dùng nhiều thread hơn số CPU: zlib và ghi tệp nhả GIL nhưng vẫn cần CPU
+    workers = min(workers or config.extract_workers, os.cpu_count() or 1)
+    extractor = _Extractor(zip_file, buffer_size)
+    try:
+        if workers <= 1 or len(files) < PARALLEL_MIN_MEMBERS:
+            written = [extractor.extract(info, target) for info, target in files]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                written = list(executor.map(lambda item: extractor.extract(*item), files))
+    except zipfile.BadZipFile as e:
+        raise ZipExtractError(f"Tệp zip bị hỏng: {e}")
+    finally:
+        extractor.close()
+
+    for (info, _), was_written in zip(files, written):
+        if was_written:
+            stats.files += 1
+            stats.bytes += info.file_size
+        else:
+            stats.skipped += 1
+    stats.seconds = time.perf_counter() - start
+    return stats